@@ -0,0 +1,88 @@
+# benchmarks/memory_backend.py
+# Backend giả giữ mọi sheet trong bộ nhớ, có thể thêm độ trễ cho mỗi request
+# và cho mỗi 1000 dòng gửi/nhận để mô phỏng Google Sheets.
+import threading
+import time
+import pandas as pd
+from utils.storage import SheetBackend, cell_text
+
+
+class MemoryBackend(SheetBackend):
+    name = "memory"
+
+    def __init__(self, sheets=None, latency=0.0, latency_per_1k_rows=0.0):
+        self.latency = latency
+        self.latency_per_1k_rows = latency_per_1k_rows
+        self._lock = threading.Lock()
+        self._sheets = {name: df.astype(str) for name, df in (sheets or {}).items()}
+        self._revision = 0
+        self.calls = {"read": 0, "read_many": 0, "revision": 0, "append": 0, "update_rows": 0, "replace": 0,
+                      "read_rows": 0}
+
+    def _wait(self, kind, rows=0):
+        with self._lock:
+            self.calls[kind] += 1
+        delay = self.latency + self.latency_per_1k_rows * rows / 1000
+        if delay > 0:
+            time.sleep(delay)
+
+    def _get(self, sheet_name):
+        with self._lock:
+            return self._sheets.get(sheet_name, pd.DataFrame()).copy()
+
+    # -------- SheetBackend ----------
+    def read(self, sheet_name):
+        df = self._get(sheet_name)
+        self._wait("read", len(df))
+        return df
+
+    def read_many(self, sheet_names):
+        result = {name: self._get(name) for name in sheet_names}
+        self._wait("read_many", sum(len(df) for df in result.values()))
+        return result
+
+    def read_rows(self, sheet_name, ranges):
+        df = self._get(sheet_name)
+        frames = [df.iloc[start:stop].reset_index(drop=True) for start, stop in ranges]
+        self._wait("read_rows", sum(len(f) for f in frames))
+        return frames
+
+    def revision(self):
+        self._wait("revision")
+        with self._lock:
+            return self._revision
+
+    def append(self, sheet_name, rows):
+        if isinstance(rows, pd.DataFrame):
+            rows = rows.to_dict("records")
+        if not rows:
+            return 0
+        self._wait("append", len(rows))
+        added = pd.DataFrame([{k: str(cell_text(v)) for k, v in row.items()} for row in rows])
+        with self._lock:
+            self._sheets[sheet_name] = pd.concat(
+                [self._sheets.get(sheet_name, pd.DataFrame()), added], ignore_index=True
+            ).fillna("")
+            self._revision += 1
+        return len(rows)
+
+    def update_rows(self, sheet_name, updates):
+        if not updates:
+            return 0
+        self._wait("update_rows", len(updates))
+        count = 0
+        with self._lock:
+            df = self._sheets[sheet_name]
+            for idx, values in updates.items():
+                for col, value in values.items():
+                    df.loc[int(idx), col] = str(cell_text(value))
+                    count += 1
+            self._sheets[sheet_name] = df.fillna("")   # cột mới: các dòng khác để trống
+            self._revision += 1
+        return count
+
+    def replace(self, sheet_name, df):
+        self._wait("replace", len(df))
+        with self._lock:
+            self._sheets[sheet_name] = df.astype(str).reset_index(drop=True)
+            self._revision += 1
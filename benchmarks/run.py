@@ -0,0 +1,175 @@
+# benchmarks/run.py
+# Đo thời gian và bộ nhớ đỉnh (tracemalloc) của các đường tính toán và đọc/ghi chính
+# trên dữ liệu giả, với backend trong bộ nhớ (có thể thêm độ trễ mạng).
+# Kết quả dạng JSON để so sánh giữa các lần thay đổi.
+#
+#   python benchmarks/run.py --scales 1000,10000,100000 --latency 0.2 --out bench.json
+import argparse
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import time
+import tracemalloc
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import numpy as np
+import pandas as pd
+from benchmarks.synthetic import make_club
+from benchmarks.memory_backend import MemoryBackend
+from utils.gsheets import set_backend, load_sheet, save_sheet, invalidate_sheet
+from utils.players import PlayerIndex
+from utils.repository import (
+    load_many, load_player_index, load_participations_between, load_matches_between, rebuild_participations,
+    delete_rows, live_rows, MATCH_SHEET, FUND_SHEET, MEMBER_SHEET, PARTICIPATION_SHEET
+)
+from utils.stats import get_stats, get_monthly_stats
+from utils.details import get_detail_df
+from utils import funds, rollup, write_queue
+
+ALL_SHEETS = (MATCH_SHEET, FUND_SHEET, MEMBER_SHEET, PARTICIPATION_SHEET)
+
+
+def measure(fn, setup=None, repeat=3):
+    """Thời gian mỗi lần chạy (giây) và bộ nhớ đỉnh (byte) của một lần chạy riêng dưới tracemalloc."""
+    times = []
+    for _ in range(repeat):
+        if setup:
+            setup()
+        start = time.perf_counter()
+        fn()
+        times.append(time.perf_counter() - start)
+    if setup:
+        setup()
+    tracemalloc.start()
+    try:
+        fn()
+        peak = tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+    return times, peak
+
+
+def _reset_fund_close():
+    write_queue.flush()   # các dòng quỹ lần trước ghi xong rồi mới đo lần sau
+    with funds._close_lock:
+        funds._closed_months.clear()
+
+
+def _reset_rollup():
+    with rollup._lock:
+        rollup._state = None
+    save_sheet(rollup.ROLLUP_STATS_SHEET, pd.DataFrame(columns=rollup.STATS_COLUMNS + rollup.BATCH_COLUMNS))
+    save_sheet(rollup.ROLLUP_FUNDS_SHEET, pd.DataFrame(columns=rollup.FUNDS_COLUMNS + rollup.BATCH_COLUMNS))
+
+
+def operations(club):
+    """(tên, hàm, setup) của từng thao tác cần đo; dữ liệu đã nằm sẵn trong backend."""
+    raw_matches = club["matches"]
+    df_matches, df_funds, members, _ = load_many(*ALL_SHEETS)
+    _, players = load_player_index()
+    last_month = df_matches["Ngày_dt"].max() - pd.offsets.MonthBegin(1)
+    month_end = last_month + pd.offsets.MonthEnd(0)
+    month_parts = load_participations_between(last_month, month_end)
+    _, all_parts, _ = load_many(MATCH_SHEET, PARTICIPATION_SHEET, MEMBER_SHEET)
+    # Mỗi lần đo xoá một dòng quỹ khác
+    fund_rows = (row for _, row in live_rows(df_funds).iterrows())
+
+    return [
+        ("load_sheet[matches] cold", lambda: load_sheet(MATCH_SHEET), invalidate_sheet),
+        ("load_many cold", lambda: load_many(*ALL_SHEETS), invalidate_sheet),
+        ("load_many warm", lambda: load_many(*ALL_SHEETS), None),
+        ("load_matches_between cold (1 month)", lambda: load_matches_between(last_month, month_end), invalidate_sheet),
+        ("save_sheet[matches]", lambda: save_sheet(MATCH_SHEET, raw_matches), None),
+        ("rebuild_participations", rebuild_participations, None),
+        ("PlayerIndex.from_matches", lambda: PlayerIndex.from_matches(df_matches), None),
+        ("get_stats (parse teams)", lambda: get_stats(df_matches, members), None),
+        ("get_stats (participations)", lambda: get_stats(df_matches, members, players), None),
+        ("get_monthly_stats", lambda: get_monthly_stats(df_matches, members, players), None),
+        ("get_detail_df (1 month)", lambda: get_detail_df(month_parts, last_month, month_end), None),
+        ("get_detail_df (all)", lambda: get_detail_df(all_parts, pd.Timestamp.min, pd.Timestamp.max), None),
+        ("update_fund (cold)", funds.update_fund, _reset_fund_close),
+        ("rollup.refresh (full)", lambda: rollup.refresh(df_matches, df_funds, members, players), _reset_rollup),
+        ("rollup.refresh (no change)", lambda: rollup.refresh(df_matches, df_funds, members, players), None),
+        ("delete_rows[funds] (1 row)", lambda: delete_rows(FUND_SHEET, [next(fund_rows)]), None),
+    ]
+
+
+def run_scale(n_matches, args):
+    club = make_club(n_matches, seed=args.seed)
+    backend = MemoryBackend(club, latency=args.latency, latency_per_1k_rows=args.latency_per_1k_rows)
+    set_backend(backend)
+    rebuild_participations()
+
+    results = []
+    for name, fn, setup in operations(club):
+        if args.ops and not any(key in name for key in args.ops):
+            continue
+        times, peak = measure(fn, setup, args.repeat)
+        results.append({
+            "op": name,
+            "matches": n_matches,
+            "seconds": statistics.median(times),
+            "seconds_min": min(times),
+            "repeat": len(times),
+            "peak_mb": round(peak / 2**20, 3),
+        })
+        print(f"{n_matches:>9,}  {name:<30} {results[-1]['seconds'] * 1000:10.1f} ms"
+              f"  {results[-1]['peak_mb']:9.1f} MB", file=sys.stderr)
+    write_queue.flush()
+    results.append({"op": "backend calls", "matches": n_matches, "calls": dict(backend.calls)})
+    return results
+
+
+def _commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT,
+                              capture_output=True, text=True).stdout.strip() or None
+    except OSError:
+        return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark trên dữ liệu giả")
+    parser.add_argument("--scales", default="1000,10000",
+                        help="số trận, ngăn cách bằng dấu phẩy (vd. 1000,10000,100000,1000000)")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--latency", type=float, default=0.0, help="giây cho mỗi request tới backend")
+    parser.add_argument("--latency-per-1k-rows", type=float, default=0.0,
+                        help="giây thêm cho mỗi 1000 dòng gửi/nhận")
+    parser.add_argument("--ops", nargs="*", help="chỉ chạy các thao tác có tên chứa các chuỗi này")
+    parser.add_argument("--out", help="ghi JSON vào file (mặc định in ra stdout)")
+    args = parser.parse_args()
+
+    results = []
+    for scale in args.scales.split(","):
+        results += run_scale(int(scale), args)
+
+    report = {
+        "meta": {
+            "commit": _commit(),
+            "time": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "python": platform.python_version(),
+            "pandas": pd.__version__,
+            "numpy": np.__version__,
+            "seed": args.seed,
+            "latency": args.latency,
+            "latency_per_1k_rows": args.latency_per_1k_rows,
+        },
+        "results": results,
+    }
+    text = json.dumps(report, ensure_ascii=False, indent=2)
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as f:
+            f.write(text)
+    else:
+        print(text)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,120 @@
+# benchmarks/startup.py
+# Đo thời gian import lúc khởi động (python -X importtime, mỗi lần một process mới):
+#   - phần main.py import trước khi vẽ trang (ngoài streamlit và pandas)
+#   - từng module trang, import thêm sau phần khởi động
+# Thoát với mã 1 nếu vượt ngân sách hoặc nếu lúc khởi động đã nạp thư viện nặng
+# (tests/test_startup.py kiểm tra đúng điều này khi chạy pytest).
+#
+#   python benchmarks/startup.py [--repeat 5] [--budget-ms 150] [--json]
+import argparse
+import ast
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Đã có sẵn trong mọi lần chạy streamlit, không tính vào ngân sách
+BASE_MODULES = ["streamlit", "pandas"]
+PAGE_MODULES = ["utils.input_info", "utils.details", "utils.stats", "utils.funds", "utils.member"]
+# Không được nạp khi mới khởi động (chỉ khi trang/backend cần tới)
+HEAVY_MODULES = ["matplotlib", "gspread", "google.oauth2", "openpyxl", "utils.charts", "utils.importer"] + PAGE_MODULES
+
+STARTUP_BUDGET_MS = 150
+
+
+def _is_module(name):
+    path = os.path.join(ROOT, *name.split("."))
+    return os.path.isdir(path) or os.path.isfile(path + ".py")
+
+
+def startup_modules(path=os.path.join(ROOT, "main.py")):
+    """Các module của app mà main.py import ở cấp trên cùng (đọc từ mã nguồn, không import)."""
+    with open(path, encoding="utf-8") as f:
+        tree = ast.parse(f.read(), path)
+    modules = []
+    for node in tree.body:
+        if isinstance(node, ast.Import):
+            names = [alias.name for alias in node.names]
+        elif isinstance(node, ast.ImportFrom) and node.module and not node.level:
+            # from utils import metrics: metrics là module con
+            names = [f"{node.module}.{alias.name}" if _is_module(f"{node.module}.{alias.name}") else node.module
+                     for alias in node.names]
+        else:
+            continue
+        modules += [name for name in names if _is_module(name) and name not in modules]
+    return modules
+
+
+# Các module main.py import ở đầu file (streamlit, pandas, thư viện chuẩn không tính)
+STARTUP_MODULES = startup_modules()
+
+
+def _import_times(preload, modules):
+    """Thời gian (ms, cộng dồn) của từng module trong modules khi đã import sẵn preload."""
+    code = "; ".join(
+        [f"import {m}" for m in preload + modules]
+        + [f"import sys; print(sorted(m for m in {HEAVY_MODULES!r} if m in sys.modules))"]
+    )
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", code],
+        cwd=ROOT, capture_output=True, text=True, check=True,
+    )
+    times = {}
+    for line in proc.stderr.splitlines():
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        _, cumulative, name = line.split("|")
+        name = name.rstrip()[1:]
+        # Dòng không thụt lề là module được import trực tiếp
+        if not name.startswith(" ") and name in modules:
+            times[name] = int(cumulative) / 1000
+    loaded = json.loads(proc.stdout.strip().splitlines()[-1].replace("'", '"'))
+    return times, loaded
+
+
+def run(repeat):
+    startup, pages, heavy = [], {m: [] for m in PAGE_MODULES}, set()
+    for _ in range(repeat):
+        times, loaded = _import_times(BASE_MODULES, STARTUP_MODULES)
+        startup.append(sum(times.get(m, 0) for m in STARTUP_MODULES))
+        heavy.update(loaded)
+        for module in PAGE_MODULES:
+            times, _ = _import_times(BASE_MODULES + STARTUP_MODULES, [module])
+            pages[module].append(times.get(module, 0))
+    return {
+        "startup_ms": statistics.median(startup),
+        "pages_ms": {m: statistics.median(v) for m, v in pages.items()},
+        "heavy_at_startup": sorted(heavy),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Đo thời gian import lúc khởi động")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--budget-ms", type=float,
+                        default=float(os.environ.get("PICKLEBALL_STARTUP_BUDGET_MS", STARTUP_BUDGET_MS)))
+    parser.add_argument("--json", action="store_true", help="in kết quả dạng JSON")
+    args = parser.parse_args()
+
+    result = run(args.repeat)
+    result["budget_ms"] = args.budget_ms
+    ok = result["startup_ms"] <= args.budget_ms and not result["heavy_at_startup"]
+    result["ok"] = ok
+
+    if args.json:
+        print(json.dumps(result, ensure_ascii=False, indent=2))
+    else:
+        print(f"Khởi động (main.py): {result['startup_ms']:.1f} ms (ngân sách {args.budget_ms:.0f} ms)")
+        for module, ms in result["pages_ms"].items():
+            print(f"  {module:<20} {ms:8.1f} ms")
+        if result["heavy_at_startup"]:
+            print("Đã nạp lúc khởi động:", ", ".join(result["heavy_at_startup"]))
+        print("OK" if ok else "VƯỢT NGÂN SÁCH")
+    return 0 if ok else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,81 @@
+# benchmarks/synthetic.py
+# Dữ liệu giả cho benchmark: một câu lạc bộ với hội viên, khách, nhiều năm trận
+# (chủ yếu đánh đôi, một số trận có giá riêng) và các khoản thu chi quỹ.
+# Cùng seed luôn cho ra cùng dữ liệu. Mọi giá trị là chuỗi, giống dữ liệu đọc từ sheet.
+import numpy as np
+import pandas as pd
+
+MEMBER_FEES = [5000, 5000, 5000, 7000, 10000]
+CUSTOM_PRICES = [6000, 8000, 10000, 12000]
+FUND_NOTES = [("Tiền sân", -1), ("Mua bóng", -1), ("Đóng quỹ", 1), ("Tài trợ", 1)]
+
+
+def _distinct_players(rng, n, k, pool):
+    # k người khác nhau cho mỗi trận: bốc ngẫu nhiên rồi bốc lại các ô bị trùng
+    picks = rng.integers(0, pool, size=(n, k))
+    while True:
+        sorted_picks = np.sort(picks, axis=1)
+        dup_rows = np.flatnonzero((sorted_picks[:, 1:] == sorted_picks[:, :-1]).any(axis=1))
+        if not len(dup_rows):
+            return picks
+        picks[dup_rows] = rng.integers(0, pool, size=(len(dup_rows), k))
+
+
+def _ids(prefix, n):
+    # Mã dòng (cột ID) đã cấp sẵn, như dữ liệu sau lần chạy đầu tiên
+    return np.array([f"{prefix}{i:011x}" for i in range(n)], dtype=object)
+
+
+def make_members(rng, n_members):
+    names = np.array([f"TV{i:03d}" for i in range(n_members)], dtype=object)
+    fees = rng.choice(MEMBER_FEES, size=n_members)
+    return pd.DataFrame({"Tên": names, "Giá thua": fees.astype(str), "ID": _ids("v", n_members)})
+
+
+def make_matches(rng, n_matches, players, start, years, doubles_ratio=0.85, custom_ratio=0.1):
+    days = np.sort(rng.integers(0, 365 * years, size=n_matches))
+    dates = (pd.Timestamp(start) + pd.to_timedelta(days, unit="D")).strftime("%d/%m/%Y")
+
+    picks = players[_distinct_players(rng, n_matches, 4, len(players))]
+    doubles = rng.random(n_matches) < doubles_ratio
+    winners = np.where(doubles, picks[:, 0] + " " + picks[:, 1], picks[:, 0])
+    losers = np.where(doubles, picks[:, 2] + " " + picks[:, 3], picks[:, 2])
+
+    custom = rng.random(n_matches) < custom_ratio
+    prices = np.where(custom, rng.choice(CUSTOM_PRICES, size=n_matches), -1)
+    return pd.DataFrame({
+        "Ngày": np.asarray(dates, dtype=object),
+        "Đội thắng": winners,
+        "Đội thua": losers,
+        "Giá": prices.astype(str),
+        "ID": _ids("m", n_matches),
+    })
+
+
+def make_funds(rng, start, years, per_month=3):
+    rows = []
+    for month in pd.date_range(start, periods=12 * years, freq="MS"):
+        for _ in range(int(rng.integers(1, per_month + 1))):
+            note, sign = FUND_NOTES[int(rng.integers(len(FUND_NOTES)))]
+            day = month + pd.Timedelta(days=int(rng.integers(0, 28)))
+            rows.append({
+                "Ngày": day.strftime("%d/%m/%Y"),
+                "Ghi chú": note,
+                "Giá": str(sign * int(rng.integers(1, 40)) * 10000),
+            })
+    return pd.DataFrame(rows, columns=["Ngày", "Ghi chú", "Giá"]).assign(ID=lambda d: _ids("f", len(d)))
+
+
+def make_club(n_matches, seed=0, n_members=40, n_guests=12, years=None, start="2022-01-01"):
+    """Các sheet (matches, members, funds) của một câu lạc bộ giả với n_matches trận."""
+    rng = np.random.default_rng(seed)
+    # Khoảng 30 trận một ngày, tối thiểu một năm
+    years = years or max(1, int(np.ceil(n_matches / (30 * 365))))
+    members = make_members(rng, n_members)
+    guests = np.array([f"Khach{i:02d}" for i in range(n_guests)], dtype=object)
+    players = np.concatenate([members["Tên"].to_numpy(dtype=object), guests])
+    return {
+        "matches": make_matches(rng, n_matches, players, start, years),
+        "members": members,
+        "funds": make_funds(rng, start, years),
+    }
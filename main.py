@@ -1,10 +1,18 @@
+import importlib
+import json
 import streamlit as st
-import pandas as pd
-from utils.member import show_members_page
-from utils.input_info import show_match_page
-from utils.details import show_detail_page
-from utils.stats import show_stats_page
-from utils.funds import show_fund_page
+from utils import metrics, prefetch, write_queue
+from utils.repository import unit_of_work
+
+# Mỗi mục menu -> (module, hàm hiển thị). Module trang chỉ được import khi mục đó được chọn,
+# nên khởi động và mỗi lần rerun không phải nạp các trang (và thư viện) không dùng tới.
+PAGES = {
+    "Nhập thông tin": ("utils.input_info", "show_match_page"),
+    "Bảng chi tiết": ("utils.details", "show_detail_page"),
+    "Thống kê": ("utils.stats", "show_stats_page"),
+    "Quỹ nhóm": ("utils.funds", "show_fund_page"),
+    "Hội viên": ("utils.member", "show_members_page"),
+}
 
 
 st.set_page_config(
@@ -20,18 +28,44 @@ st.set_page_config(
 #     """,
 #     unsafe_allow_html=True
 # )
+metrics.begin_rerun()
+# Trang hiện tại được ưu tiên: dừng các lần nạp sẵn còn lại
+prefetch.cancel()
 menu = st.sidebar.radio(
     "Menu", 
-    ["Nhập thông tin", "Bảng chi tiết", "Thống kê", "Quỹ nhóm", "Hội viên"]
+    list(PAGES)
 )
 
-if menu == "Hội viên":
-    show_members_page()
-elif menu == "Nhập thông tin":
-    show_match_page()
-elif menu == "Thống kê":
-    show_stats_page()
-elif menu == "Bảng chi tiết":
-    show_detail_page()
-elif menu == "Quỹ nhóm":
-    show_fund_page()
\ No newline at end of file
+module_name, page_func = PAGES[menu]
+# Mỗi sheet chỉ đọc một lần trong một lần chạy trang
+with unit_of_work():
+    getattr(importlib.import_module(module_name), page_func)()
+# Vẽ xong thì nạp sẵn dữ liệu cho các trang còn lại
+prefetch.schedule([name for name, _ in PAGES.values() if name != module_name])
+
+# Trạng thái hàng đợi ghi nền
+pending = write_queue.pending_count()
+if pending:
+    st.sidebar.caption(f"⏳ Đang lưu {pending} thay đổi...")
+    if st.sidebar.button("Lưu ngay"):
+        write_queue.flush(timeout=60)
+        st.rerun()
+# Các thay đổi ghi hỏng được giữ lại (không mất), chờ thử lại
+unsaved = write_queue.unsaved_count()
+if unsaved:
+    failed = write_queue.failures()
+    st.sidebar.error(f"Chưa lưu được {unsaved} thay đổi. Lỗi gần nhất: {failed[-1]['error'] if failed else ''}")
+    if st.sidebar.button("Thử lưu lại"):
+        write_queue.retry_failed()
+        write_queue.flush(timeout=60)
+        st.rerun()
+    st.sidebar.download_button(
+        "Tải các thay đổi chưa lưu",
+        json.dumps(write_queue.unsaved_ops(), ensure_ascii=False, default=str),
+        file_name="chua_luu.json", mime="application/json",
+    )
+
+# Số liệu đo của lần chạy này (bảng debug: thêm ?debug=1 vào URL)
+metrics.end_rerun(menu)
+if metrics.debug_enabled():
+    metrics.show_debug_panel()
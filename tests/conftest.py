@@ -0,0 +1,63 @@
+# tests/conftest.py
+# Mỗi test chạy trên một MemoryBackend mới (benchmarks/memory_backend.py), không cần mạng.
+import os
+import sys
+import tempfile
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+# Các thay đổi ghi hỏng không được lẫn vào file của app thật (phải đặt trước khi import write_queue)
+os.environ["PICKLEBALL_UNSAVED_PATH"] = os.path.join(tempfile.mkdtemp(), "unsaved.json")
+
+import pytest
+from benchmarks.memory_backend import MemoryBackend
+from utils import repository, write_queue
+from utils.gsheets import set_backend
+
+
+class CountingBackend(MemoryBackend):
+    """MemoryBackend ghi lại tên các sheet được đọc (cả bảng) và đọc theo khoảng dòng."""
+
+    def __init__(self, sheets=None):
+        super().__init__(sheets)
+        self.full_reads = []
+        self.row_reads = []
+
+    def read(self, sheet_name):
+        self.full_reads.append(sheet_name)
+        return super().read(sheet_name)
+
+    def read_many(self, sheet_names):
+        self.full_reads += list(sheet_names)
+        return super().read_many(sheet_names)
+
+    def read_rows(self, sheet_name, ranges):
+        self.row_reads.append(sheet_name)
+        return super().read_rows(sheet_name, ranges)
+
+
+def match_row(ngay, winner="A B", loser="C D"):
+    return {"Ngày": ngay, "Đội thắng": winner, "Đội thua": loser, "Giá": -1}
+
+
+def setup_club(dates):
+    """Bốn hội viên A, B, C, D (giá thua 10000) và mỗi ngày trong dates một trận "A B" thắng "C D"."""
+    repository.append_members([{"Tên": name, "Giá thua": 10000} for name in "A B C D".split()])
+    repository.append_matches([match_row(ngay) for ngay in dates])
+    write_queue.flush()
+
+
+def use_backend(sheets=None):
+    write_queue.flush()
+    backend = CountingBackend(sheets)
+    set_backend(backend)
+    with repository._participation_lock:
+        repository._participation_checked = None
+    return backend
+
+
+@pytest.fixture
+def backend():
+    backend = use_backend()
+    yield backend
+    write_queue.flush()
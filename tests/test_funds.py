@@ -0,0 +1,71 @@
+# tests/test_funds.py
+# Chốt quỹ theo tháng (update_fund): chỉ ghi khi tháng có thay đổi, kể cả thay đổi ở chính dòng tổng.
+import pytest
+from conftest import setup_club
+from utils import funds, rollup, write_queue
+from utils.repository import (
+    append_funds, load_funds, load_matches, update_row, delete_rows, live_rows,
+    ID_COLUMN, DELETED_COLUMN, FUND_SHEET, MATCH_SHEET
+)
+
+
+@pytest.fixture(autouse=True)
+def _fresh_close(backend):
+    with funds._close_lock:
+        funds._closed_months.clear()
+
+
+def _auto_rows():
+    df = live_rows(load_funds())
+    return df[df["Ghi chú"].str.startswith("Tổng thu quỹ tháng")][["Ngày", "Ghi chú", "Giá"]].values.tolist()
+
+
+def test_unchanged_months_are_not_written(backend):
+    setup_club(["01/01/2026", "05/02/2026"])
+    assert funds.update_fund() > 0
+    write_queue.flush()
+    assert _auto_rows() == [["31/01/2026", "Tổng thu quỹ tháng 1", 20000],
+                            ["28/02/2026", "Tổng thu quỹ tháng 2", 20000]]
+    assert funds.update_fund() == 0
+
+
+def test_auto_row_edited_or_deleted_by_hand_is_restored(backend):
+    setup_club(["01/01/2026", "05/02/2026"])
+    funds.update_fund()
+    write_queue.flush()
+    df = live_rows(load_funds())
+    update_row(FUND_SHEET, df.iloc[0], {"Giá": 1})
+    delete_rows(FUND_SHEET, [df.iloc[1]])
+    assert funds.update_fund() > 0
+    write_queue.flush()
+    assert sorted(_auto_rows()) == [["28/02/2026", "Tổng thu quỹ tháng 2", 20000],
+                                    ["31/01/2026", "Tổng thu quỹ tháng 1", 20000]]
+    assert funds.update_fund() == 0
+
+
+def test_month_left_without_matches_loses_its_summary_row(backend):
+    setup_club(["01/01/2026", "05/02/2026"])
+    funds.update_fund()
+    write_queue.flush()
+    delete_rows(MATCH_SHEET, [live_rows(load_matches()).iloc[1]])
+    assert funds.update_fund() > 0
+    write_queue.flush()
+    assert _auto_rows() == [["31/01/2026", "Tổng thu quỹ tháng 1", 20000]]
+    with rollup._lock:
+        rollup._state = None
+    _, rollup_funds = rollup.load_rollups()
+    totals = {(y, m): total for y, m, total in rollup_funds[["Năm", "Tháng", "Tổng"]].values.tolist()}
+    assert totals.get((2026, 1)) == 20000 and totals.get((2026, 2), 0) == 0
+    assert funds.update_fund() == 0
+
+
+def test_duplicate_summary_rows_are_rewritten_without_blanks(backend):
+    setup_club(["01/01/2026"])
+    duplicate = {"Ngày": "31/01/2026", "Ghi chú": "Tổng thu quỹ tháng 1", "Giá": 5}
+    append_funds([duplicate, duplicate, {"Ngày": "02/01/2026", "Ghi chú": "Nước", "Giá": -3000}])
+    write_queue.flush()
+    assert funds.update_fund() == 1
+    raw = backend.read("funds_2026")
+    assert not raw.isin(["nan", "None"]).any().any()
+    assert (raw[DELETED_COLUMN] == "").all() and (raw[ID_COLUMN] != "").all()
+    assert sorted(_auto_rows()) == [["31/01/2026", "Tổng thu quỹ tháng 1", 20000]]
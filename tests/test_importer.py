@@ -0,0 +1,38 @@
+# tests/test_importer.py
+# Nhập file hàng loạt: Mã trận của các lô nhập không trùng với các trận thêm cùng lúc.
+import io
+import threading
+from conftest import match_row, setup_club
+from utils import write_queue
+from utils.gsheets import invalidate_sheet
+from utils.importer import import_file
+from utils.repository import append_matches, load_matches, MATCH_SHEET, PARTICIPATION_SHEET
+from utils.repository import _load_typed
+
+
+def test_match_added_while_importing_keeps_its_own_id(backend, monkeypatch):
+    setup_club(["01/01/2026"])
+    flush = write_queue.flush
+    adders = []
+
+    def flush_then_add(timeout=None):
+        # Một phiên khác thêm trận ngay sau khi lần nhập đã ghi hết hàng đợi
+        done = flush(timeout)
+        if not adders:
+            adders.append(threading.Thread(target=append_matches, args=([match_row("09/01/2026", "A C", "B D")],)))
+            adders[0].start()
+            adders[0].join(0.5)
+        return done
+
+    monkeypatch.setattr(write_queue, "flush", flush_then_add)
+    history = "Ngày,Đội thắng,Đội thua\n02/01/2026,A B,C D\n03/01/2026,A B,C D\n"
+    assert import_file(MATCH_SHEET, io.BytesIO(history.encode()), "history.csv")["written"] == 2
+    adders[0].join()
+    monkeypatch.setattr(write_queue, "flush", flush)
+    write_queue.flush()
+    invalidate_sheet()
+    df_matches = load_matches()
+    assert len(df_matches) == 4
+    # Mỗi Mã trận trỏ đúng trận của nó (cùng ngày)
+    parts = _load_typed(PARTICIPATION_SHEET)
+    assert parts.groupby("Mã trận")["Ngày"].first().tolist() == df_matches["Ngày"].tolist()
@@ -0,0 +1,78 @@
+# tests/test_partitions.py
+# Bảng con theo năm: chia dòng, ghi thêm, nhập lịch sử và đọc theo khoảng ngày.
+import io
+import pandas as pd
+from conftest import match_row, setup_club, use_backend
+from utils import partitions, write_queue
+from utils.gsheets import invalidate_sheet, _catalog
+from utils.importer import import_file
+from utils.repository import append_matches, load_matches, load_matches_between, MATCH_SHEET, PARTICIPATION_SHEET
+from utils.repository import _load_typed
+
+
+def _segments(sheet_name=MATCH_SHEET):
+    return [(part["name"], part["rows"]) for part in _catalog()[sheet_name]]
+
+
+# -------- Chia dòng ----------
+def test_split_puts_each_row_in_its_year():
+    df = pd.DataFrame({"Ngày": ["01/01/2025", "01/01/2026", "", "02/02/2025"], "v": ["0", "1", "2", "3"]})
+    parts, frames = partitions.split(MATCH_SHEET, df)
+    assert [(part["name"], part["rows"]) for part in parts] == [
+        ("matches_2025", 1), ("matches_2026", 2), ("matches_2025", None)]
+    # Dòng không có ngày đi theo dòng trước nó
+    assert {name: frame["v"].tolist() for name, frame in frames} == {
+        "matches_2025": ["0", "3"], "matches_2026": ["1", "2"]}
+    # Vị trí của cả bảng -> vị trí trong bảng con của đoạn chứa nó
+    assert partitions.locate(parts, {0: "a", 1: "b", 2: "c", 3: "d"}) == {
+        "matches_2025": {0: "a", 1: "d"}, "matches_2026": {0: "b", 1: "c"}}
+
+
+def test_legacy_sheet_is_split_and_keeps_header():
+    legacy = pd.DataFrame([match_row("01/01/2025"), match_row("01/03/2026")]).astype(str)
+    backend = use_backend({MATCH_SHEET: legacy})
+    assert load_matches()["Ngày"].tolist() == ["01/01/2025", "01/03/2026"]
+    assert _segments() == [("matches_2025", 1), ("matches_2026", None)]
+    left = backend.read(MATCH_SHEET)
+    assert left.empty and list(left.columns) == list(legacy.columns)
+
+
+# -------- Ghi thêm ----------
+def test_rollover_opens_next_year(backend):
+    setup_club(["01/12/2025", "31/12/2025"])
+    append_matches([match_row("01/01/2026")])
+    write_queue.flush()
+    assert _segments() == [("matches_2025", 2), ("matches_2026", None)]
+    assert len(backend.read("matches_2026")) == 1
+
+
+def test_back_dated_rows_go_to_their_own_year(backend):
+    setup_club(["01/01/2026", "02/01/2026"])
+    append_matches([match_row("05/03/2024"), match_row("06/03/2025")])
+    append_matches([match_row("03/01/2026")])
+    write_queue.flush()
+    assert _segments() == [("matches_2026", 2), ("matches_2024", 1), ("matches_2025", 1), ("matches_2026", None)]
+    assert backend.read("matches_2026")["Ngày"].tolist() == ["01/01/2026", "02/01/2026", "03/01/2026"]
+    # Thứ tự dòng của cả bảng (và Mã trận) là thứ tự ghi
+    invalidate_sheet()
+    assert load_matches()["Ngày"].tolist() == ["01/01/2026", "02/01/2026", "05/03/2024", "06/03/2025", "03/01/2026"]
+    parts = _load_typed(PARTICIPATION_SHEET)
+    assert parts.groupby("Mã trận")["Ngày"].first().tolist() == load_matches()["Ngày"].tolist()
+
+
+def test_history_import_fills_year_partitions(backend):
+    setup_club(["01/01/2026"])
+    history = "Ngày,Đội thắng,Đội thua\n" + "".join(
+        f"0{day}/0{month}/{year},A B,C D\n" for year in (2025, 2024) for month in (1, 2) for day in (1, 2))
+    report = import_file(MATCH_SHEET, io.BytesIO(history.encode()), "history.csv", chunk_rows=3)
+    assert report["written"] == 8
+    assert len(backend.read("matches_2024")) == 4
+    assert len(backend.read("matches_2025")) == 4
+    assert len(backend.read("matches_2026")) == 1
+    # Đọc một tháng của 2024 không phải đọc bảng con của năm khác
+    invalidate_sheet()
+    backend.full_reads.clear()
+    backend.row_reads.clear()
+    assert len(load_matches_between(pd.Timestamp("2024-01-01"), pd.Timestamp("2024-01-31"))) == 2
+    read = set(backend.full_reads + backend.row_reads)
+    assert "matches_2024" in read and not read & {"matches_2025", "matches_2026"}
@@ -0,0 +1,60 @@
+# tests/test_repository.py
+# ID của dòng, sửa/xoá theo ID với kiểm tra xung đột, dòng đã xoá vẫn giữ chỗ.
+import pandas as pd
+import pytest
+from conftest import match_row, setup_club, use_backend
+from utils import write_queue
+from utils.gsheets import invalidate_sheet
+from utils.repository import (
+    append_matches, load_matches, update_row, delete_rows, live_rows, ConflictError,
+    ID_COLUMN, DELETED_COLUMN, MATCH_SHEET, PARTICIPATION_SHEET
+)
+from utils.repository import _load_typed
+
+
+def test_ids_are_assigned_to_new_and_legacy_rows():
+    legacy = pd.DataFrame([match_row("01/01/2026"), match_row("02/01/2026")]).astype(str)
+    backend = use_backend({MATCH_SHEET: legacy})
+    ids = load_matches()[ID_COLUMN].tolist()
+    assert all(ids) and len(set(ids)) == 2
+    append_matches([match_row("03/01/2026")])
+    write_queue.flush()
+    invalidate_sheet()
+    df = load_matches()
+    assert df[ID_COLUMN].tolist()[:2] == ids and df[ID_COLUMN].iloc[2] not in ids
+    assert backend.read("matches_2026")[ID_COLUMN].tolist() == df[ID_COLUMN].tolist()
+
+
+def test_update_row_in_earlier_segment(backend):
+    setup_club(["01/01/2026"])
+    append_matches([match_row("05/03/2024")])
+    append_matches([match_row("02/01/2026")])
+    write_queue.flush()
+    row = live_rows(load_matches()).iloc[1]
+    update_row(MATCH_SHEET, row, {"Đội thắng": "A C", "Đội thua": "B D"})
+    assert backend.read("matches_2024")["Đội thắng"].tolist() == ["A C"]
+    assert backend.read("matches_2026")["Đội thắng"].tolist() == ["A B", "A B"]
+
+
+def test_stale_row_raises_conflict(backend):
+    setup_club(["01/01/2026", "02/01/2026"])
+    row = live_rows(load_matches()).iloc[1]
+    # Người khác sửa đúng dòng đó trên sheet
+    backend.update_rows("matches_2026", {1: {"Đội thắng": "B A"}})
+    with pytest.raises(ConflictError):
+        update_row(MATCH_SHEET, row, {"Đội thua": "D C"})
+    assert backend.read("matches_2026")["Đội thua"].tolist() == ["C D", "C D"]
+
+
+def test_delete_keeps_positions(backend):
+    setup_club(["01/01/2026", "02/01/2026", "03/01/2026"])
+    df = load_matches()
+    delete_rows(MATCH_SHEET, [df.iloc[1]])
+    invalidate_sheet()
+    after = load_matches()
+    assert len(after) == 3
+    assert after[ID_COLUMN].tolist() == df[ID_COLUMN].tolist()
+    assert after.loc[1, DELETED_COLUMN] and after.loc[1, "Ngày"] == "02/01/2026" and after.loc[1, "Đội thắng"] == ""
+    assert live_rows(after)["Ngày"].tolist() == ["01/01/2026", "03/01/2026"]
+    parts = live_rows(_load_typed(PARTICIPATION_SHEET))
+    assert sorted(set(parts["Mã trận"])) == [0, 2]
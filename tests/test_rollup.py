@@ -0,0 +1,10 @@
+# tests/test_rollup.py
+# Bảng tổng hợp theo tháng (utils/rollup.py).
+import subprocess
+import sys
+from conftest import ROOT
+
+
+def test_rollup_imports_on_its_own():
+    # rollup import stats, stats dùng tên sheet tổng hợp lúc import: không được vòng lại rollup
+    subprocess.run([sys.executable, "-c", "import utils.rollup"], cwd=ROOT, check=True)
@@ -0,0 +1,30 @@
+# tests/test_row_index.py
+# Chỉ mục dòng (row_index): giữ đúng khi ghi thêm, đọc một tháng chỉ đọc các đoạn dòng cần thiết.
+import pandas as pd
+from conftest import match_row, setup_club
+from utils import row_index, write_queue
+from utils.gsheets import invalidate_sheet, _row_indexes
+from utils.repository import append_matches, load_participations_between, MATCH_SHEET, PARTICIPATION_SHEET
+
+
+def test_row_index_follows_appends(backend):
+    setup_club(["01/01/2026", "02/02/2026"])
+    append_matches([match_row("03/02/2026"), match_row("01/06/2025"), match_row("04/02/2026")])
+    write_queue.flush()
+    invalidate_sheet()
+    indexes = _row_indexes()
+    for name in ("matches_2025", "matches_2026", PARTICIPATION_SHEET):
+        keys = row_index.frame_keys(backend.read(name))
+        assert indexes[name].compare(keys) == "ok", name
+
+
+def test_month_read_of_participations_uses_row_index(backend):
+    setup_club([f"{day:02d}/{month:02d}/2026" for month in (1, 2, 3) for day in range(1, 11)])
+    # Lần đầu: kiểm tra participations khớp matches (và dựng chỉ mục nếu còn thiếu)
+    load_participations_between(pd.Timestamp("2026-02-01"), pd.Timestamp("2026-02-28"))
+    invalidate_sheet()
+    backend.full_reads.clear()
+    df = load_participations_between(pd.Timestamp("2026-02-01"), pd.Timestamp("2026-02-28"))
+    assert len(df) == 40
+    assert not [name for name in backend.full_reads if name.startswith(MATCH_SHEET) or name == PARTICIPATION_SHEET]
+    assert PARTICIPATION_SHEET in backend.row_reads
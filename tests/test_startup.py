@@ -0,0 +1,11 @@
+# tests/test_startup.py
+# Ngân sách thời gian import lúc khởi động (benchmarks/startup.py).
+import os
+from benchmarks import startup
+
+
+def test_startup_within_budget_without_heavy_modules():
+    budget = float(os.environ.get("PICKLEBALL_STARTUP_BUDGET_MS", startup.STARTUP_BUDGET_MS))
+    result = startup.run(repeat=3)
+    assert result["heavy_at_startup"] == []
+    assert result["startup_ms"] <= budget, result
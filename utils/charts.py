@@ -0,0 +1,112 @@
+# utils/charts.py
+# Vẽ biểu đồ của trang thống kê thành ảnh PNG và giữ lại theo hash của df_stats:
+# rerun với cùng dữ liệu chỉ lấy lại ảnh cũ, không dựng lại figure.
+# matplotlib chỉ được import khi thật sự phải vẽ.
+import io
+import threading
+from collections import OrderedDict
+import pandas as pd
+from utils import metrics
+
+# Số ảnh giữ lại tối đa (bỏ ảnh dùng lâu nhất khi vượt)
+CHART_CACHE_SIZE = 32
+# Giống mặc định của st.pyplot
+SAVEFIG_OPTIONS = {"format": "png", "bbox_inches": "tight", "dpi": 200}
+
+_lock = threading.Lock()
+_cache = OrderedDict()   # (loại biểu đồ, hash df_stats) -> PNG bytes
+_cache_stats = {"hits": 0, "misses": 0, "evictions": 0}
+
+
+def _frame_key(df):
+    hashes = pd.util.hash_pandas_object(df, index=False)
+    return (tuple(df.columns), len(df), int(hashes.sum()) % (1 << 64))
+
+
+def _bar_png(labels, values, text, title, ylabel, color=None):
+    # Dùng Figure trực tiếp (không qua pyplot) nên figure không bị giữ trong bộ quản lý
+    # figure toàn cục và an toàn khi nhiều phiên vẽ cùng lúc
+    from matplotlib.figure import Figure
+
+    fig = Figure()
+    try:
+        ax = fig.subplots()
+        bars = ax.bar(labels, values, color=color)
+
+        # Hiển thị số trên mỗi cột
+        for bar in bars:
+            height = bar.get_height()
+            ax.text(
+                bar.get_x() + bar.get_width() / 2,
+                height,
+                text(height),
+                ha="center", va="bottom", fontsize=9
+            )
+        ax.set_ylabel(ylabel)
+        ax.set_title(title)
+
+        ax.set_xticks(range(len(labels)))
+        ax.set_xticklabels(labels, rotation=0, ha="center")
+
+        ax.grid(True, axis="y")
+        buf = io.BytesIO()
+        fig.savefig(buf, **SAVEFIG_OPTIONS)
+        return buf.getvalue()
+    finally:
+        fig.clear()
+
+
+def _ranking(df_stats):
+    df = df_stats.sort_values("Tổng tiền", ascending=False)
+    return _bar_png(df["Tên"].tolist(), df["Tổng tiền"].tolist(), lambda h: f"{h:,}",   # format có dấu phẩy
+                    "Bảng xếp hạng", "Tổng tiền (VND)")
+
+
+def _loss_ratio(df_stats):
+    df = df_stats.copy()
+    df["Tỉ lệ thua (%)"] = (
+        df["Số trận thua"] * 100 /
+        (df["Số trận thắng"] + df["Số trận thua"]).replace(0, 1)
+    ).round(1)
+    df = df.sort_values("Tỉ lệ thua (%)", ascending=False)
+    return _bar_png(df["Tên"].tolist(), df["Tỉ lệ thua (%)"].tolist(), lambda h: f"{h:.1f}%",
+                    "Tỉ lệ thua", "Tỉ lệ thua (%)", color="orange")
+
+
+_RENDERERS = {"ranking": _ranking, "loss_ratio": _loss_ratio}
+
+
+def _chart(kind, df_stats):
+    key = (kind,) + _frame_key(df_stats)
+    with _lock:
+        png = _cache.get(key)
+        if png is not None:
+            _cache.move_to_end(key)
+            _cache_stats["hits"] += 1
+            return png
+        _cache_stats["misses"] += 1
+    with metrics.span(f"render_chart[{kind}]"):
+        png = _RENDERERS[kind](df_stats)
+    with _lock:
+        _cache[key] = png
+        _cache.move_to_end(key)
+        while len(_cache) > CHART_CACHE_SIZE:
+            _cache.popitem(last=False)
+            _cache_stats["evictions"] += 1
+    return png
+
+
+# -------- API ----------
+def ranking_chart(df_stats):
+    """PNG biểu đồ tổng tiền theo người."""
+    return _chart("ranking", df_stats)
+
+
+def loss_ratio_chart(df_stats):
+    """PNG biểu đồ tỉ lệ thua theo người."""
+    return _chart("loss_ratio", df_stats)
+
+
+def get_chart_cache_stats():
+    with _lock:
+        return dict(_cache_stats, size=len(_cache))
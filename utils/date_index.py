@@ -0,0 +1,50 @@
+# utils/date_index.py
+# Chỉ mục ngày: sắp xếp các dòng theo ngày một lần khi tải dữ liệu, sau đó
+# lọc theo một ngày hay một khoảng ngày chỉ cần tìm nhị phân (O(log n)).
+import numpy as np
+import pandas as pd
+from utils import metrics
+
+
+class DateIndex:
+    @metrics.timed("DateIndex")
+    def __init__(self, dates: pd.Series):
+        values = dates.to_numpy(dtype="datetime64[ns]")
+        valid = np.flatnonzero(~np.isnat(values))
+        keys = values[valid].astype("int64")
+        order = np.argsort(keys, kind="stable")
+        # Vị trí dòng (theo thứ tự ngày) và ngày tương ứng đã sắp xếp
+        self.positions = valid[order]
+        self.keys = keys[order]
+        # Các ngày khác nhau (đã sắp xếp)
+        self.days = np.unique(self.keys)
+
+    def __len__(self):
+        return len(self.positions)
+
+    @staticmethod
+    def _key(ts):
+        return pd.Timestamp(ts).as_unit("ns").value
+
+    def _slice(self, lo, hi):
+        # Giữ thứ tự dòng gốc trong kết quả
+        return np.sort(self.positions[lo:hi])
+
+    def between(self, start, end):
+        """Vị trí các dòng có ngày trong [start, end]."""
+        lo = np.searchsorted(self.keys, self._key(start), side="left")
+        hi = np.searchsorted(self.keys, self._key(end), side="right")
+        return self._slice(lo, hi)
+
+    def month(self, year, month):
+        start = pd.Timestamp(year=int(year), month=int(month), day=1)
+        return self.between(start, start + pd.offsets.MonthEnd(0))
+
+    def years(self):
+        if not len(self.days):
+            return []
+        return sorted(pd.DatetimeIndex(self.days).year.unique().tolist())
+
+
+def take(df, positions):
+    return df.iloc[positions].reset_index(drop=True)
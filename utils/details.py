@@ -1,97 +1,42 @@
 import streamlit as st
 import pandas as pd
 import os
-from utils.member import load_members   
-from utils.gsheets import load_sheet
+from utils.repository import (
+    load_participations_between, load_funds_between, parse_dates, FUND_SHEET, PARTICIPATION_SHEET
+)
+from utils.players import LOSER
+from utils import metrics
 import datetime
 
-def load_matches():
-    # Đọc từ Google Sheets
-    df = load_sheet("matches")
-    if df.empty:
-        df = pd.DataFrame(columns=["Ngày", "Đội thắng", "Đội thua","Giá"])
-
-    # Chuẩn hóa dữ liệu
-    df = df.replace("nan", "", regex=False).fillna("")
-    df["Ngày"] = df["Ngày"].astype(str).str.strip()
-    df["Đội thua"] = df["Đội thua"].astype(str).str.strip()
-    df["Đội thắng"] = df["Đội thắng"].astype(str).str.strip()
-    if "Giá" not in df.columns:
-        df["Giá"] = -1
-    df["Giá"] = df["Giá"].fillna(-1).astype(int)
-    return df
-
-def load_funds():
-    df = load_sheet("funds")
-    if df.empty:
-        df = pd.DataFrame(columns=["Ngày", "Ghi chú", "Giá"])
-    df = df.fillna("")
-    df["Ngày"] = df["Ngày"].astype(str).str.strip()
-    df["Ghi chú"] = df["Ghi chú"].astype(str).str.strip()
-    df["Giá"] = pd.to_numeric(df["Giá"], errors="coerce").fillna(0).astype(int)
-    return df
-
-def get_detail_df(df_matches, start_date, end_date):
-    if df_matches.empty:
-        return pd.DataFrame()
+# Các sheet trang này đọc (để nạp sẵn khi người dùng đang ở trang khác)
+PAGE_SHEETS = [PARTICIPATION_SHEET, FUND_SHEET]
 
-    members_df = load_members()
-    gia_map = dict(zip(members_df["Tên"], members_df["Giá thua"]))
+@metrics.timed("get_detail_df")
+def get_detail_df(df_parts, start_date, end_date):
+    if df_parts.empty:
+        return pd.DataFrame()
 
-    df_matches["Ngày_dt"] = pd.to_datetime(df_matches["Ngày"], format="%d/%m/%Y", errors="coerce")
-    df_filtered = df_matches[
-        (df_matches["Ngày_dt"] >= start_date) &
-        (df_matches["Ngày_dt"] <= end_date)
-    ]
+    # Bảng participations đã tách sẵn từng người, chỉ cần lọc theo ngày rồi gom
+    ngay_dt = df_parts["Ngày_dt"] if "Ngày_dt" in df_parts else parse_dates(df_parts["Ngày"])
+    df_filtered = df_parts[(ngay_dt >= start_date) & (ngay_dt <= end_date)]
     if df_filtered.empty:
         return pd.DataFrame()
 
-    records = []
-    for _, row in df_filtered.iterrows():
-        ngay = row["Ngày"]
-        doi_thang = [n.strip() for n in str(row["Đội thắng"]).split() if n.strip()]
-        doi_thua = [n.strip() for n in str(row["Đội thua"]).split() if n.strip()]
-        gia = int(row.get("Giá", -1))
-
-        # names = [n.strip() for n in doi_thua.split() if n.strip()]
-        for name in doi_thua:
-            if gia > 0:
-                fee = gia
-            else:
-                fee = gia_map.get(name, 5000)
-            records.append({
-                "Ngày": ngay,
-                "Tên": name,
-                "Số trận thắng": 0,
-                "Số trận thua": 1,
-                "Giá": fee,
-                "Tổng tiền": fee
-            })
-
-        for name in doi_thang:
-            if gia > 0:
-                fee = gia
-            else:
-                fee = gia_map.get(name, 5000)
-            records.append({
-                "Ngày": ngay,
-                "Tên": name,
-                "Số trận thắng": 1,
-                "Số trận thua": 0,
-                "Giá": fee,
-                "Tổng tiền": 0
-            })
-    if not records:
-        return pd.DataFrame()
-    
-    df_detail = pd.DataFrame(records)
+    loser = (df_filtered["Bên"] == LOSER).astype(int)
+    records = pd.DataFrame({
+        "Ngày": df_filtered["Ngày"],
+        "Tên": df_filtered["Tên"].astype(str),
+        "Số trận thua": loser,
+        "Số trận thắng": 1 - loser,
+        "Giá": df_filtered["Giá"].astype("int64"),
+    })
+
     df_detail = (
-        df_detail.groupby(["Ngày", "Tên"], as_index=False)
+        records.groupby(["Ngày", "Tên"], as_index=False)
         .agg({
             "Số trận thua": "sum",
             "Số trận thắng": "sum",
             "Giá": "max",
-            "Tổng tiền": "sum"
         })
         .sort_values(["Ngày", "Tên"])
         .reset_index(drop=True)
@@ -105,10 +50,6 @@ def show_detail_page():
     st.markdown("<h2 style='text-align: center;'>BẢNG CHI TIẾT TỪNG NGÀY</h2>", unsafe_allow_html=True)
 
     st.subheader("Bảng chi tiết từng giá")
-    df_matches = load_matches()
-    if df_matches.empty:
-        st.info("Chưa có dữ liệu trận thua nào.")
-        return
 
     # # Chọn khoảng ngày bằng text_input với định dạng dd/mm/yyyy
     # min_date = pd.to_datetime(df_matches["Ngày"], format="%d/%m/%Y", errors="coerce").min()
@@ -133,7 +74,9 @@ def show_detail_page():
         return
 
 
-    df_detail = get_detail_df(df_matches, pd.to_datetime(start_date), pd.to_datetime(end_date))
+    # Chỉ đọc các trận trong khoảng ngày đã chọn
+    df_parts = load_participations_between(start_date, end_date)
+    df_detail = get_detail_df(df_parts, pd.to_datetime(start_date), pd.to_datetime(end_date))
     if df_detail.empty:
         st.info(f"Không có dữ liệu trong khoảng {start_date.strftime('%d/%m/%Y')} - {end_date.strftime('%d/%m/%Y')}.")
         return
@@ -151,19 +94,10 @@ def show_detail_page():
 
      # --- Quỹ (Funds) ---
     st.subheader("Danh sách thu chi quỹ")
-    df_funds = load_funds()
-    if df_funds.empty:
-        st.info("Chưa có dữ liệu quỹ.")
+    # Lọc theo khoảng ngày
+    df_f_month = load_funds_between(start_date, end_date)
+    if df_f_month.empty:
+        st.info("Không có dữ liệu trích thu trong tháng này.")
     else:
-        # Lọc theo khoảng ngày
-        df_funds["Ngày_dt"] = pd.to_datetime(df_funds["Ngày"], format="%d/%m/%Y", errors="coerce")
-        df_f_month = df_funds[
-            (df_funds["Ngày_dt"] >= pd.to_datetime(start_date)) &
-            (df_funds["Ngày_dt"] <= pd.to_datetime(end_date))
-        ]
-        if df_f_month.empty:
-            st.info("Không có dữ liệu trích thu trong tháng này.")
-        else:
-            df_f_month = df_f_month.copy()
-            df_f_month["Quỹ"] = df_f_month["Giá"].apply(lambda x: f"{x:+,}")
-            st.dataframe(df_f_month[["Ngày", "Ghi chú", "Quỹ"]].reset_index(drop=True), use_container_width=True, hide_index=True)
\ No newline at end of file
+        df_f_month["Quỹ"] = df_f_month["Giá"].apply(lambda x: f"{x:+,}")
+        st.dataframe(df_f_month[["Ngày", "Ghi chú", "Quỹ"]].reset_index(drop=True), use_container_width=True, hide_index=True)
\ No newline at end of file
@@ -1,89 +1,169 @@
+import threading
 import streamlit as st
+import numpy as np
 import pandas as pd
-from utils.gsheets import load_sheet, save_sheet
-from utils.input_info import load_matches
-from utils.stats import get_stats
-
-
-FUND_SHEET = "funds"
-
-# -------- Funds ----------
-def load_funds():
-    df = load_sheet(FUND_SHEET)
+from utils.repository import (
+    load_many, load_funds, load_indexed, load_player_index, save_funds, append_funds, update_fund_rows,
+    delete_fund_rows, live_rows, delete_rows, ConflictError, MATCH_SHEET, FUND_SHEET, MEMBER_SHEET, PARTICIPATION_SHEET,
+    ROLLUP_STATS_SHEET, ROLLUP_FUNDS_SHEET, FUND_COLUMNS
+)
+from utils.stats import get_monthly_stats
+from utils import rollup, write_queue
+from utils.date_index import take
+from utils.importer import show_import_section
+
+# Các sheet trang này đọc (để nạp sẵn khi người dùng đang ở trang khác)
+PAGE_SHEETS = [MATCH_SHEET, FUND_SHEET, MEMBER_SHEET, PARTICIPATION_SHEET,
+               ROLLUP_STATS_SHEET, ROLLUP_FUNDS_SHEET]
+
+# Chữ ký của từng tháng ở lần chốt quỹ gần nhất: (năm, tháng) -> (hash các trận, các dòng tổng
+# tự sinh). Dùng chung cho cả process, chỉ tháng nào có chữ ký khác mới phải tính lại.
+_closed_months = {}
+_close_lock = threading.Lock()
+# Số lần ghi nền thất bại đã biết; nếu tăng thì chốt lại mọi tháng
+_seen_failures = 0
+
+def _month_signatures(df_matches):
+    # Giá mỗi người đã chốt lúc nhập trận (participations) nên đổi giá hội viên không làm đổi tháng cũ
+    cols = ["Ngày", "Đội thắng", "Đội thua", "Giá"]
+    row_hash = pd.util.hash_pandas_object(df_matches[cols].astype(str), index=False)
+    keys = [df_matches["Ngày_dt"].dt.year, df_matches["Ngày_dt"].dt.month]
+    grouped = row_hash.groupby(keys).agg(["sum", "size"])
+    return {
+        (int(y), int(m)): (int(row["sum"]), int(row["size"]))
+        for (y, m), row in grouped.iterrows()
+    }
+
+def _auto_note(m):
+    return f"{rollup.AUTO_FUND_NOTE} {m}"
+
+def _auto_rows(df_funds):
+    # Giá các dòng tổng tự sinh của từng tháng (ghi ngày cuối tháng), để dòng bị sửa/xoá tay
+    # cũng làm tháng đó phải chốt lại
+    df = df_funds.dropna(subset=["Ngày_dt"])
+    df = df[df["Ghi chú"].str.startswith(rollup.AUTO_FUND_NOTE)]
     if df.empty:
-        df = pd.DataFrame(columns=["Ngày", "Ghi chú", "Giá"])
-    df = df.fillna("")
-    df["Ngày"] = df["Ngày"].astype(str).str.strip()
-    df["Ghi chú"] = df["Ghi chú"].astype(str).str.strip()
-    df["Giá"] = pd.to_numeric(df["Giá"], errors="coerce").fillna(0).astype(int)
-    return df
-
-def save_funds(df: pd.DataFrame):
-    save_sheet(FUND_SHEET, df)
+        return {}
+    dates = df["Ngày_dt"]
+    auto = (df["Ghi chú"] == rollup.AUTO_FUND_NOTE + " " + dates.dt.month.astype(str)) & dates.dt.is_month_end
+    df = df[auto]
+    return {
+        (int(y), int(m)): tuple(sorted(int(v) for v in group["Giá"]))
+        for (y, m), group in df.groupby([df["Ngày_dt"].dt.year, df["Ngày_dt"].dt.month])
+    }
 
 def update_fund():
-       # --- Lưu tổng tiền thua của tất cả các tháng vào quỹ ---
-    df_funds = load_funds()
-    df_matches = load_matches()
-    members_df = load_sheet("members")
-
-    # Chuyển đổi cột Ngày
-    df_matches["Ngày_dt"] = pd.to_datetime(df_matches["Ngày"], format="%d/%m/%Y", errors="coerce")
-
-    # Lấy tất cả (năm, tháng) có trận
-    month_years = df_matches.dropna(subset=["Ngày_dt"]).groupby([df_matches["Ngày_dt"].dt.year,
-                                                                df_matches["Ngày_dt"].dt.month])
-
-    for (y, m), group in month_years:
-        df_stats, total = get_stats(group, members_df)
-
-        if total == 0:  
-            continue  # không có gì thì bỏ qua
-
-        # format ngày cuối tháng
-        ngay_cuoi_thang = pd.Timestamp(year=y, month=m, day=1) + pd.offsets.MonthEnd(0)
-        ngay_str = ngay_cuoi_thang.strftime("%d/%m/%Y")
-
-        # xoá nếu đã có để tránh trùng
-        mask = (df_funds["Ghi chú"] == f"Tổng thu quỹ tháng {m}") & (df_funds["Ngày"] == ngay_str)
-        df_funds = df_funds[~mask]
-
-        # thêm dòng mới
-        new_row = pd.DataFrame([{
-            "Ngày": ngay_str,
-            "Ghi chú": f"Tổng thu quỹ tháng {m}",
-            "Giá": total
-        }])
-        df_funds = pd.concat([df_funds, new_row], ignore_index=True)
-
-    # Lưu lại tất cả
-    save_funds(df_funds)
+       # --- Lưu tổng tiền thua của các tháng có thay đổi vào quỹ ---
+    # Đọc cả ba sheet trong một request; funds cũng được trang quỹ dùng ngay sau đó
+    _, df_funds, members_df, _ = load_many(MATCH_SHEET, FUND_SHEET, MEMBER_SHEET, PARTICIPATION_SHEET)
+    df_matches, players = load_player_index()
+
+    valid = df_matches["Ngày_dt"].notna().to_numpy()
+
+    global _seen_failures
+    with _close_lock:
+        failures = write_queue.failure_count()
+        if failures != _seen_failures:
+            _closed_months.clear()
+            _seen_failures = failures
+
+        matches_sig = _month_signatures(df_matches[valid])
+        auto_rows = _auto_rows(df_funds)
+        signatures = {key: (matches_sig.get(key), auto_rows.get(key, ()))
+                      for key in set(matches_sig) | set(auto_rows)}
+        dirty = {key: sig for key, sig in signatures.items() if _closed_months.get(key) != sig}
+        if not dirty:
+            return 0
+
+        # Chỉ tính lại các tháng bị thay đổi
+        month_key = list(zip(df_matches["Ngày_dt"].dt.year, df_matches["Ngày_dt"].dt.month))
+        positions = np.flatnonzero(valid & np.array([key in dirty for key in month_key], dtype=bool))
+        df_dirty = df_matches.iloc[positions]
+        _, month_totals = get_monthly_stats(df_dirty, members_df, players.select(positions))
+
+        new_rows = []
+        updates = {}
+        deleted = []
+        rewrite = False
+        # Mọi tháng bị thay đổi, kể cả tháng không còn trận nào (hoặc tổng về 0) mà vẫn còn dòng tổng cũ
+        for (y, m) in sorted(dirty):
+            total = int(month_totals.get((y, m), 0))
+            # Sau khi ghi, tháng này còn đúng một dòng tổng (hoặc không còn dòng nào nếu tổng là 0)
+            dirty[(y, m)] = (dirty[(y, m)][0], (total,) if total else ())
+
+            # format ngày cuối tháng
+            ngay_cuoi_thang = pd.Timestamp(year=y, month=m, day=1) + pd.offsets.MonthEnd(0)
+            ngay_str = ngay_cuoi_thang.strftime("%d/%m/%Y")
+
+            mask = (df_funds["Ghi chú"] == _auto_note(m)) & (df_funds["Ngày"] == ngay_str)
+            existing = df_funds.index[mask]
+            row = {"Ngày": ngay_str, "Ghi chú": _auto_note(m), "Giá": total}
+            if len(existing) == 0:
+                if total:
+                    new_rows.append(row)
+            elif len(existing) == 1:
+                if total == 0:
+                    deleted.append(existing[0])   # không còn gì để thu: xoá dòng tổng cũ
+                elif int(df_funds.at[existing[0], "Giá"]) != total:
+                    # chỉ ghi ô Giá nếu tổng thay đổi
+                    updates[existing[0]] = {"Giá": total}
+            else:
+                # có dòng trùng: xoá hết rồi thêm lại một dòng (phải ghi lại cả bảng)
+                df_funds = df_funds[~mask]
+                if total:
+                    new_rows.append(row)
+                rewrite = True
+
+        writes = 0
+        if rewrite:
+            df_funds = df_funds.drop(index=deleted)
+            for idx, values in updates.items():
+                for col, value in values.items():
+                    df_funds.at[idx, col] = value
+            # Dòng mới phải có đủ cột (ô trống chứ không phải NaN, Sheets không nhận NaN)
+            added = pd.DataFrame(new_rows).reindex(columns=FUND_COLUMNS).fillna("")
+            df_funds = pd.concat([df_funds, added], ignore_index=True)
+            save_funds(df_funds)
+            writes = 1
+        else:
+            if updates:
+                writes += update_fund_rows(updates)
+            if deleted:
+                writes += delete_fund_rows(deleted)
+            if new_rows:
+                writes += append_funds(new_rows)
+
+        _closed_months.update(dirty)
+        return writes
 
 def show_monthly_summary():
-    df = load_funds()
-    if df.empty:
+    # Tổng theo tháng đọc từ bảng tổng hợp
+    _, monthly_summary = rollup.load_rollups()
+    if monthly_summary.empty:
         st.info("Chưa có dữ liệu quỹ.")
         return
-    
-    # Chuyển đổi Ngày thành datetime
-    df["Ngày_dt"] = pd.to_datetime(df["Ngày"], format="%d/%m/%Y", errors="coerce")
-    df = df.dropna(subset=["Ngày_dt"])
-    
-    # Gom theo tháng/năm
-    df["Tháng"] = df["Ngày_dt"].dt.month
-    df["Năm"] = df["Ngày_dt"].dt.year
-    monthly_summary = df.groupby(["Năm", "Tháng"])["Giá"].sum().reset_index()
+
     monthly_summary = monthly_summary.sort_values(["Năm", "Tháng"])
     
     # Format cột hiển thị
     monthly_summary["Tháng/Năm"] = monthly_summary["Tháng"].astype(str) + "/" + monthly_summary["Năm"].astype(str)
-    monthly_summary["Tổng"] = monthly_summary["Giá"].apply(lambda x: f"{x:+,}")
+    monthly_summary["Tổng"] = monthly_summary["Tổng"].apply(lambda x: f"{x:+,}")
     
     st.subheader("Tổng thu chi theo tháng")
     st.dataframe(monthly_summary[["Tháng/Năm", "Tổng"]].reset_index(drop=True), use_container_width=True, hide_index=True)
 
 
 
+def _delete_funds(rows, message):
+    try:
+        delete_rows(FUND_SHEET, rows)
+    except ConflictError as exc:
+        st.warning(str(exc))
+        return
+    st.success(message)
+    st.rerun()
+
+
 def show_fund_page():
     update_fund()
     st.markdown("<h2 style='text-align: center;'>QUỸ NHÓM</h2>", unsafe_allow_html=True)
@@ -105,31 +185,26 @@ def show_fund_page():
 
     if fund_submit:
         if fund_value != 0: 
-            df_funds = load_funds()
-            new_row = pd.DataFrame([{"Ngày": ngay_str, "Ghi chú": note, "Giá": int(fund_value)}])
-            df_funds = pd.concat([df_funds, new_row], ignore_index=True)
-            save_funds(df_funds)
+            append_funds([{"Ngày": ngay_str, "Ghi chú": note, "Giá": int(fund_value)}])
             st.success(f"Đã lưu vào quỹ {'thu' if fund_value>0 else 'chi'} {abs(fund_value):,}")
 
+    show_import_section(FUND_SHEET)
+
     # --- Lọc theo tháng/năm ---
-    df = load_funds()
+    df, funds_index = load_indexed(FUND_SHEET)
     if df.empty:
         st.info("Chưa có dữ liệu thu/chi quỹ.")
         return
 
     st.subheader("Danh sách thu chi quỹ")
 
-    # Tách cột tháng/năm từ "Ngày"
-    df["Ngày_dt"] = pd.to_datetime(df["Ngày"], format="%d/%m/%Y", errors="coerce")
-    df["Tháng"] = df["Ngày_dt"].dt.month
-    df["Năm"] = df["Ngày_dt"].dt.year
-
     col1, col2 = st.columns(2)
     month = col1.selectbox("Chọn tháng", list(range(1, 13)), index=pd.Timestamp.now().month-1)
-    year = col2.selectbox("Chọn năm", sorted(df["Năm"].dropna().unique()), 
-                          index=len(sorted(df["Năm"].dropna().unique()))-1)
+    years = funds_index.years()
+    year = col2.selectbox("Chọn năm", years, index=len(years)-1)
 
-    df_month = df[(df["Tháng"] == month) & (df["Năm"] == year)]
+    # Lấy các dòng của tháng qua chỉ mục ngày
+    df_month = live_rows(take(df, funds_index.month(year, month)))
 
     if df_month.empty:
         st.info("Không có thu chi trong tháng này.")
@@ -138,43 +213,21 @@ def show_fund_page():
         df_month_show["Giá"] = df_month_show["Giá"].apply(lambda x: f"{x:+,}")
         st.dataframe(df_month_show[["Ngày", "Ghi chú", "Giá"]].reset_index(drop=True), use_container_width=True, hide_index=True)
 
-        # # --- Nút xoá ---
-        # st.markdown("### Xoá dữ liệu thu chi")
-
-        # # Xoá toàn bộ trong tháng đã chọn
-        # if st.button(f"Xoá tất cả", key=f"del_fund_month_{month}_{year}"):
-        #     df_all = load_funds()
-        #     # chuyển ngày sang datetime để lọc an toàn
-        #     df_all["Ngày_dt"] = pd.to_datetime(df_all["Ngày"], format="%d/%m/%Y", errors="coerce")
-        #     df_all = df_all[~((df_all["Ngày_dt"].dt.month == month) & (df_all["Ngày_dt"].dt.year == year))]
-        #     df_all = df_all.reset_index(drop=True)
-        #     save_funds(df_all)
-        #     st.success(f"Đã xoá toàn bộ thu/chi trong tháng {month}/{year}.")
-        #     st.rerun()
-
-        # # Hiện từng ngày và cho xóa từng dòng
-        # for ngay, group in df_month.groupby("Ngày"):
-        #     st.markdown(f"**Ngày {ngay}**")
-        #     for _, row in group.iterrows():
-        #         col1, col2 = st.columns([6, 1])
-        #         col1.write(f"{row['Ghi chú']} ({row['Giá']:+,} VNĐ)")
-        #         # dùng row.name làm key để giữ unique, khi xóa thì tìm và xoá hàng tương ứng trong sheet
-        #         if col2.button("❌", key=f"del_fund_{ngay}_{row.name}"):
-        #             df_all = load_funds()
-        #             # tìm index đầu tiên khớp (Ngày, Ghi chú, Giá) để tránh sai index
-        #             cond = (
-        #                 (df_all["Ngày"] == row["Ngày"]) &
-        #                 (df_all["Ghi chú"] == row["Ghi chú"]) &
-        #                 (pd.to_numeric(df_all["Giá"], errors="coerce").fillna(0).astype(int) == int(row["Giá"]))
-        #             )
-        #             idxs = df_all[cond].index.tolist()
-        #             if idxs:
-        #                 df_all = df_all.drop(idxs[0]).reset_index(drop=True)
-        #                 save_funds(df_all)
-        #                 st.success("Đã xoá 1 dòng quỹ.")
-        #                 st.rerun()
-        #             else:
-        #                 st.warning("Không tìm thấy dòng tương ứng để xóa.")
+        # --- Nút xoá ---
+        st.markdown("### Xoá dữ liệu thu chi")
+
+        # Xoá toàn bộ trong tháng đã chọn
+        if st.button(f"Xoá tất cả", key=f"del_fund_month_{month}_{year}"):
+            _delete_funds([row for _, row in df_month.iterrows()], f"Đã xoá toàn bộ thu/chi trong tháng {month}/{year}.")
+
+        # Hiện từng ngày và cho xóa từng dòng (theo ID của dòng)
+        for ngay, group in df_month.groupby("Ngày", sort=False):
+            st.markdown(f"**Ngày {ngay}**")
+            for _, row in group.iterrows():
+                col1, col2 = st.columns([6, 1])
+                col1.write(f"{row['Ghi chú']} ({row['Giá']:+,} VNĐ)")
+                if col2.button("❌", key=f"del_fund_{row['ID']}"):
+                    _delete_funds([row], "Đã xoá 1 dòng quỹ.")
 
     show_monthly_summary()
 
@@ -1,38 +1,948 @@
-import gspread
+import datetime
+import os
+import threading
+import time
+from collections import OrderedDict
 import streamlit as st
-from google.oauth2.service_account import Credentials
 import pandas as pd
-import gspread
+from utils.storage import SheetBackend, SQLiteBackend, cell_text
+from utils import metrics, partitions, row_index
+from utils.ratelimit import TokenBucket
 
 SPREADSHEET_URL = "https://docs.google.com/spreadsheets/d/1ThOEMd2B0q6BrW8h441eGxw5lXgr8FtTIwrDO_fKXGM/edit"
+SCOPES = ["https://www.googleapis.com/auth/spreadsheets",
+          "https://www.googleapis.com/auth/drive"]
+
+# Làm mới token trước khi hết hạn bao nhiêu giây
+TOKEN_REFRESH_MARGIN = 300
+
+# Cache đọc: tuổi tối đa của một bảng, khoảng cách giữa hai lần kiểm tra
+# phiên bản spreadsheet, và số bảng (kể cả các khoảng dòng đọc riêng) tối đa giữ trong bộ nhớ
+CACHE_TTL = 300
+CACHE_PROBE_INTERVAL = 10
+CACHE_MAX_SHEETS = 32
+
+# Quota của Google Sheets API cho mỗi user (service account): số request mỗi phút
+READ_REQUESTS_PER_MINUTE = 60
+WRITE_REQUESTS_PER_MINUTE = 60
+
+# -------- Pool kết nối dùng chung cho cả process ----------
+# Streamlit chỉ import module một lần, nên các biến dưới đây được chia sẻ
+# giữa mọi phiên trình duyệt và mọi thread chạy script.
+_pool_lock = threading.RLock()
+_creds = None
+_client = None
+_spreadsheet = None
+_worksheets = {}
+_refresher = None
+_pool_stats = {
+    "handshakes": 0,           # số lần authorize + open_by_url thật sự
+    "handshakes_saved": 0,     # số lần dùng lại client đã mở
+    "worksheet_lookups": 0,    # số lần gọi spreadsheet.worksheet()
+    "worksheet_hits": 0,       # số lần lấy worksheet từ cache
+    "token_refreshes": 0,
+}
+
+
+def _refresh_token_loop():
+    # Thread nền: làm mới token trước khi hết hạn để request không phải chờ
+    while True:
+        with _pool_lock:
+            creds = _creds
+        if creds is None:
+            return
+        expiry = creds.expiry
+        if expiry is None:
+            wait = 60
+        else:
+            # google-auth lưu expiry dạng UTC không kèm tzinfo
+            now = datetime.datetime.now(datetime.timezone.utc).replace(tzinfo=None)
+            wait = (expiry - now).total_seconds() - TOKEN_REFRESH_MARGIN
+        if wait > 0:
+            time.sleep(min(wait, 600))
+            continue
+        try:
+            from google.auth.transport.requests import Request
+            creds.refresh(Request())
+            with _pool_lock:
+                _pool_stats["token_refreshes"] += 1
+        except Exception:
+            # Lỗi mạng tạm thời: gspread vẫn tự refresh khi gửi request
+            time.sleep(30)
+
+
+def _get_spreadsheet():
+    global _creds, _client, _spreadsheet, _refresher
+    with _pool_lock:
+        if _spreadsheet is not None:
+            _pool_stats["handshakes_saved"] += 1
+            return _spreadsheet
+
+        # gspread và google-auth chỉ cần khi thật sự kết nối (backend SQLite không dùng tới)
+        import gspread
+        from google.oauth2.service_account import Credentials
+        _creds = Credentials.from_service_account_info(st.secrets["gcp_service_account"], scopes=SCOPES)
+        _client = gspread.authorize(_creds)
+        _spreadsheet = _client.open_by_url(SPREADSHEET_URL)
+        _pool_stats["handshakes"] += 1
+
+        if _refresher is None or not _refresher.is_alive():
+            _refresher = threading.Thread(target=_refresh_token_loop, name="gs-token-refresher", daemon=True)
+            _refresher.start()
+        return _spreadsheet
+
+
+def get_pool_stats():
+    with _pool_lock:
+        return dict(_pool_stats, cached_worksheets=len(_worksheets))
+
+
+def _cached_worksheet(sheet_name):
+    with _pool_lock:
+        sheet = _worksheets.get(sheet_name)
+        if sheet is not None:
+            _pool_stats["worksheet_hits"] += 1
+            _pool_stats["handshakes_saved"] += 1
+        return sheet
+
 
 # Kết nối tới Google Sheets
 def connect_gs(sheet_name):
-    scopes = ["https://www.googleapis.com/auth/spreadsheets",
-          "https://www.googleapis.com/auth/drive"]
-    creds = Credentials.from_service_account_info(st.secrets["gcp_service_account"], scopes=scopes)
+    sheet = _cached_worksheet(sheet_name)
+    if sheet is not None:
+        return sheet
+    # Chờ quota ngoài _pool_lock: get_backend() và các thread khác vẫn dùng được pool trong lúc chờ
+    _spend(GSheetsBackend, "lookup")
+    with _pool_lock:
+        sheet = _worksheets.get(sheet_name)
+        if sheet is not None:
+            # Thread khác vừa lấy xong trong lúc chờ quota
+            return sheet
+
+        import gspread
+        with metrics.span("connect_gs", kind="io"):
+            spreadsheet = _get_spreadsheet()
+            _pool_stats["worksheet_lookups"] += 1
+            try:
+                sheet = spreadsheet.worksheet(sheet_name)
+            except gspread.exceptions.WorksheetNotFound:
+                sheet = spreadsheet.add_worksheet(title=sheet_name, rows="1000", cols="20")
+        _worksheets[sheet_name] = sheet
+        return sheet
 
-    client = gspread.authorize(creds)
+def _spans(numbers):
+    """Các số nguyên đã sắp xếp -> các đoạn liền nhau [start, stop)."""
+    spans = []
+    for n in numbers:
+        if spans and spans[-1][1] == n:
+            spans[-1] = (spans[-1][0], n + 1)
+        else:
+            spans.append((n, n + 1))
+    return spans
 
-    spreadsheet = client.open_by_url(SPREADSHEET_URL)
+
+class GSheetsBackend(SheetBackend):
+    """Lưu dữ liệu trên Google Sheets, qua pool kết nối ở trên."""
+
+    name = "gsheets"
+    # header (row_values) là một request đọc; clear + update là hai request ghi
+    quota_costs = {
+        "lookup": {"read": 1},
+        "read": {"read": 1},
+        "read_many": {"read": 1},
+        "read_rows": {"read": 1},
+        "append": {"read": 1, "write": 1},
+        "update_rows": {"read": 1, "write": 1},
+        "replace": {"write": 2},
+    }
+
+    def read(self, sheet_name):
+        sheet = connect_gs(sheet_name)
+        data = sheet.get_all_values()
+        if not data:
+            return pd.DataFrame()
+        headers = data[0]
+        rows = data[1:]
+        return pd.DataFrame(rows, columns=headers)
+
+    def read_many(self, sheet_names):
+        # Một request values:batchGet cho tất cả các sheet
+        import gspread
+        for name in sheet_names:
+            connect_gs(name)  # tạo sheet nếu chưa có
+        response = _get_spreadsheet().values_batch_get([f"'{name}'" for name in sheet_names])
+        result = {}
+        for name, value_range in zip(sheet_names, response.get("valueRanges", [])):
+            data = gspread.utils.fill_gaps(value_range.get("values", []))
+            if not data:
+                result[name] = pd.DataFrame()
+            else:
+                result[name] = pd.DataFrame(data[1:], columns=data[0])
+        return result
+
+    def read_rows(self, sheet_name, ranges):
+        # Một request values:batchGet cho dòng header và các khoảng dòng (vd. 'matches_2026'!40:85)
+        connect_gs(sheet_name)
+        a1 = [f"'{sheet_name}'!1:1"] + [f"'{sheet_name}'!{start + 2}:{stop + 1}" for start, stop in ranges]
+        value_ranges = _get_spreadsheet().values_batch_get(a1).get("valueRanges", [])
+        values = [vr.get("values", []) for vr in value_ranges] + [[]] * (len(a1) - len(value_ranges))
+        header = values[0][0] if values[0] else []
+        width = len(header)
+        return [pd.DataFrame([(row + [""] * width)[:width] for row in rows], columns=header)
+                for rows in values[1:]]
+
+    def revision(self):
+        # Thời điểm sửa cuối của cả spreadsheet (Drive API), rẻ hơn nhiều so với tải lại dữ liệu
+        try:
+            return _get_spreadsheet().get_lastUpdateTime()
+        except Exception:
+            return None
+
+    def append(self, sheet_name, rows):
+        sheet = connect_gs(sheet_name)
+        header = sheet.row_values(1)
+        columns = list(header)
+        for row in rows:
+            for col in row:
+                if col not in columns:
+                    columns.append(col)
+        if columns != header:
+            sheet.update([columns], "A1")
+        values = [[cell_text(row.get(col, "")) for col in columns] for row in rows]
+        sheet.append_rows(values, insert_data_option="INSERT_ROWS", table_range="A1")
+        return len(values)
+
+    def update_rows(self, sheet_name, updates):
+        import gspread
+        sheet = connect_gs(sheet_name)
+        header = sheet.row_values(1)
+        columns = list(header)
+        for values in updates.values():
+            columns += [col for col in values if col not in columns]
+        if columns != header:
+            sheet.update([columns], "A1")   # cột mới (vd. ID) thêm vào cuối header
+        # Các ô liền nhau trên một dòng gửi thành một khoảng, các dòng liền nhau có cùng khoảng cột
+        # gộp thành một khối (vd. đánh dấu xoá cả ngày, cấp ID cho cả bảng)
+        blocks = {}
+        for idx, values in updates.items():
+            cells = {columns.index(col): cell_text(value) for col, value in values.items()}
+            for start, stop in _spans(sorted(cells)):
+                blocks.setdefault((start, stop), {})[int(idx)] = [cells[c] for c in range(start, stop)]
+        data = []
+        for (col_start, col_stop), rows in blocks.items():
+            for start, stop in _spans(sorted(rows)):
+                first = gspread.utils.rowcol_to_a1(start + 2, col_start + 1)
+                last = gspread.utils.rowcol_to_a1(stop + 1, col_stop)
+                data.append({"range": f"{first}:{last}", "values": [rows[r] for r in range(start, stop)]})
+        sheet.batch_update(data)
+        return sum(len(values) for values in updates.values())
+
+    def replace(self, sheet_name, df: pd.DataFrame):
+        sheet = connect_gs(sheet_name)
+        sheet.clear()
+        # Bảng rỗng vẫn ghi lại header (như SQLite giữ lại các cột)
+        if len(df.columns):
+            values = [[cell_text(value) for value in row] for row in df.itertuples(index=False)]
+            sheet.update([df.columns.values.tolist()] + values)
+
+
+# -------- Chọn backend ----------
+# Cấu hình bằng biến môi trường PICKLEBALL_STORAGE=sqlite (PICKLEBALL_SQLITE_PATH)
+# hoặc trong secrets:  [storage]  backend = "sqlite"  path = "pickleball.db"
+_backend = None
+
+
+def _storage_config():
+    config = {}
     try:
-        sheet = spreadsheet.worksheet(sheet_name)
-    except gspread.exceptions.WorksheetNotFound:
-        sheet = spreadsheet.add_worksheet(title=sheet_name, rows="1000", cols="20")
-    return sheet
+        config = dict(st.secrets.get("storage", {}))
+    except Exception:
+        pass  # không có file secrets
+    backend = os.environ.get("PICKLEBALL_STORAGE", config.get("backend", "gsheets"))
+    path = os.environ.get("PICKLEBALL_SQLITE_PATH", config.get("path", "pickleball.db"))
+    return backend, path
+
+
+def get_backend() -> SheetBackend:
+    global _backend
+    with _pool_lock:
+        if _backend is None:
+            backend, path = _storage_config()
+            if backend == "sqlite":
+                _backend = SQLiteBackend(path)
+            else:
+                _backend = GSheetsBackend()
+        return _backend
+
+
+def set_backend(backend: SheetBackend):
+    """Dùng backend khác (vd. SQLite cho benchmark/test); xoá cache đọc."""
+    global _backend
+    with _pool_lock:
+        _backend = backend
+    invalidate_sheet()
+
+
+# -------- Quota ----------
+# Dùng chung cho mọi phiên: hết quota đọc thì trả về bản cũ trong cache (nếu có)
+# thay vì gọi API rồi nhận lỗi 429; ghi thì chờ tới khi có quota.
+_quota = {
+    "read": TokenBucket(READ_REQUESTS_PER_MINUTE),
+    "write": TokenBucket(WRITE_REQUESTS_PER_MINUTE),
+}
+
+
+def _spend(backend, op):
+    """Chờ đủ quota cho một thao tác của backend."""
+    for kind, n in backend.quota_costs.get(op, {}).items():
+        if not _quota[kind].try_acquire(n):
+            with metrics.span("quota_wait", kind="io"):
+                _quota[kind].acquire(n)
+
+
+def _try_spend(backend, op):
+    """Lấy quota nếu có ngay (chỉ cho thao tác tốn một loại quota)."""
+    costs = backend.quota_costs.get(op, {})
+    return all(_quota[kind].try_acquire(n) for kind, n in costs.items())
+
+
+def read_quota_available():
+    """Số request đọc còn dùng được ngay (vô hạn nếu backend không bị giới hạn)."""
+    if not get_backend().quota_costs:
+        return float("inf")
+    return _quota["read"].available()
+
+
+def get_quota_stats():
+    return {kind: bucket.get_stats() for kind, bucket in _quota.items()}
+
+
+# -------- Cache đọc dùng chung giữa các phiên ----------
+_cache_lock = threading.Lock()
+_cache = OrderedDict()
+_cache_generation = 0
+_cache_stats = {"hits": 0, "probes": 0, "probe_hits": 0, "misses": 0, "invalidations": 0,
+                "stale_served": 0, "coalesced": 0, "partitions_pruned": 0,
+                "row_reads": 0, "row_index_mismatches": 0}
+# Single-flight: sheet đang được một thread tải -> Event báo tải xong
+_loading = {}
+
+
+def _store(sheet_name, df, revision):
+    global _cache_generation
+    now = time.monotonic()
+    with _cache_lock:
+        _cache_generation += 1
+        _cache[sheet_name] = {
+            "df": df,
+            "revision": revision,
+            "loaded_at": now,
+            "checked_at": now,
+            "generation": _cache_generation,
+        }
+        _cache.move_to_end(sheet_name)
+        while len(_cache) > CACHE_MAX_SHEETS:
+            _cache.popitem(last=False)
+        return _cache_generation
+
+
+def _cached(sheet_name, revision=None, probe=False):
+    """Entry còn dùng được trong cache hoặc None.
+
+    probe=True: entry đã quá khoảng tin cậy thì so với revision vừa hỏi.
+    """
+    now = time.monotonic()
+    with _cache_lock:
+        entry = _cache.get(sheet_name)
+        if entry is None or now - entry["loaded_at"] >= CACHE_TTL:
+            return None
+        _cache.move_to_end(sheet_name)
+        if now - entry["checked_at"] < CACHE_PROBE_INTERVAL:
+            if not probe:
+                _cache_stats["hits"] += 1
+            return entry
+        if not probe:
+            return None
+        _cache_stats["probes"] += 1
+        if revision is not None and revision == entry["revision"]:
+            _cache_stats["probe_hits"] += 1
+            entry["checked_at"] = now
+            return entry
+        return None
+
+
+def load_sheet_versioned(sheet_name):
+    """Trả về (DataFrame, generation) từ cache; không được sửa DataFrame trả về.
+
+    generation tăng mỗi khi bảng được tải lại, dùng làm khoá cho các cache dẫn xuất.
+    """
+    return load_sheets_versioned([sheet_name])[sheet_name]
+
+
+def _claim(sheet_names):
+    """Chia các sheet thành (sheet thread này tự tải, Event của các sheet thread khác đang tải)."""
+    mine, others = [], []
+    with _cache_lock:
+        for name in sheet_names:
+            event = _loading.get(name)
+            if event is None:
+                _loading[name] = threading.Event()
+                mine.append(name)
+            else:
+                others.append(event)
+        if others:
+            _cache_stats["coalesced"] += len(others)
+    return mine, others
+
+
+def _release(sheet_names):
+    with _cache_lock:
+        for name in sheet_names:
+            _loading.pop(name).set()
+
+
+def _stale(sheet_name):
+    # Bản trong cache dù đã quá hạn (chỉ dùng khi hết quota)
+    with _cache_lock:
+        entry = _cache.get(sheet_name)
+        if entry is not None:
+            _cache_stats["stale_served"] += 1
+        return entry
+
+
+def _fetch(backend, sheet_names, result):
+    # Hỏi phiên bản (một lần cho tất cả) trước khi tải để một lần ghi chen giữa không bị bỏ sót
+    with metrics.span("backend.revision", kind="io"):
+        revision = backend.revision()
+    missing = []
+    for name in sheet_names:
+        # Hết khoảng tin cậy: nếu phiên bản không đổi thì dùng lại dữ liệu cũ
+        entry = _cached(name, revision, probe=True)
+        if entry is not None:
+            result[name] = (entry["df"], entry["generation"])
+        else:
+            missing.append(name)
+    if not missing:
+        return
+
+    op = "read" if len(missing) == 1 else "read_many"
+    if not _try_spend(backend, op):
+        # Hết quota đọc: dùng bản cũ nếu có, chỉ chờ quota cho các sheet chưa từng tải
+        for name in list(missing):
+            entry = _stale(name)
+            if entry is not None:
+                result[name] = (entry["df"], entry["generation"])
+                missing.remove(name)
+        if not missing:
+            metrics.record("load_sheet (stale)", "cache", 0.0, rows=len(sheet_names))
+            return
+        op = "read" if len(missing) == 1 else "read_many"
+        _spend(backend, op)
+
+    with _cache_lock:
+        _cache_stats["misses"] += len(missing)
+    with metrics.span("load_sheet", kind="io") as s:
+        if len(missing) == 1:
+            frames = {missing[0]: backend.read(missing[0])}
+        else:
+            frames = backend.read_many(missing)
+        s.rows = sum(len(df) for df in frames.values())
+        s.size = sum(metrics.frame_bytes(df) for df in frames.values())
+    for name, df in frames.items():
+        result[name] = (df, _store(name, df, revision))
+
+
+def _load_physical(sheet_names):
+    # Đọc các sheet/bảng con thật qua cache; nhiều phiên cùng cần một sheet thì chỉ một phiên
+    # gọi backend, các phiên khác chờ kết quả đó
+    backend = get_backend()
+    result = {}
+    hits = 0
+    while True:
+        for name in sheet_names:
+            if name in result:
+                continue
+            entry = _cached(name)
+            if entry is not None:
+                result[name] = (entry["df"], entry["generation"])
+                hits += 1
+        missing = [name for name in sheet_names if name not in result]
+        if not missing:
+            break
+        mine, others = _claim(missing)
+        if mine:
+            try:
+                _fetch(backend, mine, result)
+            finally:
+                _release(mine)
+        # Chờ các thread khác tải xong rồi lấy từ cache (nếu họ lỗi thì vòng sau tự tải)
+        for event in others:
+            event.wait()
+    if hits:
+        metrics.record("load_sheet (cache)", "cache", 0.0, rows=hits)
+    return result
+
+
+def load_sheets_versioned(sheet_names):
+    """Như load_sheet_versioned cho nhiều sheet; các sheet cần tải được đọc trong một lần.
+
+    Sheet chia theo năm được ghép lại từ các bảng con (mỗi bảng con có cache riêng).
+    """
+    split = [name for name in sheet_names if partitions.is_partitioned(name)]
+    if not split:
+        result = _load_physical(sheet_names)
+        _sync_row_indexes(result)
+        return result
+    catalog = _catalog()
+    physical = [name for name in sheet_names if name not in split]
+    for name in split:
+        physical += partitions.names(catalog[name])
+    loaded = _load_physical(physical)
+    _sync_row_indexes(loaded)
+    result = {name: loaded[name] for name in sheet_names if name not in split}
+    for name in split:
+        result[name] = _assemble(name, catalog[name], loaded)
+    return result
+
 
 def load_sheet(sheet_name):
-    sheet = connect_gs(sheet_name)
-    data = sheet.get_all_values()
-    if not data:
+    df, _ = load_sheet_versioned(sheet_name)
+    return df.copy()
+
+
+def supports_range_reads():
+    """Backend hiện tại có tự lọc theo ngày được không (thay vì đọc cả bảng)."""
+    return type(get_backend()).read_range is not SheetBackend.read_range
+
+
+def supports_row_reads():
+    """Backend hiện tại đọc được từng khoảng dòng (thay vì đọc cả bảng)."""
+    return type(get_backend()).read_rows is not SheetBackend.read_rows
+
+
+def _uses_row_index():
+    # Backend tự lọc theo ngày (SQLite) thì không cần chỉ mục dòng
+    return supports_row_reads() and not supports_range_reads()
+
+
+def _is_indexed(name):
+    return name in row_index.INDEXED_SHEETS or any(
+        partitions.is_partition_of(name, sheet_name) for sheet_name in partitions.PARTITIONED_SHEETS
+    )
+
+
+def supports_partial_reads(sheet_name):
+    """Đọc sheet theo khoảng ngày có tránh được việc tải cả sheet không."""
+    return (supports_range_reads() or partitions.is_partitioned(sheet_name)
+            or (sheet_name in row_index.INDEXED_SHEETS and _uses_row_index()))
+
+
+def _between(df, start, end):
+    if df.empty or "Ngày" not in df.columns:
+        return df.copy()
+    ngay = pd.to_datetime(df["Ngày"], format="%d/%m/%Y", errors="coerce")
+    return df[(ngay >= start) & (ngay <= end)].reset_index(drop=True)
+
+
+def _range_key(sheet_name, start, end):
+    # Khoá cache của phần đọc riêng theo khoảng ngày: "tên[từ-đến]"
+    return f"{sheet_name}[{pd.Timestamp(start):%Y%m%d}-{pd.Timestamp(end):%Y%m%d}]"
+
+
+def _read_indexed(name, index, start, end):
+    # Chỉ đọc các đoạn dòng của các tháng cần; None nếu dữ liệu không khớp chỉ mục
+    backend = get_backend()
+    key = _range_key(name, start, end)
+    entry = _cached(key)
+    if entry is None:
+        with metrics.span("backend.revision", kind="io"):
+            revision = backend.revision()
+        entry = _cached(name, revision, probe=True) or _cached(key, revision, probe=True)
+    if entry is not None:
+        return _between(entry["df"], start, end)
+
+    wanted, ranges = index.plan(start, end)
+    _spend(backend, "read_rows")
+    with metrics.span("load_rows", kind="io") as s:
+        frames = backend.read_rows(name, ranges)
+        s.rows = sum(len(df) for df in frames)
+        s.size = sum(metrics.frame_bytes(df) for df in frames)
+    matched = index.check(ranges, frames)
+    with _cache_lock:
+        _cache_stats["row_reads"] += 1
+        if not matched:
+            _cache_stats["row_index_mismatches"] += 1
+    if not matched:
+        return None
+    df = _between(row_index.pick(wanted, ranges, frames), start, end)
+    _store(key, df, revision)
+    return df
+
+
+def _load_rows_between(name, start, end):
+    """Các dòng trong [start, end] của một sheet/bảng con: lọc trên bản đã cache nếu có, nếu không
+    thì chỉ đọc các đoạn dòng theo chỉ mục; chỉ mục thiếu hoặc lệch thì tải cả bảng (và sửa chỉ mục)."""
+    entry = _cached(name)
+    if entry is None and _is_indexed(name) and _uses_row_index():
+        index = _row_indexes().get(name)
+        if index is not None and index.valid:
+            df = _read_indexed(name, index, start, end)
+            if df is not None:
+                return df
+    if entry is None:
+        loaded = _load_physical([name])
+        _sync_row_indexes(loaded)
+        return _between(loaded[name][0], start, end)
+    return _between(entry["df"], start, end)
+
+
+def load_sheet_range(sheet_name, start, end):
+    """Các dòng có cột Ngày trong [start, end]; backend SQLite lọc ngay trong SQL.
+
+    Sheet chia theo năm chỉ đọc các bảng con có khoảng ngày giao với [start, end].
+    """
+    backend = get_backend()
+    if partitions.is_partitioned(sheet_name):
+        parts = _catalog()[sheet_name]
+        names = partitions.prune(parts, start, end)
+        with _cache_lock:
+            _cache_stats["partitions_pruned"] += len(partitions.names(parts)) - len(names)
+    else:
+        names = [sheet_name]
+    if not supports_range_reads():
+        # Backend không lọc được phía server: lọc trên bản đã cache hoặc đọc theo chỉ mục dòng
+        frames = [_load_rows_between(name, start, end) for name in names]
+    else:
+        with metrics.span("load_sheet_range", kind="io") as s:
+            frames = [backend.read_range(name, start, end) for name in names]
+            s.rows = sum(len(df) for df in frames)
+            s.size = sum(metrics.frame_bytes(df) for df in frames)
+    frames = [df for df in frames if not df.empty]
+    if not frames:
         return pd.DataFrame()
-    headers = data[0]
-    rows = data[1:]
-    return pd.DataFrame(rows, columns=headers)
+    return frames[0] if len(frames) == 1 else pd.concat(frames, ignore_index=True).fillna("")
+
+
+def _owned(key, sheet_name):
+    # Entry cache thuộc sheet này: chính nó, các khoảng dòng đọc riêng, các bảng con (nếu chia năm)
+    base = key.split("[", 1)[0]
+    return base == sheet_name or (partitions.is_partitioned(sheet_name) and partitions.is_partition_of(base, sheet_name))
+
+
+def invalidate_sheet(sheet_name=None):
+    """Xoá cache của một bảng (hoặc tất cả nếu không truyền tên)."""
+    with _cache_lock:
+        _cache_stats["invalidations"] += 1
+        if sheet_name is None:
+            _cache.clear()
+            _assembled.clear()
+        else:
+            for key in [key for key in _cache if _owned(key, sheet_name)]:
+                _cache.pop(key)
+
+
+def get_cache_stats():
+    with _cache_lock:
+        return dict(_cache_stats, cached_sheets=len(_cache))
+
+def _replace_physical(sheet_name, df):
+    backend = get_backend()
+    _spend(backend, "replace")
+    try:
+        with metrics.span("save_sheet", kind="io") as s:
+            s.rows, s.size = len(df), metrics.frame_bytes(df)
+            backend.replace(sheet_name, df)
+    finally:
+        invalidate_sheet(sheet_name)
+
+
+def _append_physical(sheet_name, rows):
+    backend = get_backend()
+    _spend(backend, "append")
+    try:
+        with metrics.span("append_rows", kind="io") as s:
+            s.rows = len(rows)
+            return backend.append(sheet_name, rows)
+    finally:
+        invalidate_sheet(sheet_name)
+
+
+def _update_physical(sheet_name, updates):
+    backend = get_backend()
+    _spend(backend, "update_rows")
+    try:
+        with metrics.span("update_rows", kind="io") as s:
+            s.rows = len(updates)
+            return backend.update_rows(sheet_name, updates)
+    finally:
+        invalidate_sheet(sheet_name)
+
+
+# -------- Sheet chia theo năm ----------
+# Khoá khi đổi danh mục (chuyển dữ liệu cũ, mở bảng con mới, ghi đè cả bảng)
+_partition_lock = threading.RLock()
+_catalog_parsed = None   # (generation của sheet danh mục, danh mục đã đọc)
+# sheet -> {"parts": ((tên bảng con, generation), ...), "df": bảng ghép, "generation": ...}
+_assembled = {}
+
+
+def _read_catalog():
+    global _catalog_parsed
+    # Chỉ mục dòng được đọc cùng request với danh mục
+    names = [partitions.CATALOG_SHEET] + ([row_index.ROW_INDEX_SHEET] if _uses_row_index() else [])
+    frame, generation = _load_physical(names)[partitions.CATALOG_SHEET]
+    parsed = _catalog_parsed
+    if parsed is None or parsed[0] != generation:
+        parsed = _catalog_parsed = (generation, partitions.read_catalog(frame))
+    return {name: list(parts) for name, parts in parsed[1].items()}
+
+
+def _write_catalog(catalog):
+    _replace_physical(partitions.CATALOG_SHEET, partitions.catalog_frame(catalog))
+
+
+def _catalog():
+    """Danh mục bảng con; lần đầu gặp sheet chưa chia thì chuyển dữ liệu cũ sang các bảng con."""
+    catalog = _read_catalog()
+    if all(name in catalog for name in partitions.PARTITIONED_SHEETS):
+        return catalog
+    with _partition_lock:
+        catalog = _read_catalog()   # thread khác có thể vừa chuyển xong
+        missing = [name for name in partitions.PARTITIONED_SHEETS if name not in catalog]
+        if not missing:
+            return catalog
+        legacy = {name: df for name, (df, _) in _load_physical(missing).items()}
+        indexes = {}
+        for name in missing:
+            parts, frames = partitions.split(name, legacy[name])
+            for part_name, part_df in frames:
+                _replace_physical(part_name, part_df)
+                indexes[part_name] = row_index.runs_of(row_index.frame_keys(part_df))
+            catalog[name] = parts
+        _write_row_indexes(indexes)
+        # Ghi danh mục rồi mới xoá dữ liệu ở sheet cũ (còn lại header)
+        _write_catalog(catalog)
+        for name in missing:
+            if not legacy[name].empty:
+                _replace_physical(name, legacy[name].iloc[:0])
+        return catalog
+
+
+def _assemble(sheet_name, parts, loaded):
+    # Ghép các đoạn của danh mục theo thứ tự từ các bảng con đã tải ({tên: (DataFrame, generation)});
+    # chỉ ghép lại khi danh mục hoặc có bảng con đổi
+    global _cache_generation
+    slices = partitions.slices(parts)
+    key = (tuple(slices), tuple((name, loaded[name][1]) for name in partitions.names(parts)))
+    with _cache_lock:
+        entry = _assembled.get(sheet_name)
+        if entry is not None and entry["parts"] == key:
+            return entry["df"], entry["generation"]
+    frames = []
+    for name, start, stop in slices:
+        df = loaded[name][0]
+        # Bảng con chỉ có một đoạn (thường gặp): dùng luôn cả bảng
+        piece = df if start == 0 and (stop is None or stop >= len(df)) else df.iloc[start:stop]
+        if not piece.empty:
+            frames.append(piece)
+    if not frames:
+        df = pd.DataFrame()
+    elif len(frames) == 1:
+        df = frames[0].reset_index(drop=True)
+    else:
+        df = pd.concat(frames, ignore_index=True).fillna("")
+    with _cache_lock:
+        _cache_generation += 1
+        _assembled[sheet_name] = {"parts": key, "df": df, "generation": _cache_generation}
+        return df, _cache_generation
+
+
+# -------- Chỉ mục dòng ----------
+_row_index_parsed = None   # (generation của sheet chỉ mục, {tên bảng: RowIndex})
+_row_index_checked = {}    # tên bảng -> generation của bản đã so với chỉ mục
+
+
+def _row_indexes():
+    global _row_index_parsed
+    frame, generation = _load_physical([row_index.ROW_INDEX_SHEET])[row_index.ROW_INDEX_SHEET]
+    parsed = _row_index_parsed
+    if parsed is None or parsed[0] != generation:
+        parsed = _row_index_parsed = (generation, row_index.read_indexes(frame))
+    return parsed[1]
+
+
+def _write_row_indexes(changes):
+    """Thay chỉ mục của các bảng trong changes ({tên: các đoạn, hoặc None để bỏ}) rồi ghi lại sheet chỉ mục."""
+    if not changes or not _uses_row_index():
+        return
+    with _partition_lock:
+        runs = {name: index.runs for name, index in _row_indexes().items()}
+        for name, new in changes.items():
+            if new is None:
+                runs.pop(name, None)
+            else:
+                runs[name] = new
+        _replace_physical(row_index.ROW_INDEX_SHEET, row_index.index_frame(runs))
+
+
+def _append_row_index(rows):
+    with _partition_lock:
+        frame, _ = _load_physical([row_index.ROW_INDEX_SHEET])[row_index.ROW_INDEX_SHEET]
+        _append_physical(row_index.ROW_INDEX_SHEET, rows)
+        # Bản cache = bản cũ + các dòng vừa ghi: lần đọc sau không phải tải lại cả sheet chỉ mục
+        added = pd.DataFrame(rows, columns=row_index.ROW_INDEX_COLUMNS).astype(str)
+        _store(row_index.ROW_INDEX_SHEET, pd.concat([frame, added], ignore_index=True), None)
+
+
+def _sync_row_indexes(loaded):
+    """So chỉ mục với các bảng vừa tải đủ ({tên: (DataFrame, generation)}): ghi thêm đoạn còn thiếu
+    (dòng thêm ở cuối) hoặc dựng lại chỉ mục của bảng bị sửa tay."""
+    if not _uses_row_index():
+        return
+    todo = {name: value for name, value in loaded.items()
+            if _is_indexed(name) and _row_index_checked.get(name) != value[1]}
+    if not todo:
+        return
+    indexes = _row_indexes()
+    rebuild, extend = {}, []
+    for name, (df, generation) in todo.items():
+        keys = row_index.frame_keys(df)
+        # Chưa có chỉ mục: coi như chỉ mục rỗng, ghi thêm từ dòng đầu
+        index = indexes.get(name) or row_index.RowIndex([])
+        state = index.compare(keys)
+        if state == "rebuild":
+            rebuild[name] = row_index.runs_of(keys)
+        elif state == "extend":
+            extend += row_index.index_rows(name, row_index.runs_of(keys[index.total:], index.total))
+        _row_index_checked[name] = generation
+    _write_row_indexes(rebuild)
+    if extend:
+        _append_row_index(extend)
+
+
+def _extend_row_indexes(groups, created=()):
+    # Ghi thêm chỉ mục cho các dòng vừa ghi vào cuối bảng ([(tên, các dòng)]);
+    # bảng chưa có chỉ mục (trừ bảng con vừa mở) thì để lần tải đủ sau dựng
+    if not _uses_row_index():
+        return
+    indexes = _row_indexes()
+    rows = []
+    totals = {}   # một bảng con có thể nhận vài nhóm dòng trong cùng lần ghi
+    for name, chunk in groups:
+        index = indexes.get(name)
+        if not _is_indexed(name) or (index is None and name not in created):
+            continue
+        first = totals.get(name, index.total if index is not None else 0)
+        keys = row_index.month_keys([row.get("Ngày", "") for row in chunk])
+        rows += row_index.index_rows(name, row_index.runs_of(keys, first))
+        totals[name] = first + len(chunk)
+    if rows:
+        _append_row_index(rows)
+
+
+def _drop_row_indexes(located):
+    # Sửa ô Ngày làm đổi tháng của dòng: bỏ chỉ mục của bảng đó, lần tải đủ sau sẽ dựng lại
+    _write_row_indexes({
+        name: None for name, updates in located.items()
+        if _is_indexed(name) and any("Ngày" in values for values in updates.values())
+    })
+
+
+def read_positions(sheet_name, positions):
+    """Đọc thẳng từ backend (không qua cache) các dòng ở các vị trí này (0 = dòng đầu sau header;
+    sheet chia năm tính trên các bảng con ghép lại): {vị trí: {cột: chuỗi}}.
+
+    Vị trí không còn dòng nào thì không có trong kết quả. Mỗi bảng con một request.
+    """
+    positions = sorted({int(p) for p in positions})
+    if not positions:
+        return {}
+    if partitions.is_partitioned(sheet_name):
+        parts = _catalog()[sheet_name]
+        located = partitions.locate(parts, {p: p for p in positions}) if parts else {}
+    else:
+        located = {sheet_name: {p: p for p in positions}}
+    backend = get_backend()
+    result = {}
+    for name, local in located.items():
+        ranges = _spans(sorted(local))
+        _spend(backend, "read_rows")
+        with metrics.span("read_positions", kind="io") as s:
+            frames = backend.read_rows(name, ranges)
+            s.rows = sum(len(df) for df in frames)
+        for (start, _), df in zip(ranges, frames):
+            for offset, row in enumerate(df.to_dict("records")):
+                result[local[start + offset]] = row
+    return result
+
 
 # Ghi đè DataFrame vào sheet
 def save_sheet(sheet_name, df: pd.DataFrame):
-    sheet = connect_gs(sheet_name)
-    sheet.clear()
-    if not df.empty:
-        sheet.update([df.columns.values.tolist()] + df.values.tolist())
\ No newline at end of file
+    if not partitions.is_partitioned(sheet_name):
+        _replace_physical(sheet_name, df)
+        if _is_indexed(sheet_name):
+            _write_row_indexes({sheet_name: row_index.runs_of(row_index.frame_keys(df))})
+        return
+    with _partition_lock:
+        catalog = _catalog()
+        parts, frames = partitions.split(sheet_name, df)
+        # Danh mục mới trước: lỡ dừng giữa chừng thì chỉ thấy bảng con rỗng, không thấy dòng lặp
+        old = catalog[sheet_name]
+        catalog[sheet_name] = parts
+        _write_catalog(catalog)
+        for part_name, part_df in frames:
+            _replace_physical(part_name, part_df)
+        written = {part_name for part_name, _ in frames}
+        for name in partitions.names(old):
+            if name not in written:
+                _replace_physical(name, df.iloc[:0])
+        indexes = {part_name: row_index.runs_of(row_index.frame_keys(part_df)) for part_name, part_df in frames}
+        _write_row_indexes(dict({name: None for name in partitions.names(old)}, **indexes))
+
+
+# Ghi thêm dòng vào cuối sheet (không đọc lại/ghi lại toàn bộ bảng)
+def append_rows(sheet_name, rows):
+    """rows: list các dict (tên cột -> giá trị) hoặc một DataFrame."""
+    if isinstance(rows, pd.DataFrame):
+        rows = rows.to_dict("records")
+    if not rows:
+        return 0
+    if not partitions.is_partitioned(sheet_name):
+        count = _append_physical(sheet_name, rows)
+        _extend_row_indexes([(sheet_name, rows)])
+        return count
+    with _partition_lock:
+        catalog = _catalog()
+        parts = catalog[sheet_name]
+        tail_frame = None
+        if partitions.needs_rollover(parts, rows):
+            tail_frame = _load_physical([parts[-1]["name"]])[parts[-1]["name"]][0]
+        new_parts, groups = partitions.route(parts, sheet_name, rows, tail_frame)
+        if new_parts != parts:
+            catalog[sheet_name] = new_parts
+            _write_catalog(catalog)
+        count = sum(_append_physical(name, chunk) for name, chunk in groups)
+        _extend_row_indexes(groups, created=set(partitions.names(new_parts)) - set(partitions.names(parts)))
+        return count
+
+
+# Ghi đè một số ô của các dòng đã có (không đụng tới phần còn lại của bảng)
+def update_rows(sheet_name, updates):
+    """updates: dict {vị trí dòng trong DataFrame (0 = dòng đầu sau header): {tên cột: giá trị}}."""
+    if not updates:
+        return 0
+    if not partitions.is_partitioned(sheet_name):
+        count = _update_physical(sheet_name, updates)
+        _drop_row_indexes({sheet_name: updates})
+        return count
+    with _partition_lock:
+        catalog = _catalog()
+        parts = catalog[sheet_name]
+        located = partitions.locate(parts, updates)
+        new_parts = partitions.widen(parts, updates)
+        if new_parts != parts:
+            catalog[sheet_name] = new_parts
+            _write_catalog(catalog)
+        count = sum(_update_physical(name, part_updates) for name, part_updates in located.items())
+        _drop_row_indexes(located)
+        return count
@@ -0,0 +1,286 @@
+# utils/importer.py
+# Nhập hàng loạt trận đấu / thu chi quỹ từ file CSV hoặc Excel (XLSX), vd. lịch sử nhiều năm
+# của một câu lạc bộ mới. File được đọc từng khúc (CSV qua pandas chunksize, XLSX qua openpyxl
+# chế độ read-only), mỗi khúc được kiểm tra rồi ghi ngay thành một lần append, nên bộ nhớ dùng
+# không phụ thuộc kích thước file.
+#
+# Mỗi dòng trong file trận đấu giống một lần bấm "Lưu" ở form nhập trận: các cột Ngày, Đội thắng,
+# Đội thua và Giá (không bắt buộc), các đội cách nhau bởi dấu phẩy được ghép cặp theo thứ tự.
+# File quỹ có các cột Ngày, Ghi chú, Giá.
+import datetime
+import re
+import zipfile
+import streamlit as st
+import pandas as pd
+from utils.players import split_team
+from utils.repository import (
+    import_batches, load_members, live_rows, MATCH_SHEET, FUND_SHEET
+)
+from utils import metrics
+
+# Số dòng mỗi khúc đọc (cũng là số dòng tối đa mỗi lần append)
+IMPORT_CHUNK_ROWS = 2000
+# Chỉ giữ bấy nhiêu lỗi đầu tiên để báo lại (số lỗi vẫn được đếm hết)
+MAX_REPORTED_ERRORS = 200
+
+MATCH_IMPORT_COLUMNS = ["Ngày", "Đội thắng", "Đội thua"]   # Giá: không bắt buộc
+FUND_IMPORT_COLUMNS = ["Ngày", "Ghi chú", "Giá"]
+# Số có dấu phân cách hàng nghìn, vd. 10.000 hoặc -1,500,000
+_THOUSANDS = re.compile(r"^-?\d{1,3}([.,]\d{3})+$")
+# Lỗi do nội dung file (sai định dạng, sai mã hoá...): báo lại như ValueError
+_FILE_ERRORS = (zipfile.BadZipFile, UnicodeDecodeError, pd.errors.ParserError, pd.errors.EmptyDataError)
+
+
+# -------- Quy tắc nhập trận (dùng chung với form) ----------
+def match_rows(ngay_str, doi_thang, doi_thua, gia_input):
+    """Các dòng trận của một lần nhập: (các dòng, thông báo lỗi hoặc None).
+
+    Đội thắng/Đội thua có thể gồm nhiều đội cách nhau bởi dấu phẩy, ghép cặp theo thứ tự;
+    giá mới (nếu > 1) được chia đều cho số người của đội thua, không có thì Giá = -1.
+    """
+    if (not doi_thua or not doi_thua.strip()) or (not doi_thang or not doi_thang.strip()):
+        return [], "Vui lòng nhập đầy đủ thông tin Đội thắng và Đội thua."
+    winner = [n.strip() for n in doi_thang.split(",") if n.strip()]
+    loser = [n.strip() for n in doi_thua.split(",") if n.strip()]
+    if len(winner) != len(loser):
+        return [], "Số người trong Đội thắng và Đội thua phải bằng nhau."
+
+    rows = []
+    for w_team, l_team in zip(winner, loser):
+        num_player = len(l_team.split())
+        if gia_input > 1:
+            fee = int(gia_input / num_player)
+        else:
+            fee = -1
+        rows.append({
+            "Ngày": ngay_str,
+            "Đội thắng": w_team,
+            "Đội thua": l_team,
+            "Giá": fee
+        })
+    return rows, None
+
+
+# -------- Đọc file từng khúc ----------
+def _cell(value):
+    # Ô Excel: ngày -> dd/mm/yyyy, số nguyên dạng float -> số nguyên, trống -> ""
+    if value is None:
+        return ""
+    if isinstance(value, (datetime.datetime, datetime.date)):
+        return value.strftime("%d/%m/%Y")
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    return str(value)
+
+
+def _fraction(file, size):
+    try:
+        return min(file.tell() / size, 1.0) if size else None
+    except (AttributeError, OSError, ValueError):
+        return None
+
+
+def _csv_chunks(file, chunk_rows):
+    size = getattr(file, "size", None)
+    # Giữ cả dòng trống (bỏ sau) để số dòng báo lỗi khớp với file
+    reader = pd.read_csv(file, dtype=str, keep_default_na=False, encoding="utf-8-sig",
+                         skipinitialspace=True, skip_blank_lines=False, chunksize=chunk_rows)
+    with reader:
+        for chunk in reader:
+            yield chunk, _fraction(file, size)
+
+
+def _xlsx_chunks(file, chunk_rows):
+    # openpyxl chỉ cần khi nhập file Excel
+    try:
+        import openpyxl
+    except ImportError:
+        raise ValueError("Cần cài thư viện openpyxl để đọc file Excel (pip install openpyxl).")
+    from openpyxl.utils.exceptions import InvalidFileException
+    try:
+        workbook = openpyxl.load_workbook(file, read_only=True, data_only=True)
+    except InvalidFileException as exc:
+        raise ValueError(f"File Excel không hợp lệ: {exc}") from exc
+    try:
+        sheet = workbook.active
+        rows = sheet.iter_rows(values_only=True)
+        header = [_cell(v).strip() for v in next(rows, ())]
+        total = (sheet.max_row or 0) - 1
+        width = len(header)
+        chunk, done = [], 0
+        for values in rows:
+            chunk.append([_cell(v) for v in (list(values) + [None] * width)[:width]])
+            if len(chunk) == chunk_rows:
+                # Đánh số dòng nối tiếp giữa các khúc như pandas
+                yield (pd.DataFrame(chunk, columns=header, index=range(done, done + len(chunk))),
+                       (done + len(chunk)) / total if total > 0 else None)
+                done += len(chunk)
+                chunk = []
+        if chunk:
+            yield pd.DataFrame(chunk, columns=header, index=range(done, done + len(chunk))), 1.0
+    finally:
+        workbook.close()
+
+
+def read_chunks(file, name, chunk_rows=IMPORT_CHUNK_ROWS):
+    """Các khúc (DataFrame chuỗi, tối đa chunk_rows dòng; phần đã đọc của file 0..1 hoặc None).
+
+    File hỏng hoặc sai định dạng thì báo ValueError (có thể sau khi đã trả về vài khúc).
+    """
+    if str(name).lower().endswith((".xlsx", ".xlsm")):
+        chunks = _xlsx_chunks(file, chunk_rows)
+    else:
+        chunks = _csv_chunks(file, chunk_rows)
+    try:
+        for chunk, fraction in chunks:
+            chunk.columns = [str(c).strip() for c in chunk.columns]
+            # Bỏ dòng trống hoàn toàn
+            chunk = chunk.fillna("").astype(str)
+            yield chunk[chunk.apply(lambda col: col.str.strip() != "").any(axis=1)], fraction
+    except _FILE_ERRORS as exc:
+        raise ValueError(f"Không đọc được file {name} (cần CSV UTF-8 hoặc XLSX): {exc}") from exc
+
+
+# -------- Kiểm tra từng dòng ----------
+def _date_text(ngay):
+    try:
+        return datetime.datetime.strptime(str(ngay).strip(), "%d/%m/%Y").strftime("%d/%m/%Y")
+    except ValueError:
+        return None
+
+
+def _amount(value, default):
+    text = str(value).strip().replace(" ", "")
+    if not text:
+        return default
+    if _THOUSANDS.match(text):
+        text = text.replace(".", "").replace(",", "")
+    try:
+        return int(float(text))
+    except ValueError:
+        return None
+
+
+def _parse_match(record, members, dates):
+    ngay = dates[record["Ngày"]]
+    if ngay is None:
+        return [], f"Ngày không hợp lệ: {record['Ngày']!r} (cần dd/mm/yyyy)"
+    gia = _amount(record.get("Giá", ""), 0)
+    if gia is None:
+        return [], f"Giá không hợp lệ: {record['Giá']!r}"
+    rows, error = match_rows(ngay, record["Đội thắng"], record["Đội thua"], gia)
+    if error:
+        return [], error
+    if members is not None:
+        unknown = sorted({name for row in rows for team in (row["Đội thắng"], row["Đội thua"])
+                          for name in split_team(team)} - members)
+        if unknown:
+            return [], "Không có trong danh sách hội viên: " + ", ".join(unknown)
+    return rows, None
+
+
+def _parse_fund(record, members, dates):
+    ngay = dates[record["Ngày"]]
+    if ngay is None:
+        return [], f"Ngày không hợp lệ: {record['Ngày']!r} (cần dd/mm/yyyy)"
+    gia = _amount(record["Giá"], 0)
+    if not gia:
+        return [], f"Số tiền không hợp lệ: {record['Giá']!r}"
+    return [{"Ngày": ngay, "Ghi chú": str(record["Ghi chú"]).strip(), "Giá": gia}], None
+
+
+_KINDS = {
+    MATCH_SHEET: (MATCH_IMPORT_COLUMNS, _parse_match),
+    FUND_SHEET: (FUND_IMPORT_COLUMNS, _parse_fund),
+}
+
+
+def import_file(sheet_name, file, name, check_members=True, progress=None, chunk_rows=IMPORT_CHUNK_ROWS):
+    """Nhập file vào matches hoặc funds; dòng lỗi được bỏ qua và báo lại.
+
+    progress(report, phần đã đọc của file hoặc None) được gọi sau mỗi khúc đã ghi.
+    Trả về report: {"read": số dòng đọc, "written": số dòng ghi, "error_count", "errors": [(dòng, lỗi)]}.
+    Thiếu cột bắt buộc thì báo ValueError trước khi ghi gì; file hỏng ở giữa cũng báo ValueError,
+    các khúc trước đó đã được ghi (report qua progress cho biết số dòng).
+    """
+    columns, parse = _KINDS[sheet_name]
+    members = None
+    if sheet_name == MATCH_SHEET and check_members:
+        members = set(live_rows(load_members())["Tên"].astype(str))
+    report = {"read": 0, "written": 0, "error_count": 0, "errors": []}
+
+    def batches():
+        line = 2   # dòng 1 là header
+        for chunk, fraction in read_chunks(file, name, chunk_rows):
+            missing = [c for c in columns if c not in chunk.columns]
+            if missing:
+                raise ValueError("File thiếu cột: " + ", ".join(missing))
+            rows = []
+            with metrics.span(f"import.parse[{sheet_name}]") as s:
+                s.rows = len(chunk)
+                # Mỗi ngày khác nhau trong khúc chỉ parse một lần
+                dates = {ngay: _date_text(ngay) for ngay in chunk["Ngày"].unique()}
+                for offset, record in zip(chunk.index, chunk.to_dict("records")):
+                    parsed, error = parse(record, members, dates)
+                    if error:
+                        report["error_count"] += 1
+                        if len(report["errors"]) < MAX_REPORTED_ERRORS:
+                            report["errors"].append((line + int(offset), error))
+                    rows += parsed
+            report["read"] += len(chunk)
+            # Gom dòng theo năm (giữ thứ tự trong từng năm): mỗi năm là một lần ghi vào bảng con của nó
+            rows.sort(key=lambda row: row["Ngày"][-4:])
+            yield rows
+            report["written"] += len(rows)
+            if progress is not None:
+                progress(report, fraction)
+
+    import_batches(sheet_name, batches())
+    return report
+
+
+# -------- UI ----------
+def show_import_section(sheet_name):
+    """Khối nhập file hàng loạt cho trang nhập trận (matches) hoặc trang quỹ (funds)."""
+    columns, _ = _KINDS[sheet_name]
+    label = "trận đấu" if sheet_name == MATCH_SHEET else "thu chi quỹ"
+    with st.expander(f"Nhập hàng loạt {label} từ file (CSV/XLSX)"):
+        hint = ", ".join(columns) + (", Giá (không bắt buộc)" if sheet_name == MATCH_SHEET else "")
+        st.caption(f"Dòng đầu là tên cột: {hint}. Ngày dạng dd/mm/yyyy; nên sắp xếp file theo ngày.")
+        file = st.file_uploader("Chọn file", type=["csv", "xlsx"], key=f"import_file_{sheet_name}")
+        check_members = True
+        if sheet_name == MATCH_SHEET:
+            check_members = not st.checkbox("Cho phép tên không có trong danh sách hội viên",
+                                            key=f"import_guests_{sheet_name}")
+        if file is None or not st.button("Nhập", key=f"import_run_{sheet_name}"):
+            return
+
+        bar = st.progress(0.0, text="Đang nhập...")
+        last = {}
+
+        def progress(report, fraction):
+            last.update(report)
+            text = f"Đã đọc {report['read']:,} dòng, đã ghi {report['written']:,} dòng"
+            bar.progress(fraction if fraction is not None else 0.0, text=text)
+
+        def partial():
+            # Lỗi giữa chừng: các khúc trước đó đã nằm trên sheet
+            if last.get("written"):
+                st.warning(f"Đã ghi {last['written']:,} dòng {label} (từ {last['read']:,} dòng đầu của file) "
+                           "trước khi gặp lỗi; nhập lại phần còn lại của file để tránh trùng.")
+
+        try:
+            report = import_file(sheet_name, file, file.name, check_members, progress)
+        except ValueError as exc:
+            st.error(str(exc))
+            partial()
+            return
+        except Exception:
+            partial()
+            raise
+        bar.progress(1.0, text="Xong")
+        st.success(f"Đã nhập {report['written']:,} dòng {label} từ {report['read']:,} dòng trong file.")
+        if report["error_count"]:
+            st.warning(f"Bỏ qua {report['error_count']:,} dòng lỗi"
+                       + (f" (hiện {len(report['errors'])} lỗi đầu)" if report["error_count"] > len(report["errors"]) else ""))
+            st.dataframe(pd.DataFrame(report["errors"], columns=["Dòng", "Lỗi"]), hide_index=True)
@@ -2,28 +2,13 @@
 import streamlit as st
 import pandas as pd
 import os
-# from utils.member import load_members
-from utils.gsheets import load_sheet, save_sheet
+from utils.repository import (
+    load_matches_on, append_matches, delete_rows, ConflictError, MATCH_SHEET, MEMBER_SHEET, PARTICIPATION_SHEET
+)
+from utils.importer import match_rows, show_import_section
 
-
-FUND_SHEET = "funds"
-SHEET_NAME = "matches"
-
-# -------- Matches ----------
-def load_matches():
-    df = load_sheet(SHEET_NAME)
-    if df.empty:
-        df = pd.DataFrame(columns=["Ngày", "Đội thắng", "Đội thua", "Giá"])
-    df = df.replace("nan", "", regex=False).fillna("")
-    df["Ngày"] = df["Ngày"].astype(str).str.strip()
-    df["Đội thắng"] = df["Đội thắng"].astype(str).str.strip()
-    df["Đội thua"] = df["Đội thua"].astype(str).str.strip()
-    df["Giá"] = pd.to_numeric(df["Giá"], errors="coerce").fillna(-1).astype(int)
-    return df
-
-
-def save_matches(df: pd.DataFrame):
-    save_sheet(SHEET_NAME, df)
+# Các sheet trang này đọc (để nạp sẵn khi người dùng đang ở trang khác)
+PAGE_SHEETS = [MATCH_SHEET, MEMBER_SHEET, PARTICIPATION_SHEET]
 
 
 # -------- UI ----------
@@ -47,68 +32,25 @@ def show_match_page():
         submitted = st.form_submit_button("Lưu")
 
     if submitted:
-        if (not doi_thua or not doi_thua.strip()) or (not doi_thang or not doi_thang.strip()):
-            st.warning("Vui lòng nhập đầy đủ thông tin Đội thắng và Đội thua.")
-        else:            
-            # items = [item.strip() for item in doi_thua.split(",") if item.strip()]
-            # new_rows = []
-            # team = []
-            # for it in items:
-            #     name = it.split()
-            #     team.append(name)
-            # for name in team:
-            #     num_player = len(name)
-            #     if gia_input > 1:
-            #         fee = int(gia_input / num_player)
-            #     else:
-            #         fee = -1
-                    
-            #     new_rows.append({
-            #     "Ngày": ngay_str,
-            #     "Đội thắng": doi_thang,
-            #     "Đội thua": " ".join(name),
-            #     "Giá": fee
-            #     })
-
-            winner = [n.strip() for n in doi_thang.split(",") if n.strip()]
-            loser = [n.strip() for n in doi_thua.split(",") if n.strip()]
-            if len(winner) != len(loser):
-                st.warning("Số người trong Đội thắng và Đội thua phải bằng nhau.")
-                return
-            
-            ngay_str = ngay_chon.strftime("%d/%m/%Y")
-            new_rows = []
-            for w_team, l_team in zip(winner, loser):
-                num_player = len(l_team.split())
-                if gia_input > 1:
-                    fee = int(gia_input / num_player)
-                else:
-                    fee = -1
-
-                new_rows.append({
-                    "Ngày": ngay_str,
-                    "Đội thắng": w_team,
-                    "Đội thua": l_team,
-                    "Giá": fee
-                })
-
-            if new_rows:
-                df_all = load_matches()
-                df_all = pd.concat([df_all, pd.DataFrame(new_rows)], ignore_index=True)
-                save_matches(df_all)
-                st.success(f"Đã lưu: {len(new_rows)} trận (ngày {ngay_str}).")
-            else: 
-                st.info("Không có dữ liệu để lưu.")
+        ngay_str = ngay_chon.strftime("%d/%m/%Y")
+        # Cùng quy tắc ghép đội/chia giá với nhập hàng loạt từ file
+        new_rows, error = match_rows(ngay_str, doi_thang, doi_thua, gia_input)
+        if error:
+            st.warning(error)
+            return
+
+        if new_rows:
+            append_matches(new_rows)
+            st.success(f"Đã lưu: {len(new_rows)} trận (ngày {ngay_str}).")
+        else: 
+            st.info("Không có dữ liệu để lưu.")
+
+    # Nhập lịch sử nhiều ngày từ file
+    show_import_section(MATCH_SHEET)
 
     # Hiển thị danh sách trận thua theo ngày
     st.subheader("Danh sách trận thua")
-    df = load_matches()
-    if df.empty:
-        st.info("Chưa có dữ liệu.")
-        return
-
-    ngay_str = ngay_chon.strftime("%d/%m/%Y")
-    df_filtered = df[df["Ngày"] == ngay_str]
+    df_filtered = load_matches_on(ngay_chon)
 
     if df_filtered.empty:
         st.info("Không có dữ liệu cho ngày đã chọn.")
@@ -119,22 +61,24 @@ def show_match_page():
         df_show["Giá mới/người"] = df_show["Giá"].apply(lambda x: f"{x:,} VNĐ" if x > 0 else "")
         st.dataframe(df_show[["Ngày", "Đội thắng", "Đội thua", "Giá mới/người"]].reset_index(drop=True), use_container_width=True, hide_index=True)
 
-        # st.subheader("Xóa trận")
-        # if st.button("Xoá tất cả trong ngày", key=f"delete_all_{ngay_str}"):
-        #     df_all = load_matches()
-        #     df_all = df_all[df_all["Ngày"] != ngay_str].reset_index(drop=True)
-        #     save_matches(df_all)
-        #     st.success(f"Đã xoá toàn bộ dữ liệu ngày {ngay_str}.")
-        #     st.rerun()
+        st.subheader("Xóa trận")
+        ngay_str = ngay_chon.strftime("%d/%m/%Y")
+        if st.button("Xoá tất cả trong ngày", key=f"delete_all_{ngay_str}"):
+            _delete_matches([row for _, row in df_filtered.iterrows()], f"Đã xoá toàn bộ dữ liệu ngày {ngay_str}.")
 
-        # # Liệt kê từng dòng để xoá riêng
-        # for idx, row in df_filtered.iterrows():
-        #     col1, col2 = st.columns([6,1])
-        #     col1.write(f"{row['Ngày']} - {row['Trận thua']}")
-        #     if col2.button("❌", key=f"del_{ngay_str}_{idx}"):
-        #         df_all = load_matches()
-        #         if idx in df_all.index:
-        #             df_all = df_all.drop(idx).reset_index(drop=True)
-        #             save_matches(df_all)
-        #             st.success("Đã xóa 1 dòng.")
-        #             st.rerun()
+        # Liệt kê từng dòng để xoá riêng (theo ID của dòng, không theo vị trí)
+        for _, row in df_filtered.iterrows():
+            col1, col2 = st.columns([6,1])
+            col1.write(f"{row['Ngày']} - {row['Đội thắng']} thắng {row['Đội thua']}")
+            if col2.button("❌", key=f"del_{row['ID']}"):
+                _delete_matches([row], "Đã xóa 1 dòng.")
+
+
+def _delete_matches(rows, message):
+    try:
+        delete_rows(MATCH_SHEET, rows)
+    except ConflictError as exc:
+        st.warning(str(exc))
+        return
+    st.success(message)
+    st.rerun()
@@ -0,0 +1,247 @@
+# utils/metrics.py
+# Đo số lần gọi, thời gian (kèm histogram) và kích thước dữ liệu của các thao tác
+# đọc/ghi sheet và các hàm tính toán chính. Số liệu được cộng cho cả process,
+# cho từng phiên trình duyệt và cho lần chạy script (rerun) hiện tại của phiên đó.
+# Mỗi rerun kết thúc ghi một dòng JSON vào logger "pickleball.metrics".
+import contextlib
+import functools
+import json
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict
+
+# Cận trên (ms) của các ô histogram thời gian; ô cuối là phần còn lại
+HISTOGRAM_BOUNDS_MS = [1, 5, 10, 50, 100, 500, 1000, 5000]
+# Số rerun gần nhất giữ lại cho mỗi phiên (để xem/tải về)
+RERUN_HISTORY = 50
+# Phiên không rerun trong bấy nhiêu giây thì bỏ số liệu; giữ tối đa bấy nhiêu phiên (bỏ phiên lâu nhất)
+SESSION_IDLE_SECONDS = 3600
+MAX_SESSIONS = 200
+
+logger = logging.getLogger("pickleball.metrics")
+if os.environ.get("PICKLEBALL_METRICS_LOG"):
+    # Ghi log dạng JSON lines ra file
+    _handler = logging.FileHandler(os.environ["PICKLEBALL_METRICS_LOG"], encoding="utf-8")
+    _handler.setFormatter(logging.Formatter("%(message)s"))
+    logger.addHandler(_handler)
+    logger.setLevel(logging.INFO)
+
+_lock = threading.Lock()
+_local = threading.local()   # thời gian của các đoạn con đang đo lồng nhau (theo thread)
+_process = {}
+# session_id -> {"total": {...}, "rerun": {...}, "rerun_no": n, "started": t, "seen": t, "history": [...]},
+# phiên rerun gần nhất ở cuối
+_sessions = OrderedDict()
+
+
+def _session_id():
+    try:
+        from streamlit.runtime.scriptrunner import get_script_run_ctx
+    except ImportError:
+        return None
+    ctx = get_script_run_ctx(suppress_warning=True)
+    return ctx.session_id if ctx is not None else None
+
+
+def _add(table, name, kind, ms, self_ms, rows, size):
+    op = table.get(name)
+    if op is None:
+        op = table[name] = {"kind": kind, "count": 0, "ms": 0.0, "self_ms": 0.0, "max_ms": 0.0,
+                            "rows": 0, "bytes": 0, "hist": [0] * (len(HISTOGRAM_BOUNDS_MS) + 1)}
+    op["count"] += 1
+    op["ms"] += ms
+    op["self_ms"] += self_ms
+    op["max_ms"] = max(op["max_ms"], ms)
+    op["rows"] += rows or 0
+    op["bytes"] += size or 0
+    bucket = next((i for i, bound in enumerate(HISTOGRAM_BOUNDS_MS) if ms <= bound), len(HISTOGRAM_BOUNDS_MS))
+    op["hist"][bucket] += 1
+
+
+def record(name, kind, ms, rows=None, size=None, self_ms=None):
+    """Ghi nhận một lần gọi: kind là "io" (mạng/lưu trữ) hoặc "compute" (pandas/numpy).
+
+    self_ms: thời gian không tính các đoạn con được đo riêng (mặc định bằng ms).
+    """
+    self_ms = ms if self_ms is None else self_ms
+    session = _session_id()
+    with _lock:
+        _add(_process, name, kind, ms, self_ms, rows, size)
+        state = _sessions.get(session) if session is not None else None
+        if state is not None:
+            _add(state["total"], name, kind, ms, self_ms, rows, size)
+            _add(state["rerun"], name, kind, ms, self_ms, rows, size)
+
+
+def frame_bytes(df):
+    """Kích thước ước lượng (byte) của một DataFrame."""
+    try:
+        return int(df.memory_usage(deep=True, index=False).sum())
+    except Exception:
+        return 0
+
+
+class _Span:
+    rows = None
+    size = None
+
+
+@contextlib.contextmanager
+def span(name, kind="compute"):
+    """Đo một đoạn code; gán s.rows / s.size bên trong khối with nếu biết kích thước dữ liệu."""
+    s = _Span()
+    stack = _local.__dict__.setdefault("children", [])
+    stack.append(0.0)
+    start = time.perf_counter()
+    try:
+        yield s
+    finally:
+        ms = (time.perf_counter() - start) * 1000
+        children = stack.pop()
+        if stack:
+            stack[-1] += ms
+        # Tổng I/O và tính toán của một rerun cộng theo self_ms nên đoạn lồng nhau không bị tính hai lần
+        record(name, kind, ms, s.rows, s.size, self_ms=max(ms - children, 0.0))
+
+
+def timed(name=None, kind="compute"):
+    """Decorator đo mỗi lần gọi hàm."""
+    def decorate(func):
+        label = name or func.__qualname__
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with span(label, kind):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorate
+
+
+# -------- Rerun ----------
+def begin_rerun():
+    """Gọi ở đầu main.py: bắt đầu đếm cho lần chạy script mới của phiên hiện tại."""
+    session = _session_id()
+    if session is None:
+        return
+    now = time.perf_counter()
+    with _lock:
+        state = _sessions.pop(session, None) or {"total": {}, "rerun": {}, "rerun_no": 0, "history": []}
+        state["rerun"] = {}
+        state["rerun_no"] += 1
+        state["started"] = state["seen"] = now
+        _sessions[session] = state
+        # Phiên đã đóng không báo lại: bỏ theo thời gian không dùng và theo số lượng
+        while len(_sessions) > MAX_SESSIONS or now - next(iter(_sessions.values()))["seen"] > SESSION_IDLE_SECONDS:
+            _sessions.popitem(last=False)
+
+
+def _summary(table):
+    io = sum(op["self_ms"] for op in table.values() if op["kind"] == "io")
+    compute = sum(op["self_ms"] for op in table.values() if op["kind"] == "compute")
+    return {"io_ms": round(io, 2), "compute_ms": round(compute, 2),
+            "io_calls": sum(op["count"] for op in table.values() if op["kind"] == "io")}
+
+
+def end_rerun(page=None):
+    """Gọi ở cuối main.py: lưu số liệu của rerun vào lịch sử phiên và ghi log JSON."""
+    session = _session_id()
+    with _lock:
+        state = _sessions.get(session) if session is not None else None
+        if state is None or "started" not in state:
+            return None
+        record_ = {
+            "time": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "session": session,
+            "rerun": state["rerun_no"],
+            "page": page,
+            "wall_ms": round((time.perf_counter() - state.pop("started")) * 1000, 2),
+            **_summary(state["rerun"]),
+            "ops": {name: {k: (round(v, 2) if isinstance(v, float) else v) for k, v in op.items()}
+                    for name, op in state["rerun"].items()},
+        }
+        state["history"] = (state["history"] + [record_])[-RERUN_HISTORY:]
+    logger.info(json.dumps(record_, ensure_ascii=False))
+    return record_
+
+
+# -------- Đọc số liệu ----------
+def _copy(table):
+    return {name: dict(op, hist=list(op["hist"])) for name, op in table.items()}
+
+
+def get_process_metrics():
+    """Số liệu cộng dồn của cả process (mọi phiên, kể cả thread ghi nền và nạp sẵn)."""
+    with _lock:
+        return _copy(_process)
+
+
+def get_session_metrics():
+    """(số liệu rerun hiện tại, số liệu cả phiên, lịch sử các rerun) của phiên đang chạy."""
+    session = _session_id()
+    with _lock:
+        state = _sessions.get(session) if session is not None else None
+        if state is None:
+            return {}, {}, []
+        return _copy(state["rerun"]), _copy(state["total"]), list(state["history"])
+
+
+def debug_enabled():
+    if os.environ.get("PICKLEBALL_DEBUG"):
+        return True
+    import streamlit as st
+    return st.query_params.get("debug") == "1"
+
+
+def _table_frame(table):
+    import pandas as pd
+    labels = [f"≤{b}" for b in HISTOGRAM_BOUNDS_MS] + [f">{HISTOGRAM_BOUNDS_MS[-1]}"]
+    rows = []
+    for name, op in sorted(table.items(), key=lambda item: -item[1]["ms"]):
+        rows.append({
+            "Thao tác": name, "Loại": op["kind"], "Số lần": op["count"],
+            "Tổng ms": round(op["ms"], 1), "Riêng ms": round(op["self_ms"], 1), "Max ms": round(op["max_ms"], 1),
+            "Dòng": op["rows"], "KB": round(op["bytes"] / 1024, 1),
+            "Histogram (ms)": " ".join(f"{l}:{c}" for l, c in zip(labels, op["hist"]) if c),
+        })
+    return pd.DataFrame(rows)
+
+
+def show_debug_panel():
+    """Bảng số liệu ở sidebar (bật bằng ?debug=1 hoặc biến môi trường PICKLEBALL_DEBUG)."""
+    import streamlit as st
+    _, total, history = get_session_metrics()
+    with st.sidebar.expander("Đo đạc (debug)"):
+        if history:
+            last = history[-1]
+            st.caption(f"Rerun #{last['rerun']}: {last['wall_ms']:.0f} ms, "
+                       f"I/O {last['io_ms']:.0f} ms ({last['io_calls']} lần), tính toán {last['compute_ms']:.0f} ms")
+            st.dataframe(_table_frame(history[-1]["ops"]), hide_index=True)
+        st.caption("Cả phiên")
+        st.dataframe(_table_frame(total), hide_index=True)
+        st.caption("Cả process (mọi phiên và các thread nền)")
+        st.dataframe(_table_frame(get_process_metrics()), hide_index=True)
+        from utils.gsheets import get_cache_stats, get_quota_stats, get_pool_stats
+        cache = get_cache_stats()
+        st.caption(f"Cache: {cache['hits']} lần trúng, {cache['misses']} lần tải, "
+                   f"{cache['coalesced']} lần dùng chung request, {cache['stale_served']} lần dùng bản cũ do hết quota")
+        pool = get_pool_stats()
+        st.caption(f"Kết nối: {pool['handshakes']} lần mở, {pool['handshakes_saved']} lần dùng lại, "
+                   f"{pool['worksheet_hits']}/{pool['worksheet_hits'] + pool['worksheet_lookups']} worksheet lấy từ cache, "
+                   f"{pool['token_refreshes']} lần làm mới token")
+        st.caption("Quota còn: " + ", ".join(
+            f"{kind} {q['tokens']:.0f}/{q['capacity']}" for kind, q in get_quota_stats().items()))
+        from utils.prefetch import get_prefetch_stats
+        pre = get_prefetch_stats()
+        st.caption(f"Nạp sẵn: {pre['done']} xong, {pre['pending']} đang chờ, {pre['cancelled']} huỷ, "
+                   f"{pre['skipped_quota']} bỏ qua do quota, {pre['errors']} lỗi")
+        from utils.charts import get_chart_cache_stats, CHART_CACHE_SIZE
+        charts = get_chart_cache_stats()
+        st.caption(f"Ảnh biểu đồ: {charts['hits']} lần dùng lại, {charts['misses']} lần vẽ, "
+                   f"{charts['size']}/{CHART_CACHE_SIZE} đang giữ, {charts['evictions']} bị bỏ")
+        st.download_button(
+            "Tải log (JSON lines)",
+            "\n".join(json.dumps(r, ensure_ascii=False) for r in history),
+            file_name="metrics.jsonl", mime="application/json",
+        )
@@ -0,0 +1,246 @@
+# utils/partitions.py
+# Chia các sheet lớn (matches, funds) thành các bảng con theo năm: matches_2025, matches_2026...
+# Mỗi dòng nằm trong bảng con của năm của nó (dòng không có ngày hợp lệ đi theo dòng trước).
+#
+# Danh mục (sheet "partitions") là các đoạn theo đúng thứ tự dòng của cả bảng: mỗi đoạn là một
+# khúc dòng liền nhau của một bảng con, kèm khoảng ngày và số dòng. Một bảng con có thể có nhiều
+# đoạn (vd. nhập lịch sử năm 2024 sau khi đã có dữ liệu 2026: matches_2026, matches_2024, rồi lại
+# matches_2026); đoạn thứ k của một bảng con bắt đầu ngay sau các đoạn trước đó của cùng bảng con.
+# Dòng mới luôn nối vào cuối cả bảng (đoạn cuối, hoặc một đoạn mới khi khác năm) nên vị trí dòng
+# và Mã trận không bao giờ xê dịch, và chỉ đoạn cuối còn mở (chưa ghi ngày cuối và số dòng).
+# Đọc theo khoảng ngày chỉ cần các bảng con có đoạn giao với khoảng cần đọc.
+# Module này chỉ tính toán trên danh mục; việc đọc/ghi nằm trong utils/gsheets.py.
+import bisect
+import datetime
+import functools
+import pandas as pd
+
+# Trùng với MATCH_SHEET, FUND_SHEET trong utils/repository.py
+PARTITIONED_SHEETS = ("matches", "funds")
+CATALOG_SHEET = "partitions"
+# Mỗi dòng danh mục là một đoạn; đoạn cuối cùng còn mở: để trống Đến ngày và Số dòng.
+# Dòng có Phân vùng trống: sheet đã chuyển sang dạng chia năm nhưng chưa có dữ liệu.
+CATALOG_COLUMNS = ["Bảng", "Phân vùng", "Năm", "Từ ngày", "Đến ngày", "Số dòng"]
+DATE_FORMAT = "%d/%m/%Y"
+
+
+def is_partitioned(sheet_name):
+    return sheet_name in PARTITIONED_SHEETS
+
+
+def partition_name(sheet_name, year):
+    return f"{sheet_name}_{year}"
+
+
+def is_partition_of(name, sheet_name):
+    prefix = sheet_name + "_"
+    return name.startswith(prefix) and name[len(prefix):].isdigit()
+
+
+@functools.lru_cache(maxsize=4096)
+def _date(ngay):
+    # Cùng một ngày lặp lại ở rất nhiều dòng: chỉ parse một lần
+    try:
+        return datetime.datetime.strptime(str(ngay).strip(), DATE_FORMAT).date()
+    except ValueError:
+        return None
+
+
+def _text(day):
+    return day.strftime(DATE_FORMAT) if day is not None else ""
+
+
+def _new_part(sheet_name, year):
+    return {"name": partition_name(sheet_name, year), "year": year, "start": None, "end": None, "rows": 0}
+
+
+def _cover(part, day):
+    if day is not None:
+        part["start"] = day if part["start"] is None else min(part["start"], day)
+        part["end"] = day if part["end"] is None else max(part["end"], day)
+
+
+def _open_tail(parts):
+    # Đoạn cuối còn nhận dòng mới: không giữ ngày cuối và số dòng
+    if parts:
+        parts[-1]["end"] = None
+        parts[-1]["rows"] = None
+    return parts
+
+
+def _assign(days, current=None):
+    # Năm (bảng con) của từng dòng; dòng không có ngày hợp lệ đi theo dòng trước nó
+    if current is None:
+        current = next((day.year for day in days if day is not None), datetime.date.today().year)
+    years = []
+    for day in days:
+        if day is not None:
+            current = day.year
+        years.append(current)
+    return years
+
+
+def names(parts):
+    """Các bảng con (không lặp) theo thứ tự xuất hiện đầu tiên trong danh mục."""
+    return list(dict.fromkeys(part["name"] for part in parts))
+
+
+def _offsets(parts):
+    # Vị trí đầu của từng đoạn trong bảng con của nó
+    used, offsets = {}, []
+    for part in parts:
+        offsets.append(used.get(part["name"], 0))
+        used[part["name"]] = offsets[-1] + (part["rows"] or 0)
+    return offsets
+
+
+def slices(parts):
+    """[(tên bảng con, dòng đầu, dòng cuối hoặc None)] của từng đoạn, theo thứ tự dòng của cả bảng."""
+    return [(part["name"], start, None if part["rows"] is None else start + part["rows"])
+            for part, start in zip(parts, _offsets(parts))]
+
+
+# -------- Danh mục ----------
+def read_catalog(df):
+    """Bảng danh mục (chuỗi) -> {sheet: [bảng con theo thứ tự]}."""
+    catalog = {}
+    if df.empty or not set(CATALOG_COLUMNS) <= set(df.columns):
+        return catalog
+    for row in df[CATALOG_COLUMNS].astype(str).to_dict("records"):
+        parts = catalog.setdefault(row["Bảng"].strip(), [])
+        if not row["Phân vùng"].strip():
+            continue
+        rows = row["Số dòng"].strip()
+        parts.append({
+            "name": row["Phân vùng"].strip(),
+            "year": int(row["Năm"]),
+            "start": _date(row["Từ ngày"]),
+            "end": _date(row["Đến ngày"]),
+            "rows": int(rows) if rows else None,
+        })
+    return catalog
+
+
+def catalog_frame(catalog):
+    rows = []
+    for sheet_name, parts in catalog.items():
+        if not parts:
+            rows.append({"Bảng": sheet_name, "Phân vùng": "", "Năm": "", "Từ ngày": "", "Đến ngày": "", "Số dòng": ""})
+        for part in parts:
+            rows.append({
+                "Bảng": sheet_name, "Phân vùng": part["name"], "Năm": part["year"],
+                "Từ ngày": _text(part["start"]), "Đến ngày": _text(part["end"]),
+                "Số dòng": "" if part["rows"] is None else part["rows"],
+            })
+    return pd.DataFrame(rows, columns=CATALOG_COLUMNS)
+
+
+# -------- Chia dòng ----------
+def split(sheet_name, df):
+    """Chia cả bảng (giữ thứ tự dòng) thành các bảng con: trả về (danh mục của sheet, [(tên, DataFrame)])."""
+    if df.empty:
+        return [], []
+    days = [_date(v) for v in df["Ngày"]] if "Ngày" in df.columns else [None] * len(df)
+    years = _assign(days)
+    parts, positions = [], {}
+    start = 0
+    for i in range(1, len(years) + 1):
+        if i < len(years) and years[i] == years[start]:
+            continue
+        part = _new_part(sheet_name, years[start])
+        for day in days[start:i]:
+            _cover(part, day)
+        part["rows"] = i - start
+        parts.append(part)
+        positions.setdefault(part["name"], []).extend(range(start, i))
+        start = i
+    frames = [(name, df.iloc[rows].reset_index(drop=True)) for name, rows in positions.items()]
+    return _open_tail(parts), frames
+
+
+def needs_rollover(parts, rows):
+    """Các dòng mới có phải đóng đoạn cuối hiện có không (có dòng khác năm với đoạn đó)."""
+    if not parts:
+        return False
+    days = (_date(row.get("Ngày", "")) for row in rows)
+    return any(day is not None and day.year != parts[-1]["year"] for day in days)
+
+
+def route(parts, sheet_name, rows, tail_frame=None):
+    """Chia các dòng thêm vào: trả về (danh mục mới, [(tên bảng con, các dòng)] theo thứ tự ghi).
+
+    Mỗi dòng vào bảng con của năm của nó (bảng con chưa có thì được mở). tail_frame: dữ liệu
+    của bảng con chứa đoạn cuối hiện có, cần khi phải đóng đoạn đó lại (needs_rollover).
+    """
+    parts = [dict(part) for part in parts]
+    days = [_date(row.get("Ngày", "")) for row in rows]
+    years = _assign(days, parts[-1]["year"] if parts else None)
+    if parts and any(year != parts[-1]["year"] for year in years):
+        if tail_frame is None:
+            raise ValueError(f"Cần dữ liệu của {parts[-1]['name']} để đóng đoạn cuối")
+        tail = parts[-1]
+        first = _offsets(parts)[-1]
+        tail["rows"] = len(tail_frame) - first
+        tail["end"] = None
+        if "Ngày" in tail_frame.columns:
+            for day in map(_date, tail_frame["Ngày"].iloc[first:]):
+                _cover(tail, day)
+    groups = []
+    for row, day, year in zip(rows, days, years):
+        if not parts or parts[-1]["year"] != year:
+            parts.append(_new_part(sheet_name, year))
+        tail = parts[-1]
+        if not groups or groups[-1][0] != tail["name"]:
+            groups.append((tail["name"], []))
+        _cover(tail, day)
+        if tail["rows"] is not None:
+            tail["rows"] += 1
+        groups[-1][1].append(row)
+    return _open_tail(parts), groups
+
+
+# -------- Đọc/sửa theo danh mục ----------
+def prune(parts, start, end):
+    """Các bảng con (không lặp, theo năm) có đoạn có thể chứa dòng có ngày trong [start, end]."""
+    start, end = pd.Timestamp(start).date(), pd.Timestamp(end).date()
+    kept = [
+        part for part in parts
+        if part["start"] is not None and part["start"] <= end and (part["end"] is None or part["end"] >= start)
+    ]
+    return names(sorted(kept, key=lambda part: part["year"]))
+
+
+def _segment_of(parts, updates):
+    # Vị trí dòng của cả bảng -> (chỉ số đoạn, vị trí trong bảng con)
+    firsts = [0]
+    for part in parts[:-1]:
+        firsts.append(firsts[-1] + part["rows"])
+    offsets = _offsets(parts)
+    for idx in updates:
+        i = bisect.bisect_right(firsts, int(idx)) - 1
+        yield idx, i, offsets[i] + int(idx) - firsts[i]
+
+
+def locate(parts, updates):
+    """{vị trí dòng của cả bảng: giá trị} -> {tên bảng con: {vị trí trong bảng con: giá trị}}."""
+    result = {}
+    for idx, i, local in _segment_of(parts, updates):
+        result.setdefault(parts[i]["name"], {})[local] = updates[idx]
+    return result
+
+
+def widen(parts, updates):
+    """Nới khoảng ngày của các đoạn có ô Ngày bị sửa ({vị trí dòng của cả bảng: giá trị}); trả về danh mục mới."""
+    parts = [dict(part) for part in parts]
+    for idx, i, _ in _segment_of(parts, updates):
+        values = updates[idx]
+        if "Ngày" not in values:
+            continue
+        part, day = parts[i], _date(values["Ngày"])
+        if part["end"] is None:
+            # Đoạn còn mở: chỉ giữ ngày đầu
+            if day is not None and (part["start"] is None or day < part["start"]):
+                part["start"] = day
+        else:
+            _cover(part, day)
+    return parts
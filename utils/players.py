@@ -0,0 +1,159 @@
+# utils/players.py
+# Bảng tra người chơi: mỗi tên được gán một mã số nguyên, lịch sử trận được lưu
+# thành các mảng NumPy gọn (trận, người chơi, bên thắng/thua) dạng CSR theo trận.
+# Thống kê theo người (số trận thắng/thua, tiền thua) chỉ còn là phép tính trên mảng.
+import numpy as np
+import pandas as pd
+from utils import metrics
+
+LOSER = 0
+WINNER = 1
+DEFAULT_FEE = 5000
+
+
+def split_team(team):
+    # Tên có thể ngăn cách bằng dấu phẩy hoặc khoảng trắng
+    return str(team).replace(",", " ").split()
+
+
+def _team_codes(series):
+    if isinstance(series.dtype, pd.CategoricalDtype):
+        return series.cat.codes.to_numpy(), series.cat.categories
+    return pd.factorize(series.fillna("").astype(str))
+
+
+class PlayerIndex:
+    def __init__(self, names, match_idx, player_id, side, n_matches, fee=None):
+        self.names = names                  # mã -> tên (mảng object)
+        self.match_idx = match_idx          # int32, đã sắp theo trận
+        self.player_id = player_id          # int32
+        self.side = side                    # int8: LOSER / WINNER
+        self.n_matches = n_matches
+        self.fee = fee                      # int64 giá mỗi người đã chốt lúc nhập (None: tính theo hội viên)
+        # indptr[i]:indptr[i+1] là các lượt tham gia của trận i
+        self.indptr = np.searchsorted(match_idx, np.arange(n_matches + 1)).astype(np.int64)
+        self.ids = {name: i for i, name in enumerate(names)}
+
+    @classmethod
+    @metrics.timed("PlayerIndex.from_matches")
+    def from_matches(cls, df_matches):
+        n = len(df_matches)
+        sides = []
+        for col, side in (("Đội thua", LOSER), ("Đội thắng", WINNER)):
+            codes, teams = _team_codes(df_matches[col])
+            # Mỗi chuỗi đội khác nhau chỉ tách một lần
+            members = [split_team(t) for t in teams]
+            sides.append((codes, members, side))
+
+        # Gán mã cho mọi tên xuất hiện
+        flat = [name for _, members, _ in sides for team in members for name in team]
+        ids, names = pd.factorize(pd.Series(flat, dtype=object))
+        names = np.asarray(names, dtype=object)
+
+        match_parts, player_parts, side_parts = [], [], []
+        pos = 0
+        for codes, members, side in sides:
+            lengths = np.array([len(team) for team in members] + [0], dtype=np.int64)
+            team_ptr = np.concatenate([[0], np.cumsum(lengths[:-1])]) + pos
+            pos += int(lengths.sum())
+            codes = np.where(codes < 0, len(members), codes)   # ô trống -> đội rỗng
+            per_match = lengths[codes]
+            total = int(per_match.sum())
+            match_idx = np.repeat(np.arange(n, dtype=np.int64), per_match)
+            starts = np.repeat(np.cumsum(per_match) - per_match, per_match)
+            offset = np.arange(total, dtype=np.int64) - starts
+            first = team_ptr[codes]
+            player = ids[np.repeat(first, per_match) + offset] if total else np.array([], dtype=np.int64)
+            match_parts.append(match_idx)
+            player_parts.append(player)
+            side_parts.append(np.full(total, side, dtype=np.int8))
+
+        match_idx = np.concatenate(match_parts)
+        order = np.argsort(match_idx, kind="stable")
+        return cls(
+            names,
+            match_idx[order].astype(np.int32),
+            np.concatenate(player_parts)[order].astype(np.int32),
+            np.concatenate(side_parts)[order],
+            n,
+        )
+
+    @classmethod
+    @metrics.timed("PlayerIndex.from_participations")
+    def from_participations(cls, df_parts, n_matches):
+        """Dựng từ bảng participations (Mã trận, Tên, Bên, Giá) đã chuẩn hoá, không cần tách chuỗi."""
+        if (df_parts["Mã trận"] < 0).any():
+            # Dòng đã xoá (Mã trận trống)
+            df_parts = df_parts[df_parts["Mã trận"] >= 0]
+            df_parts = df_parts.assign(Tên=df_parts["Tên"].cat.remove_unused_categories())
+        names = df_parts["Tên"].cat.categories
+        order = np.argsort(df_parts["Mã trận"].to_numpy(), kind="stable")
+        return cls(
+            np.asarray(names, dtype=object),
+            df_parts["Mã trận"].to_numpy()[order].astype(np.int32),
+            df_parts["Tên"].cat.codes.to_numpy()[order].astype(np.int32),
+            df_parts["Bên"].to_numpy()[order].astype(np.int8),
+            n_matches,
+            fee=df_parts["Giá"].to_numpy()[order].astype(np.int64),
+        )
+
+    def select(self, matches):
+        """Chỉ mục con cho các trận ở vị trí matches (đánh số lại 0..len(matches)-1)."""
+        matches = np.asarray(matches, dtype=np.int64)
+        lo = self.indptr[matches]
+        counts = self.indptr[matches + 1] - lo
+        total = int(counts.sum())
+        starts = np.repeat(np.cumsum(counts) - counts, counts)
+        rows = np.repeat(lo, counts) + np.arange(total, dtype=np.int64) - starts
+        return PlayerIndex(
+            self.names,
+            np.repeat(np.arange(len(matches), dtype=np.int32), counts),
+            self.player_id[rows],
+            self.side[rows],
+            len(matches),
+            fee=None if self.fee is None else self.fee[rows],
+        )
+
+    # -------- Truy vấn ----------
+    def __len__(self):
+        return len(self.player_id)
+
+    def member_fees(self, members_df):
+        """Giá thua theo mã người chơi (người ngoài danh sách: 5000)."""
+        fees = np.full(len(self.names), DEFAULT_FEE, dtype=np.int64)
+        if members_df is None or members_df.empty:
+            return fees
+        table = members_df.drop_duplicates("Tên", keep="last")
+        values = pd.to_numeric(table["Giá thua"], errors="coerce").fillna(0).astype(np.int64)
+        for name, fee in zip(table["Tên"], values):
+            pid = self.ids.get(name)
+            if pid is not None:
+                fees[pid] = fee
+        return fees
+
+    def unit_fees(self, match_price, members_df):
+        """Giá mỗi người của từng lượt tham gia: giá riêng của trận nếu có, nếu không thì giá hội viên."""
+        if self.fee is not None:
+            return self.fee
+        price = np.asarray(match_price, dtype=np.int64)[self.match_idx]
+        return np.where(price > 0, price, self.member_fees(members_df)[self.player_id])
+
+    def fees(self, match_price, members_df):
+        """Tiền thua của từng lượt tham gia (0 với người thắng)."""
+        return np.where(self.side == LOSER, self.unit_fees(match_price, members_df), 0)
+
+    def aggregate(self, match_price, members_df, match_group=None, n_groups=1):
+        """Số trận thua/thắng và tổng tiền theo (nhóm trận, người chơi).
+
+        Trả về các mảng phẳng kích thước n_groups * số người chơi.
+        """
+        n_players = len(self.names)
+        group = 0 if match_group is None else np.asarray(match_group, dtype=np.int64)[self.match_idx]
+        keep = np.ones(len(self), dtype=bool) if match_group is None else group >= 0
+        key = (group * n_players + self.player_id)[keep] if match_group is not None else self.player_id
+        size = n_groups * n_players
+        loser = self.side[keep] == LOSER
+        losses = np.bincount(key[loser], minlength=size)
+        wins = np.bincount(key[~loser], minlength=size)
+        money = np.bincount(key, weights=self.fees(match_price, members_df)[keep], minlength=size)
+        return losses, wins, money.astype(np.int64)
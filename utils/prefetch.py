@@ -0,0 +1,98 @@
+# utils/prefetch.py
+# Nạp sẵn dữ liệu của các trang khác trong nền, sau khi trang hiện tại đã vẽ xong:
+# import module trang, đọc các sheet trang đó cần (PAGE_SHEETS) vào cache dùng chung,
+# chuẩn hoá kiểu và dựng chỉ mục ngày. Chuyển trang sau đó lấy dữ liệu từ bộ nhớ.
+# Chỉ chạy khi còn dư quota đọc, và bị huỷ khi có lần chạy trang mới.
+import importlib
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from utils import gsheets, metrics
+
+# Để dành bấy nhiêu request đọc (trong quota mỗi phút) cho người dùng thao tác trực tiếp
+PREFETCH_QUOTA_RESERVE = 20
+PREFETCH_WORKERS = 2
+
+_lock = threading.Lock()
+_executor = None
+_futures = []
+_generation = 0
+_stats = {"scheduled": 0, "done": 0, "cancelled": 0, "skipped_quota": 0, "errors": 0}
+
+
+def _get_executor():
+    global _executor
+    if _executor is None:
+        _executor = ThreadPoolExecutor(max_workers=PREFETCH_WORKERS, thread_name_prefix="prefetch")
+    return _executor
+
+
+def _current(generation):
+    with _lock:
+        return generation == _generation
+
+
+def _count(key):
+    with _lock:
+        _stats[key] += 1
+
+
+def _warm(module_name, generation):
+    from utils import repository
+
+    if not _current(generation):
+        _count("cancelled")
+        return
+    module = importlib.import_module(module_name)
+    sheets = list(getattr(module, "PAGE_SHEETS", []))
+    if not sheets or not _current(generation):
+        _count("cancelled" if sheets else "done")
+        return
+    if gsheets.read_quota_available() <= PREFETCH_QUOTA_RESERVE:
+        _count("skipped_quota")
+        return
+    try:
+        with metrics.span(f"prefetch[{module_name}]", kind="io"):
+            # Một request cho mọi sheet, sau đó chuẩn hoá và dựng chỉ mục (không gọi mạng)
+            gsheets.load_sheets_versioned(sheets)
+            typed = [name for name in sheets if name in repository.TYPED_SHEETS]
+            repository.load_many(*typed)
+            for name in typed:
+                if not _current(generation):
+                    _count("cancelled")
+                    return
+                if name in repository.DATED_SHEETS:
+                    repository.load_indexed(name)
+            if {repository.MATCH_SHEET, repository.PARTICIPATION_SHEET} <= set(typed):
+                repository.load_player_index()
+        _count("done")
+    except Exception:
+        # Nạp sẵn chỉ là tối ưu: lỗi ở đây để lần mở trang thật xử lý
+        _count("errors")
+
+
+# -------- API ----------
+def schedule(module_names):
+    """Huỷ các lần nạp sẵn cũ và nạp sẵn cho các module trang này."""
+    cancel()
+    with _lock:
+        generation = _generation
+        executor = _get_executor()
+        for name in module_names:
+            _futures.append(executor.submit(_warm, name, generation))
+            _stats["scheduled"] += 1
+
+
+def cancel():
+    """Bỏ các lần nạp sẵn chưa chạy; lần đang chạy dừng ở bước kế tiếp."""
+    global _generation
+    with _lock:
+        _generation += 1
+        for future in _futures:
+            if future.cancel():
+                _stats["cancelled"] += 1
+        _futures.clear()
+
+
+def get_prefetch_stats():
+    with _lock:
+        return dict(_stats, pending=sum(not f.done() for f in _futures))
@@ -0,0 +1,67 @@
+# utils/ratelimit.py
+# Token bucket dùng chung cho cả process, theo mô hình quota của Google Sheets API:
+# số request đọc và số request ghi bị giới hạn riêng theo mỗi phút, quota được
+# hồi dần. Bucket đầy cho phép dồn một loạt request rồi sau đó đi đều theo tốc độ hồi.
+import threading
+import time
+
+
+class TokenBucket:
+    def __init__(self, per_minute, capacity=None):
+        self.rate = per_minute / 60.0            # token hồi mỗi giây
+        self.capacity = capacity or per_minute
+        self._tokens = float(self.capacity)
+        self._updated = time.monotonic()
+        self._cond = threading.Condition()
+        self.stats = {"granted": 0, "denied": 0, "waits": 0, "wait_seconds": 0.0}
+
+    def _refill(self):
+        now = time.monotonic()
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def available(self):
+        with self._cond:
+            self._refill()
+            return self._tokens
+
+    def try_acquire(self, n=1):
+        """Lấy n token nếu có ngay, không chờ."""
+        with self._cond:
+            self._refill()
+            if self._tokens >= n:
+                self._tokens -= n
+                self.stats["granted"] += 1
+                return True
+            self.stats["denied"] += 1
+            return False
+
+    def acquire(self, n=1, timeout=None):
+        """Chờ tới khi đủ n token; trả về False nếu hết thời gian chờ."""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        start = time.monotonic()
+        with self._cond:
+            waited = False
+            while True:
+                self._refill()
+                if self._tokens >= n:
+                    self._tokens -= n
+                    self.stats["granted"] += 1
+                    if waited:
+                        self.stats["waits"] += 1
+                        self.stats["wait_seconds"] += time.monotonic() - start
+                    return True
+                wait = (n - self._tokens) / self.rate
+                if deadline is not None:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        self.stats["denied"] += 1
+                        return False
+                    wait = min(wait, remaining)
+                waited = True
+                self._cond.wait(wait)
+
+    def get_stats(self):
+        with self._cond:
+            self._refill()
+            return dict(self.stats, tokens=round(self._tokens, 2), capacity=self.capacity)
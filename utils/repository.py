@@ -0,0 +1,633 @@
+# utils/repository.py
+# Lớp dữ liệu dùng chung cho mọi trang: đọc matches, funds, members một lần,
+# chuẩn hoá kiểu dữ liệu và giữ lại bản đã chuẩn hoá cho tới khi sheet thay đổi.
+import collections
+import contextlib
+import itertools
+import threading
+import uuid
+import numpy as np
+import pandas as pd
+from utils.gsheets import (
+    load_sheet_versioned, load_sheets_versioned, load_sheet_range, save_sheet, supports_partial_reads,
+    append_rows, update_rows, read_positions, invalidate_sheet
+)
+from utils.date_index import DateIndex, take
+from utils.players import PlayerIndex, LOSER, WINNER
+from utils import metrics, write_queue
+
+MATCH_SHEET = "matches"
+FUND_SHEET = "funds"
+MEMBER_SHEET = "members"
+# Mỗi dòng là một người trong một trận (dạng dài), ghi cùng lúc với trận
+PARTICIPATION_SHEET = "participations"
+# Bảng tổng hợp theo tháng (utils/rollup.py)
+ROLLUP_STATS_SHEET = "rollup_stats"
+ROLLUP_FUNDS_SHEET = "rollup_funds"
+
+# ID: mã dòng không đổi khi sửa; Xoá: khác trống nếu dòng đã bị xoá. Dòng bị xoá vẫn giữ chỗ
+# (chỉ còn Ngày và ID) nên vị trí các dòng, Mã trận và chỉ mục dòng không bao giờ bị xê dịch
+ID_COLUMN = "ID"
+DELETED_COLUMN = "Xoá"
+MATCH_COLUMNS = ["Ngày", "Đội thắng", "Đội thua", "Giá", ID_COLUMN, DELETED_COLUMN]
+FUND_COLUMNS = ["Ngày", "Ghi chú", "Giá", ID_COLUMN, DELETED_COLUMN]
+MEMBER_COLUMNS = ["Tên", "Giá thua", ID_COLUMN, DELETED_COLUMN]
+# Mã trận: vị trí của trận trong sheet matches (các bảng con theo năm ghép lại, 0 = dòng đầu); Giá: giá mỗi người của trận đó
+PARTICIPATION_COLUMNS = ["Mã trận", "Ngày", "Tên", "Bên", "Giá", DELETED_COLUMN]
+SIDE_LABELS = {LOSER: "thua", WINNER: "thắng"}
+# Các sheet người dùng sửa/xoá từng dòng (participations đi theo matches qua Mã trận)
+ID_SHEETS = (MATCH_SHEET, FUND_SHEET, MEMBER_SHEET)
+
+# sheet -> {"key": (generation của bản thô, version hàng đợi ghi),
+#           "raw": bản thô (đã ghép thay đổi đang chờ), "df": DataFrame đã chuẩn hoá, "index": DateIndex hoặc None,
+#           "players": (key của matches, PlayerIndex) hoặc None (chỉ với participations)}
+_typed_lock = threading.Lock()
+_typed = {}
+# Khoá khi cấp Mã trận mới / dựng lại participations; cặp key đã kiểm tra khớp gần nhất
+_participation_lock = threading.RLock()
+_participation_checked = None
+# Khoá khi cấp ID cho các dòng chưa có
+_id_lock = threading.Lock()
+# sheet -> số lần dòng cũ bị sửa/xoá/ghi đè trong process này (thêm dòng và cấp ID không tính)
+_edits = collections.Counter()
+
+
+class ConflictError(Exception):
+    """Dòng cần sửa/xoá đã bị thay đổi (hoặc xoá) kể từ lúc được đọc."""
+
+
+def new_id():
+    return uuid.uuid4().hex[:12]
+
+
+def parse_dates(ngay):
+    # Mỗi ngày chỉ parse một lần dù có nhiều dòng trong ngày
+    codes, uniques = pd.factorize(ngay)
+    parsed = pd.to_datetime(pd.Index(uniques, dtype=object), format="%d/%m/%Y", errors="coerce")
+    return pd.Series(parsed.take(codes, allow_fill=True, fill_value=pd.NaT), index=ngay.index)
+
+
+def _text(series):
+    return series.fillna("").astype(str).replace("nan", "").str.strip()
+
+
+def _money(series, default):
+    return pd.to_numeric(series, errors="coerce").fillna(default).astype("int32")
+
+
+def _value_columns(columns):
+    # Các ô bị làm trống khi xoá dòng
+    return [c for c in columns if c not in ("Ngày", ID_COLUMN, DELETED_COLUMN)]
+
+
+def _reindex(raw, columns):
+    # Dòng đã xoá: coi các ô giá trị là trống dù trên sheet còn gì (vd. đánh dấu xoá bằng tay)
+    df = raw.reindex(columns=columns)
+    deleted = _text(df[DELETED_COLUMN]) != ""
+    if deleted.any():
+        df = df.copy()
+        df.loc[deleted, _value_columns(columns)] = ""
+    return df
+
+
+def _typed_matches(raw):
+    df = _reindex(raw, MATCH_COLUMNS)
+    return pd.DataFrame({
+        "Ngày": _text(df["Ngày"]),
+        "Đội thắng": _text(df["Đội thắng"]).astype("category"),
+        "Đội thua": _text(df["Đội thua"]).astype("category"),
+        "Giá": _money(df["Giá"], -1),
+        ID_COLUMN: _text(df[ID_COLUMN]),
+        DELETED_COLUMN: _text(df[DELETED_COLUMN]),
+    }).assign(Ngày_dt=lambda d: parse_dates(d["Ngày"]))
+
+
+def _typed_funds(raw):
+    df = _reindex(raw, FUND_COLUMNS)
+    return pd.DataFrame({
+        "Ngày": _text(df["Ngày"]),
+        "Ghi chú": _text(df["Ghi chú"]),
+        "Giá": _money(df["Giá"], 0),
+        ID_COLUMN: _text(df[ID_COLUMN]),
+        DELETED_COLUMN: _text(df[DELETED_COLUMN]),
+    }).assign(Ngày_dt=lambda d: parse_dates(d["Ngày"]))
+
+
+def _typed_members(raw):
+    df = _reindex(raw, MEMBER_COLUMNS)
+    return pd.DataFrame({
+        "Tên": _text(df["Tên"]).astype("category"),
+        "Giá thua": _money(df["Giá thua"], 0),
+        ID_COLUMN: _text(df[ID_COLUMN]),
+        DELETED_COLUMN: _text(df[DELETED_COLUMN]),
+    })
+
+
+def _typed_participations(raw):
+    df = _reindex(raw, PARTICIPATION_COLUMNS)
+    return pd.DataFrame({
+        "Mã trận": pd.to_numeric(df["Mã trận"], errors="coerce").fillna(-1).astype("int32"),
+        "Ngày": _text(df["Ngày"]),
+        "Tên": _text(df["Tên"]).astype("category"),
+        "Bên": (_text(df["Bên"]) == SIDE_LABELS[WINNER]).astype("int8"),
+        "Giá": _money(df["Giá"], 0),
+        DELETED_COLUMN: _text(df[DELETED_COLUMN]),
+    }).assign(Ngày_dt=lambda d: parse_dates(d["Ngày"]))
+
+
+_PARSERS = {
+    MATCH_SHEET: _typed_matches,
+    FUND_SHEET: _typed_funds,
+    MEMBER_SHEET: _typed_members,
+    PARTICIPATION_SHEET: _typed_participations,
+}
+_COLUMNS = {
+    MATCH_SHEET: MATCH_COLUMNS,
+    FUND_SHEET: FUND_COLUMNS,
+    MEMBER_SHEET: MEMBER_COLUMNS,
+    PARTICIPATION_SHEET: PARTICIPATION_COLUMNS,
+}
+TYPED_SHEETS = tuple(_PARSERS)
+# Các sheet có cột Ngày_dt (dựng được DateIndex)
+DATED_SHEETS = (MATCH_SHEET, FUND_SHEET, PARTICIPATION_SHEET)
+
+
+def _apply_pending(raw, ops):
+    # Ghép các thay đổi còn trong hàng đợi ghi vào bản đọc được (đọc được ngay cái vừa ghi)
+    df = raw.copy()
+    for kind, payload in ops:
+        if kind == "append":
+            added = pd.DataFrame(payload).astype(str)
+            df = pd.concat([df, added], ignore_index=True)
+        else:
+            for idx, values in payload.items():
+                for col, value in values.items():
+                    df.loc[int(idx), col] = str(value)
+    return df
+
+
+def _make_entry(sheet_name, key, raw):
+    with metrics.span(f"parse[{sheet_name}]") as s:
+        s.rows = len(raw)
+        df = _PARSERS[sheet_name](raw).reset_index(drop=True)
+    return {"key": key, "raw": raw, "df": df, "index": None, "players": None}
+
+
+def _current_entry(sheet_name):
+    with write_queue.reading(sheet_name) as (version, ops):
+        raw, generation = load_sheet_versioned(sheet_name)
+    key = (generation, version if ops else None)
+    with _typed_lock:
+        entry = _typed.get(sheet_name)
+    if entry is None or entry["key"] != key:
+        entry = _make_entry(sheet_name, key, _apply_pending(raw, ops) if ops else raw)
+        with _typed_lock:
+            _typed[sheet_name] = entry
+    return entry
+
+
+def _missing_ids(entry):
+    return np.flatnonzero(entry["df"][ID_COLUMN].to_numpy() == "")
+
+
+def _typed_entry(sheet_name):
+    memo = _memo()
+    if memo is not None and sheet_name in memo:
+        return memo[sheet_name]
+    entry = _current_entry(sheet_name)
+    if sheet_name in ID_SHEETS and len(_missing_ids(entry)):
+        # Dữ liệu cũ hoặc dòng thêm tay chưa có ID: cấp ID rồi ghi nền đúng các ô đó
+        with _id_lock:
+            entry = _current_entry(sheet_name)   # thread khác có thể vừa cấp xong
+            missing = _missing_ids(entry)
+            if len(missing):
+                write_queue.enqueue_update(sheet_name, {int(pos): {ID_COLUMN: new_id()} for pos in missing})
+                entry = _current_entry(sheet_name)
+    if memo is not None:
+        memo[sheet_name] = entry
+    return entry
+
+
+# -------- Unit of work của một lần chạy trang ----------
+# Trong unit_of_work(), mỗi sheet chỉ được lấy từ cache/backend một lần; các lần đọc sau
+# dùng lại bản đó, và các lần ghi của chính lần chạy này được áp vào bản đó ngay.
+_local = threading.local()
+_memo_writes = itertools.count()
+
+
+def _memo():
+    return getattr(_local, "memo", None)
+
+
+@contextlib.contextmanager
+def unit_of_work():
+    previous = _memo()
+    _local.memo = {}
+    try:
+        yield
+    finally:
+        _local.memo = previous
+
+
+def _edited(*sheet_names):
+    # Gọi sau khi thay đổi đã đọc được (đã ghi hoặc đã vào hàng đợi)
+    with _typed_lock:
+        _edits.update(sheet_names)
+
+
+def edit_count(*sheet_names):
+    """Tổng số lần dòng cũ của các sheet bị sửa/xoá/ghi đè trong process này.
+
+    Không đổi nghĩa là bảng chỉ có thể đã được thêm dòng ở cuối; đọc trước khi tải dữ liệu.
+    """
+    with _typed_lock:
+        return sum(_edits[name] for name in sheet_names)
+
+
+def _remember_write(sheet_name, op=None, raw=None):
+    # op: ("append", rows) / ("update", updates) như trong hàng đợi ghi; raw: cả bảng vừa ghi đè
+    memo = _memo()
+    if memo is None or sheet_name not in memo:
+        return
+    if raw is None:
+        raw = _apply_pending(memo[sheet_name]["raw"], [op])
+    memo[sheet_name] = _make_entry(sheet_name, ("unit_of_work", next(_memo_writes)), raw)
+
+
+def _load_typed(sheet_name):
+    return _typed_entry(sheet_name)["df"].copy()
+
+
+def load_indexed(sheet_name):
+    """(DataFrame, DateIndex theo cột Ngày_dt); chỉ mục được dựng một lần cho mỗi lần tải dữ liệu."""
+    entry = _typed_entry(sheet_name)
+    if entry["index"] is None:
+        entry["index"] = DateIndex(entry["df"]["Ngày_dt"])
+    return entry["df"].copy(), entry["index"]
+
+
+def live_rows(df):
+    """Bỏ các dòng đã xoá (để hiển thị; các phép tính theo vị trí dòng dùng cả bảng)."""
+    if DELETED_COLUMN not in df.columns:
+        return df
+    return df[df[DELETED_COLUMN] == ""].reset_index(drop=True)
+
+
+def load_player_index():
+    """(matches, PlayerIndex); bảng mã người chơi được dựng một lần cho mỗi lần tải dữ liệu."""
+    ensure_participations()
+    matches = _typed_entry(MATCH_SHEET)
+    parts = _typed_entry(PARTICIPATION_SHEET)
+    cached = parts["players"]
+    if cached is None or cached[0] != matches["key"]:
+        cached = (matches["key"], PlayerIndex.from_participations(parts["df"], len(matches["df"])))
+        parts["players"] = cached
+    return matches["df"].copy(), cached[1]
+
+
+# -------- Participations ----------
+def participation_frame(df_matches, members_df, first_id=0):
+    """Tách các trận (đã chuẩn hoá) thành bảng participations; Mã trận bắt đầu từ first_id."""
+    players = PlayerIndex.from_matches(df_matches)
+    match_idx = players.match_idx.astype(np.int64)
+    return pd.DataFrame({
+        "Mã trận": match_idx + first_id,
+        "Ngày": df_matches["Ngày"].to_numpy()[match_idx],
+        "Tên": players.names[players.player_id],
+        "Bên": np.where(players.side == WINNER, SIDE_LABELS[WINNER], SIDE_LABELS[LOSER]),
+        "Giá": players.unit_fees(df_matches["Giá"].to_numpy(), members_df),
+        DELETED_COLUMN: "",
+    }, columns=PARTICIPATION_COLUMNS)
+
+
+def _covers(df_parts, df_matches):
+    # Mỗi trận có người chơi phải có mặt trong participations, và không có mã lạ (-1: dòng đã xoá)
+    has_players = (df_matches["Đội thắng"].astype(str) != "") | (df_matches["Đội thua"].astype(str) != "")
+    codes = df_parts["Mã trận"].to_numpy()
+    return np.array_equal(np.unique(codes[codes >= 0]), np.flatnonzero(has_players.to_numpy()))
+
+
+def _keep_fees(df_parts, old_parts):
+    # Giá đã chốt lúc nhập trận được giữ lại; chỉ lượt chưa có trong bản cũ mới lấy theo giá hội viên
+    keys = ["Mã trận", "Ngày", "Tên", "Bên"]
+    old = old_parts[old_parts[DELETED_COLUMN] == ""]
+    if old.empty or df_parts.empty:
+        return df_parts
+    old = old.assign(Bên=old["Bên"].map(SIDE_LABELS))
+    old = old.assign(**{k: old[k].astype(str) for k in keys}).drop_duplicates(keys, keep="last")
+    frozen = df_parts[keys].astype(str).merge(old[keys + ["Giá"]], on=keys, how="left")["Giá"]
+    return df_parts.assign(Giá=frozen.fillna(df_parts["Giá"]).astype("int64").to_numpy())
+
+
+def rebuild_participations():
+    """Dựng lại toàn bộ sheet participations từ matches (chuyển dữ liệu cũ), giữ giá đã chốt."""
+    write_queue.flush()
+    with _participation_lock:
+        df_matches = _load_typed(MATCH_SHEET)
+        df_parts = _keep_fees(participation_frame(df_matches, _load_typed(MEMBER_SHEET)),
+                              _load_typed(PARTICIPATION_SHEET))
+        save_sheet(PARTICIPATION_SHEET, df_parts)
+        write_queue.replaced(PARTICIPATION_SHEET)
+        _remember_write(PARTICIPATION_SHEET, raw=df_parts)
+        _edited(PARTICIPATION_SHEET)
+    return len(df_parts)
+
+
+def ensure_participations():
+    """Chuyển dữ liệu một lần: nếu participations chưa có hoặc không khớp matches thì dựng lại."""
+    global _participation_checked
+    matches = _typed_entry(MATCH_SHEET)
+    parts = _typed_entry(PARTICIPATION_SHEET)
+    key = (matches["key"], parts["key"])
+    if _participation_checked == key:
+        return
+    if not _covers(parts["df"], matches["df"]):
+        rebuild_participations()
+        key = (_typed_entry(MATCH_SHEET)["key"], _typed_entry(PARTICIPATION_SHEET)["key"])
+    _participation_checked = key
+
+
+# -------- Đọc ----------
+def load_matches():
+    return _load_typed(MATCH_SHEET)
+
+
+def load_funds():
+    return _load_typed(FUND_SHEET)
+
+
+def load_members():
+    return _load_typed(MEMBER_SHEET)
+
+
+def load_many(*sheet_names):
+    """Đọc nhiều sheet trong một lần gọi mạng, trả về các DataFrame theo đúng thứ tự."""
+    memo = _memo()
+    missing = [name for name in sheet_names if memo is None or name not in memo]
+    if missing:
+        load_sheets_versioned(missing)  # nạp sẵn cache bằng một request
+    return tuple(_load_typed(name) for name in sheet_names)
+
+
+# Đọc theo khoảng ngày: sheet chia theo năm chỉ đọc các bảng con liên quan, backend có index
+# (SQLite) chỉ trả về các dòng cần thiết, Google Sheets chỉ đọc các đoạn dòng theo chỉ mục dòng;
+# còn lại dùng chỉ mục ngày trên bản đã tải
+def _load_typed_range(sheet_name, start, end):
+    memo = _memo()
+    if memo is not None and sheet_name in memo:
+        # Đã đọc cả bảng trong lần chạy này: lọc trên bản đó
+        df, index = load_indexed(sheet_name)
+        return live_rows(take(df, index.between(start, end)))
+    with write_queue.reading(sheet_name) as (_, ops):
+        raw = load_sheet_range(sheet_name, start, end) if supports_partial_reads(sheet_name) and not ops else None
+    if raw is not None and sheet_name in ID_SHEETS and not raw.empty and (
+            ID_COLUMN not in raw.columns or (raw[ID_COLUMN].astype(str).str.strip() == "").any()):
+        raw = None   # có dòng chưa có ID: tải cả bảng để cấp ID
+    if raw is None:
+        df, index = load_indexed(sheet_name)
+        return live_rows(take(df, index.between(start, end)))
+    return live_rows(_PARSERS[sheet_name](raw).reset_index(drop=True))
+
+
+def load_matches_between(start, end):
+    return _load_typed_range(MATCH_SHEET, start, end)
+
+
+def load_matches_on(ngay):
+    day = pd.Timestamp(ngay).normalize()
+    return load_matches_between(day, day)
+
+
+def load_funds_between(start, end):
+    return _load_typed_range(FUND_SHEET, start, end)
+
+
+def load_participations_between(start, end):
+    # Kiểm tra participations khớp matches phải tải cả hai bảng: chỉ làm nếu process này chưa kiểm
+    # lần nào (các lần ghi trận sau đó đều ghi kèm participations), để đọc theo tháng dùng được chỉ mục dòng
+    if _participation_checked is None:
+        ensure_participations()
+    return _load_typed_range(PARTICIPATION_SHEET, start, end)
+
+
+# -------- Ghi ----------
+def _drop_derived(df):
+    return df.drop(columns=[c for c in df.columns if c.endswith("_dt")])
+
+
+def _with_ids(df):
+    # Dòng mới (chưa có ID) được cấp ID trước khi ghi; Xoá để trống (dòng chưa bị xoá)
+    deleted = df[DELETED_COLUMN].fillna("") if DELETED_COLUMN in df.columns else ""
+    df = df.assign(**{DELETED_COLUMN: deleted})
+    ids = df[ID_COLUMN].fillna("").astype(str) if ID_COLUMN in df.columns else pd.Series("", index=df.index)
+    blank = ids.str.strip() == ""
+    if not blank.any():
+        return df
+    return df.assign(**{ID_COLUMN: ids.where(~blank, [new_id() for _ in range(len(df))])})
+
+
+def _rows_with_ids(rows):
+    return [row if str(row.get(ID_COLUMN, "")).strip() else dict(row, **{ID_COLUMN: new_id()}) for row in rows]
+
+
+# Ghi đè cả bảng: chờ hàng đợi ghi xong trước để không bị ghi đè ngược. df được dựng từ bản đọc
+# đã gồm các thay đổi bị giữ lại sau lần ghi hỏng, nên sau khi ghi đè thì bỏ các thay đổi đó
+def _replace(sheet_name, df):
+    write_queue.flush()
+    save_sheet(sheet_name, df)
+    write_queue.replaced(sheet_name)
+    _remember_write(sheet_name, raw=df)
+    _edited(sheet_name)
+
+
+# Chỉ còn dùng để dọn dòng tổng quỹ bị trùng (update_fund); mọi thay đổi khác đi qua
+# append/_change_rows để giữ ID và kiểm tra xung đột
+def save_funds(df: pd.DataFrame):
+    _replace(FUND_SHEET, _with_ids(_drop_derived(df)))
+
+
+# Thêm/sửa dòng: xếp vào hàng đợi ghi nền, trả về ngay
+def append_matches(rows):
+    # Ghi kèm các dòng participations; Mã trận nối tiếp số trận hiện có (kể cả đang chờ ghi)
+    rows = _rows_with_ids(rows)
+    if not rows:
+        return 0
+    ensure_participations()
+    with _participation_lock:
+        first_id = len(_typed_entry(MATCH_SHEET)["df"])
+        df_parts = participation_frame(_typed_matches(pd.DataFrame(rows)), _load_typed(MEMBER_SHEET), first_id)
+        parts = df_parts.to_dict("records")
+        write_queue.enqueue_append(MATCH_SHEET, rows)
+        write_queue.enqueue_append(PARTICIPATION_SHEET, parts)
+    _remember_write(MATCH_SHEET, ("append", rows))
+    _remember_write(PARTICIPATION_SHEET, ("append", parts))
+    return len(rows)
+
+
+def append_funds(rows):
+    rows = _rows_with_ids(rows)
+    count = write_queue.enqueue_append(FUND_SHEET, rows)
+    if count:
+        _remember_write(FUND_SHEET, ("append", rows))
+    return count
+
+
+def append_members(rows):
+    rows = _rows_with_ids(rows)
+    count = write_queue.enqueue_append(MEMBER_SHEET, rows)
+    if count:
+        _remember_write(MEMBER_SHEET, ("append", rows))
+    return count
+
+
+def update_fund_rows(updates):
+    count = write_queue.enqueue_update(FUND_SHEET, updates)
+    if count:
+        _remember_write(FUND_SHEET, ("update", dict(updates)))
+        _edited(FUND_SHEET)
+    return count
+
+
+def delete_fund_rows(positions):
+    """Đánh dấu xoá các dòng quỹ theo vị trí (dòng tự sinh, không kiểm tra xung đột như delete_rows)."""
+    return update_fund_rows({int(pos): _deleted_values(FUND_SHEET) for pos in positions})
+
+
+# -------- Nhập hàng loạt ----------
+def import_batches(sheet_name, batches):
+    """Ghi thẳng (không qua hàng đợi) từng lô dòng vào cuối matches/funds, mỗi lô một lần append.
+
+    batches: iterable các list dòng, được lấy dần (đọc file tới đâu ghi tới đó). Với matches,
+    participations được ghi kèm từng lô, Mã trận nối tiếp nhau. Trả về số dòng đã ghi.
+    """
+    if sheet_name not in (MATCH_SHEET, FUND_SHEET):
+        raise ValueError(f"Không nhập hàng loạt được vào sheet {sheet_name}")
+    sheet_names = (sheet_name, PARTICIPATION_SHEET) if sheet_name == MATCH_SHEET else (sheet_name,)
+    if sheet_name == MATCH_SHEET:
+        ensure_participations()
+    written = 0
+    # Giữ khoá suốt lần nhập: các lần thêm trận khác trong process chờ để Mã trận không bị trùng, và
+    # hàng đợi ghi phải trống (không có dòng nào đang chờ để rồi bị ghi sau các lô nhập) cho tới khi xong
+    with _participation_lock, write_queue.drained(*sheet_names):
+        if any(write_queue.unsaved_count(name) for name in sheet_names):
+            # Ghi thẳng lúc này sẽ chen trước các dòng chưa ghi được (lệch vị trí dòng, Mã trận)
+            raise ValueError("Còn thay đổi chưa lưu được lên sheet, hãy bấm thử lưu lại trước khi nhập file.")
+        if sheet_name == MATCH_SHEET:
+            first_id = len(_typed_entry(MATCH_SHEET)["df"])
+            members_df = _load_typed(MEMBER_SHEET)
+        try:
+            for rows in batches:
+                rows = _rows_with_ids(rows)
+                if not rows:
+                    continue
+                append_rows(sheet_name, rows)
+                if sheet_name == MATCH_SHEET:
+                    df_parts = participation_frame(_typed_matches(pd.DataFrame(rows)), members_df, first_id + written)
+                    append_rows(PARTICIPATION_SHEET, df_parts.to_dict("records"))
+                written += len(rows)
+        finally:
+            # Bản đã đọc trong lần chạy này không còn đúng: lần đọc sau lấy từ sheet
+            memo = _memo()
+            if memo is not None:
+                for name in (sheet_name, PARTICIPATION_SHEET):
+                    memo.pop(name, None)
+    return written
+
+
+# -------- Sửa/xoá từng dòng theo ID ----------
+# Chỉ đọc lại đúng các dòng cần sửa để kiểm tra chúng vẫn giống lúc người dùng nhìn thấy
+# (kiểm tra lạc quan), rồi chỉ ghi các ô bị đổi; không tải/ghi lại cả bảng.
+def _deleted_values(sheet_name):
+    return dict({c: "" for c in _value_columns(_COLUMNS[sheet_name])}, **{DELETED_COLUMN: "1"})
+
+
+def _same(expected, current, columns):
+    return all(str(expected[col]) == str(current[col]) for col in columns if col in expected)
+
+
+def _locate_rows(sheet_name, rows):
+    """Vị trí hiện tại của các dòng đã đọc (theo ID), sau khi đọc lại đúng các dòng đó từ sheet."""
+    columns = [c for c in _COLUMNS[sheet_name] if c != ID_COLUMN]
+    ids = [str(row[ID_COLUMN]) for row in rows]
+    for attempt in range(2):
+        df = _typed_entry(sheet_name)["df"]
+        lookup = pd.Series(np.arange(len(df)), index=df[ID_COLUMN].to_numpy())
+        lookup = lookup[~lookup.index.duplicated(keep="last")]
+        found = [int(lookup[row_id]) if row_id and row_id in lookup.index else None for row_id in ids]
+        if None not in found:
+            current = read_positions(sheet_name, found)
+            typed = _PARSERS[sheet_name](pd.DataFrame([current.get(pos, {}) for pos in found]))
+            if (typed[ID_COLUMN].to_numpy() == np.array(ids, dtype=object)).all():
+                for expected, actual in zip(rows, typed.to_dict("records")):
+                    if not _same(expected, actual, columns):
+                        invalidate_sheet(sheet_name)
+                        raise ConflictError("Dòng này vừa được người khác sửa hoặc xoá, hãy xem lại dữ liệu mới.")
+                return found
+        # Bản trong cache đã cũ (cả bảng bị ghi lại, dòng bị chèn tay...): tải lại rồi tìm lần nữa
+        invalidate_sheet(sheet_name)
+        memo = _memo()
+        if memo is not None:
+            memo.pop(sheet_name, None)
+    raise ConflictError("Không còn tìm thấy dòng này trên sheet, hãy xem lại dữ liệu mới.")
+
+
+def _match_participations(changes, members_df):
+    # Trận bị sửa/xoá: đánh dấu xoá các dòng participations cũ của trận, trận được sửa thì
+    # ghi lại các dòng mới với cùng Mã trận
+    df_parts = _typed_entry(PARTICIPATION_SHEET)["df"]
+    old = np.flatnonzero(np.isin(df_parts["Mã trận"].to_numpy(), list(changes)))
+    deleted = {int(pos): _deleted_values(PARTICIPATION_SHEET) for pos in old}
+    added = []
+    for pos, row in changes.items():
+        if not row.get(DELETED_COLUMN):
+            added += participation_frame(_typed_matches(pd.DataFrame([row])), members_df, pos).to_dict("records")
+    if deleted:
+        update_rows(PARTICIPATION_SHEET, deleted)
+        _remember_write(PARTICIPATION_SHEET, ("update", deleted))
+    if added:
+        append_rows(PARTICIPATION_SHEET, added)
+        _remember_write(PARTICIPATION_SHEET, ("append", added))
+
+
+def _change_rows(sheet_name, changes):
+    # changes: [(dòng đã đọc, {cột: giá trị mới})]
+    if sheet_name not in ID_SHEETS:
+        raise ValueError(f"Sheet {sheet_name} không sửa được theo từng dòng")
+    if not changes:
+        return 0
+    # Các dòng đang chờ ghi phải nằm trên sheet trước khi tìm vị trí; sau đó giữ khoá để
+    # thread ghi nền không chen vào giữa lúc kiểm tra và lúc ghi
+    write_queue.flush()
+    if sheet_name == MATCH_SHEET:
+        ensure_participations()
+        members_df = _load_typed(MEMBER_SHEET)
+    with _participation_lock, write_queue.locked(sheet_name, PARTICIPATION_SHEET):
+        rows = [row for row, _ in changes]
+        positions = _locate_rows(sheet_name, rows)
+        updates = {}
+        for pos, (_, values) in zip(positions, changes):
+            updates.setdefault(pos, {}).update(values)
+        count = update_rows(sheet_name, updates)
+        _remember_write(sheet_name, ("update", updates))
+        if sheet_name == MATCH_SHEET:
+            columns = [c for c in MATCH_COLUMNS if c != DELETED_COLUMN]
+            merged = {pos: dict({c: row[c] for c in columns}, **updates[pos]) for pos, row in zip(positions, rows)}
+            _match_participations(merged, members_df)
+    _edited(sheet_name, *([PARTICIPATION_SHEET] if sheet_name == MATCH_SHEET else []))
+    return count
+
+
+def update_row(sheet_name, row, values):
+    """Sửa các ô trong values của một dòng đã đọc (row phải có cột ID).
+
+    Báo ConflictError nếu dòng trên sheet không còn giống row (người khác vừa sửa/xoá).
+    """
+    values = {col: value for col, value in values.items() if col not in (ID_COLUMN, DELETED_COLUMN)}
+    if not values:
+        return 0
+    return _change_rows(sheet_name, [(row, values)])
+
+
+def delete_rows(sheet_name, rows):
+    """Xoá các dòng đã đọc: giữ chỗ dòng (Ngày, ID), làm trống các ô còn lại và đánh dấu Xoá."""
+    return _change_rows(sheet_name, [(row, _deleted_values(sheet_name)) for row in rows])
@@ -0,0 +1,213 @@
+# utils/rollup.py
+# Bảng tổng hợp theo tháng, lưu sẵn trong backend:
+#   rollup_stats: (Năm, Tháng, Tên) -> số trận thua/thắng, tổng tiền
+#   rollup_funds: (Năm, Tháng) -> tổng thu chi (mọi dòng) và thu chi nhập tay
+# Mỗi lần ghi là một lô dòng gắn khoảng dòng nguồn đã tổng hợp (Từ dòng, Đến dòng) và hash của
+# phần đầu bảng nguồn tới Đến dòng. Các lô phải nối tiếp nhau từ dòng 0: lô bị gửi hai lần được
+# bỏ bớt, thiếu lô thì tổng hợp lại từ đầu, nên không cần một bảng trạng thái ghi riêng.
+#
+# refresh() chỉ so số dòng và số lần sửa dòng cũ (repository.edit_count): không đổi thì dùng lại
+# kết quả, chỉ có dòng mới thì chỉ hash và cộng thêm các dòng mới, có sửa dòng cũ thì tổng hợp lại.
+# Hash cả phần đã tổng hợp chỉ được kiểm một lần mỗi process (lần đầu đọc bảng đã lưu), để phát
+# hiện dữ liệu bị đổi từ lần chạy trước; sửa tay trên sheet lúc app đang chạy thì cần khởi động lại.
+import threading
+import pandas as pd
+from utils.gsheets import load_sheets_versioned, save_sheet
+from utils.repository import ROLLUP_STATS_SHEET, ROLLUP_FUNDS_SHEET
+from utils import metrics, stats, write_queue
+
+STATS_KEYS = ["Năm", "Tháng", "Tên"]
+STATS_COLUMNS = STATS_KEYS + ["Số trận thua", "Số trận thắng", "Tổng tiền"]
+FUNDS_KEYS = ["Năm", "Tháng"]
+FUNDS_COLUMNS = FUNDS_KEYS + ["Tổng", "Thu chi"]
+# Khoảng dòng nguồn [Từ dòng, Đến dòng) của lô và hash phần đầu bảng nguồn tới Đến dòng
+BATCH_COLUMNS = ["Từ dòng", "Đến dòng", "Hash"]
+
+# Dòng quỹ do update_fund tự sinh
+AUTO_FUND_NOTE = "Tổng thu quỹ tháng"
+
+# tên -> (sheet lưu, khoá, cột số liệu, cột của bảng nguồn được hash)
+_SPECS = {
+    "stats": (ROLLUP_STATS_SHEET, STATS_KEYS, STATS_COLUMNS[3:], ["Ngày", "Đội thắng", "Đội thua", "Giá"]),
+    "funds": (ROLLUP_FUNDS_SHEET, FUNDS_KEYS, FUNDS_COLUMNS[2:], ["Ngày", "Ghi chú", "Giá"]),
+}
+
+_lock = threading.Lock()
+# tên -> {"df": tổng hợp đã gom, "rows": số dòng nguồn đã tổng hợp, "hash": hash của các dòng đó,
+#         "written": Đến dòng của lô cuối đã ghi, "fresh": chưa có gì dùng được, "verified": đã kiểm hash,
+#         "edits": số lần sửa dòng cũ lúc tổng hợp (None: chưa biết)}
+_state = None
+
+
+# -------- Hash ----------
+def _prefix_hash(df, cols):
+    # Tổng (mod 2^64) hash từng dòng nên cộng dồn được khi thêm dòng
+    if df.empty:
+        return 0
+    return int(pd.util.hash_pandas_object(df[cols].astype(str), index=False).sum()) % (1 << 64)
+
+
+# -------- Tính tổng hợp ----------
+def _stats_rollup(df_matches, members_df, players=None):
+    df_stats, _ = stats.get_monthly_stats(df_matches, members_df, players)
+    if df_stats.empty:
+        return pd.DataFrame(columns=STATS_COLUMNS)
+    return df_stats[STATS_COLUMNS]
+
+
+def _funds_rollup(df_funds):
+    df = df_funds.dropna(subset=["Ngày_dt"])
+    if df.empty:
+        return pd.DataFrame(columns=FUNDS_COLUMNS)
+    manual = ~df["Ghi chú"].str.startswith(AUTO_FUND_NOTE)
+    df = pd.DataFrame({
+        "Năm": df["Ngày_dt"].dt.year,
+        "Tháng": df["Ngày_dt"].dt.month,
+        "Tổng": df["Giá"].astype("int64"),
+        "Thu chi": df["Giá"].astype("int64").where(manual, 0),
+    })
+    return df.groupby(["Năm", "Tháng"], as_index=False)[["Tổng", "Thu chi"]].sum()
+
+
+def _collapse(df, keys, columns):
+    # Các dòng lưu trong sheet là các lô cộng thêm: gom lại theo khoá
+    if df.empty:
+        return pd.DataFrame(columns=keys + columns)
+    df = df.copy()
+    for col in keys:
+        if col != "Tên":
+            df[col] = pd.to_numeric(df[col], errors="coerce")
+    for col in columns:
+        df[col] = pd.to_numeric(df[col], errors="coerce").fillna(0).astype("int64")
+    df = df.dropna(subset=[k for k in keys if k != "Tên"])
+    for col in keys:
+        if col != "Tên":
+            df[col] = df[col].astype(int)
+    return df.groupby(keys, as_index=False)[columns].sum()
+
+
+# -------- Lưu/đọc ----------
+def _empty_part(keys, columns):
+    return {"df": pd.DataFrame(columns=keys + columns), "rows": 0, "hash": 0, "written": 0,
+            "fresh": True, "verified": False, "edits": None}
+
+
+def _read_part(frame, keys, columns):
+    """Bảng tổng hợp đã lưu -> trạng thái; các lô không nối tiếp nhau từ dòng 0 thì coi như chưa có."""
+    if frame.empty or not set(keys + columns + BATCH_COLUMNS) <= set(frame.columns):
+        return _empty_part(keys, columns)
+    # Lô bị gửi lại (ghi hai lần) có các dòng giống hệt nhau
+    df = frame[keys + columns + BATCH_COLUMNS].astype(str).drop_duplicates()
+    batches = df[BATCH_COLUMNS].drop_duplicates().apply(pd.to_numeric, errors="coerce")
+    if batches.isna().any().any():
+        return _empty_part(keys, columns)
+    batches = batches.astype("int64").sort_values(["Từ dòng", "Đến dòng"])
+    starts, stops = batches["Từ dòng"].tolist(), batches["Đến dòng"].tolist()
+    if starts != [0] + stops[:-1]:
+        return _empty_part(keys, columns)
+    return {"df": _collapse(df, keys, columns), "rows": stops[-1], "hash": int(batches["Hash"].iloc[-1]),
+            "written": stops[-1], "fresh": False, "verified": False, "edits": None}
+
+
+def _load_state():
+    frames = load_sheets_versioned([spec[0] for spec in _SPECS.values()])
+    return {name: _read_part(frames[sheet_name][0], keys, columns)
+            for name, (sheet_name, keys, columns, _) in _SPECS.items()}
+
+
+def _batch(df, start, stop, hash_):
+    return df.assign(**{"Từ dòng": start, "Đến dòng": stop, "Hash": str(hash_)})
+
+
+def _persist_full(sheet_name, df, rows, hash_):
+    # Ghi đè cả bảng: các lô cộng thêm còn trong hàng đợi phải ghi xong trước
+    write_queue.flush()
+    save_sheet(sheet_name, _batch(df, 0, rows, hash_))
+    write_queue.replaced(sheet_name)
+
+
+def _persist_delta(sheet_name, delta, start, stop, hash_):
+    # Một lô = một lần append (qua hàng đợi ghi nền), đọc lại được dù ghi trùng hay hỏng giữa chừng
+    write_queue.enqueue_append(sheet_name, _batch(delta, start, stop, hash_).to_dict("records"))
+
+
+def _merge(base, delta, keys, columns):
+    return _collapse(pd.concat([base, delta], ignore_index=True), keys, columns)
+
+
+def _refresh_part(name, source, edits, compute):
+    """Đưa một bảng tổng hợp về đúng với bảng nguồn; compute(start, stop) tổng hợp các dòng [start, stop)."""
+    sheet_name, keys, columns, hash_cols = _SPECS[name]
+    part = _state[name]
+    n = len(source)
+    if part["verified"] and part["edits"] == edits and part["rows"] == n:
+        return
+    rebuild = part["fresh"] or part["rows"] > n or (part["edits"] is not None and part["edits"] != edits)
+    if not rebuild and not part["verified"]:
+        # Lần đầu trong process: phần đã tổng hợp có thể đã bị sửa từ lần chạy trước
+        rebuild = _prefix_hash(source.iloc[:part["rows"]], hash_cols) != part["hash"]
+    part.update(verified=True, edits=edits)
+    if rebuild:
+        part.update(df=compute(0, n), rows=n, hash=_prefix_hash(source, hash_cols), written=n, fresh=False)
+        _persist_full(sheet_name, part["df"], n, part["hash"])
+    elif part["rows"] < n:
+        start = part["rows"]
+        delta = compute(start, n)
+        # Chỉ hash các dòng mới
+        part.update(df=_merge(part["df"], delta, keys, columns), rows=n,
+                    hash=(part["hash"] + _prefix_hash(source.iloc[start:], hash_cols)) % (1 << 64))
+        if not delta.empty:
+            # Lô nối tiếp lô đã ghi gần nhất (các lô rỗng ở giữa không được ghi)
+            _persist_delta(sheet_name, delta, part["written"], n, part["hash"])
+            part["written"] = n
+
+
+def edit_counts():
+    """(số lần sửa dòng cũ của matches/participations, của funds); đọc trước khi tải dữ liệu."""
+    from utils.repository import edit_count, MATCH_SHEET, FUND_SHEET, PARTICIPATION_SHEET
+    return edit_count(MATCH_SHEET, PARTICIPATION_SHEET), edit_count(FUND_SHEET)
+
+
+# -------- API ----------
+@metrics.timed("rollup.refresh")
+def refresh(df_matches, df_funds, members_df, players=None, edits=None):
+    """Đưa bảng tổng hợp về đúng với dữ liệu hiện tại, trả về (rollup_stats, rollup_funds).
+
+    players: PlayerIndex khớp với df_matches (nếu không có thì tách tên từ chuỗi đội).
+    edits: edit_counts() lấy trước khi tải df_matches, df_funds (mặc định: lấy lúc gọi).
+    """
+    global _state
+    stats_edits, funds_edits = edit_counts() if edits is None else edits
+
+    def compute_stats(start, stop):
+        if start == 0 and stop == len(df_matches):
+            return _stats_rollup(df_matches, members_df, players)
+        sub_players = None if players is None else players.select(range(start, stop))
+        return _stats_rollup(df_matches.iloc[start:stop], members_df, sub_players)
+
+    with _lock:
+        if _state is None:
+            _state = _load_state()
+        _refresh_part("stats", df_matches, stats_edits, compute_stats)
+        _refresh_part("funds", df_funds, funds_edits, lambda start, stop: _funds_rollup(df_funds.iloc[start:stop]))
+        return _state["stats"]["df"].copy(), _state["funds"]["df"].copy()
+
+
+def load_rollups():
+    """Đọc dữ liệu (một request) rồi làm mới bảng tổng hợp."""
+    from utils.repository import (
+        load_many, load_player_index, MATCH_SHEET, FUND_SHEET, MEMBER_SHEET, PARTICIPATION_SHEET
+    )
+    edits = edit_counts()
+    _, df_funds, members_df, _ = load_many(MATCH_SHEET, FUND_SHEET, MEMBER_SHEET, PARTICIPATION_SHEET)
+    df_matches, players = load_player_index()
+    return refresh(df_matches, df_funds, members_df, players, edits)
+
+
+def month_stats(rollup_stats, year, month):
+    """df_stats (giống get_stats) và tổng tiền của một tháng."""
+    df = rollup_stats[(rollup_stats["Năm"] == year) & (rollup_stats["Tháng"] == month)]
+    if df.empty:
+        return pd.DataFrame(), 0
+    df_stats = df[["Tên", "Số trận thua", "Số trận thắng", "Tổng tiền"]].sort_values("Tên").reset_index(drop=True)
+    return df_stats, int(df_stats["Tổng tiền"].sum())
@@ -0,0 +1,157 @@
+# utils/row_index.py
+# Chỉ mục vị trí dòng theo tháng của từng bảng con (matches_2026, funds_2026...) và của
+# participations: mỗi tháng ứng với một hoặc vài đoạn dòng liền nhau (dòng nhập lùi ngày tạo
+# thêm đoạn). Nhờ chỉ mục, trang chỉ xem một ngày/một tháng đọc đúng các đoạn dòng đó
+# (vd. 'matches_2026'!40:85) thay vì cả bảng.
+#
+# Chỉ mục nằm ở sheet "row_index" và chỉ được ghi thêm khi có dòng mới. Sửa tay trên spreadsheet
+# làm lệch chỉ mục được phát hiện khi đọc (đọc kèm một dòng ở hai đầu mỗi đoạn và dòng đầu tiên
+# sau phần đã có chỉ mục) và khi cả bảng được tải (so từng dòng); lệch thì dựng lại.
+# Module này chỉ tính toán; việc đọc/ghi nằm trong utils/gsheets.py.
+import bisect
+import numpy as np
+import pandas as pd
+
+ROW_INDEX_SHEET = "row_index"
+# Tháng dạng mm/yyyy (trống: dòng không có ngày hợp lệ); Từ dòng/Đến dòng là số dòng trên sheet
+# (dòng 1 là header), tính cả hai đầu
+ROW_INDEX_COLUMNS = ["Phân vùng", "Tháng", "Từ dòng", "Đến dòng"]
+# Các sheet không chia năm nhưng vẫn có chỉ mục (trùng PARTICIPATION_SHEET trong utils/repository.py)
+INDEXED_SHEETS = ("participations",)
+
+
+def month_keys(ngay):
+    """Khoá tháng (mm/yyyy, trống nếu sai ngày) của từng dòng theo cột Ngày dạng chuỗi."""
+    codes, uniques = pd.factorize(pd.Series(ngay, dtype=object).astype(str).str.strip())
+    parsed = pd.to_datetime(pd.Index(uniques, dtype=object), format="%d/%m/%Y", errors="coerce")
+    keys = np.array(["" if pd.isna(day) else day.strftime("%m/%Y") for day in parsed] + [""], dtype=object)
+    return keys[codes]
+
+
+def frame_keys(df):
+    if "Ngày" not in df.columns:
+        return np.full(len(df), "", dtype=object)
+    return month_keys(df["Ngày"])
+
+
+def runs_of(keys, offset=0):
+    """Các đoạn (start, stop, tháng) liền nhau cùng tháng; vị trí tính từ offset."""
+    keys = np.asarray(keys, dtype=object)
+    if not len(keys):
+        return []
+    bounds = np.concatenate([[0], np.flatnonzero(keys[1:] != keys[:-1]) + 1, [len(keys)]])
+    return [(offset + int(a), offset + int(b), keys[a]) for a, b in zip(bounds[:-1], bounds[1:])]
+
+
+def _month_range(key):
+    month, year = key.split("/")
+    start = pd.Timestamp(year=int(year), month=int(month), day=1)
+    return start, start + pd.offsets.MonthEnd(0)
+
+
+class RowIndex:
+    """Các đoạn dòng [start, stop) (0 = dòng đầu sau header) theo tháng của một bảng."""
+
+    def __init__(self, runs):
+        merged = []
+        for start, stop, key in sorted(runs):
+            # Cùng một đoạn có thể được ghi hai lần (ghi thêm chỉ mục từ hai nơi)
+            if merged and merged[-1][2] == key and start <= merged[-1][1]:
+                merged[-1] = (merged[-1][0], max(merged[-1][1], stop), key)
+            else:
+                merged.append((start, stop, key))
+        self.runs = merged
+        self.starts = [run[0] for run in merged]
+        self.total = merged[-1][1] if merged else 0
+        # Các đoạn phải nối liền nhau từ dòng đầu, không chồng lên nhau
+        self.valid = all(a[1] == b[0] for a, b in zip(merged, merged[1:])) and (not merged or merged[0][0] == 0)
+
+    def key_at(self, pos):
+        return self.runs[bisect.bisect_right(self.starts, pos) - 1][2]
+
+    def keys(self):
+        return np.repeat(np.array([run[2] for run in self.runs], dtype=object),
+                         [run[1] - run[0] for run in self.runs])
+
+    def compare(self, keys):
+        """So với khoá tháng của dữ liệu thật: "ok", "extend" (có thêm dòng sau phần đã có) hoặc "rebuild"."""
+        if not self.valid or len(keys) < self.total:
+            return "rebuild"
+        if not np.array_equal(self.keys(), np.asarray(keys[:self.total], dtype=object)):
+            return "rebuild"
+        return "ok" if len(keys) == self.total else "extend"
+
+    def plan(self, start, end):
+        """(các đoạn cần lấy, các khoảng dòng cần đọc kèm dòng kiểm tra) cho [start, end]."""
+        start, end = pd.Timestamp(start), pd.Timestamp(end)
+        wanted = []
+        for a, b, key in self.runs:
+            if key:
+                month_start, month_end = _month_range(key)
+                if month_start <= end and month_end >= start:
+                    wanted.append((a, b))
+        # Thêm một dòng mỗi bên để thấy dòng bị chèn/xoá tay, và dòng đầu tiên sau phần đã có
+        # chỉ mục (phải trống) để thấy dòng thêm tay ở cuối
+        ranges = sorted([(max(a - 1, 0), b + 1) for a, b in wanted] + [(self.total, self.total + 1)])
+        merged = []
+        for a, b in ranges:
+            if merged and a <= merged[-1][1]:
+                merged[-1] = (merged[-1][0], max(merged[-1][1], b))
+            else:
+                merged.append((a, b))
+        return wanted, merged
+
+    def check(self, ranges, frames):
+        """Các dòng đọc được có khớp chỉ mục không (đúng tháng, đủ dòng, sau cuối là trống)."""
+        for (a, b), df in zip(ranges, frames):
+            if len(df) < min(b, self.total) - a:
+                return False
+            keys = frame_keys(df)
+            for offset, key in enumerate(keys):
+                pos = a + offset
+                if pos < self.total:
+                    if key != self.key_at(pos):
+                        return False
+                elif df.iloc[offset].astype(str).str.strip().any():
+                    return False
+        return True
+
+
+def pick(wanted, ranges, frames):
+    """Ghép các đoạn cần lấy (wanted) từ các khoảng dòng đã đọc (ranges, frames), theo thứ tự dòng."""
+    starts = [a for a, _ in ranges]
+    pieces = []
+    for a, b in wanted:
+        i = bisect.bisect_right(starts, a) - 1
+        pieces.append(frames[i].iloc[a - starts[i]:b - starts[i]])
+    if not pieces:
+        return frames[0].iloc[:0] if frames else pd.DataFrame()
+    return pd.concat(pieces, ignore_index=True)
+
+
+# -------- Sheet chỉ mục ----------
+def read_indexes(df):
+    """Bảng chỉ mục (chuỗi) -> {tên bảng: RowIndex}."""
+    runs = {}
+    if df.empty or not set(ROW_INDEX_COLUMNS) <= set(df.columns):
+        return {}
+    for row in df[ROW_INDEX_COLUMNS].astype(str).to_dict("records"):
+        try:
+            start, stop = int(row["Từ dòng"]) - 2, int(row["Đến dòng"]) - 1
+        except ValueError:
+            continue
+        runs.setdefault(row["Phân vùng"].strip(), []).append((start, stop, row["Tháng"].strip()))
+    return {name: RowIndex(parts) for name, parts in runs.items()}
+
+
+def index_rows(name, runs):
+    return [{"Phân vùng": name, "Tháng": key, "Từ dòng": start + 2, "Đến dòng": stop + 1}
+            for start, stop, key in runs]
+
+
+def index_frame(indexes):
+    """{tên bảng: danh sách đoạn} -> bảng để ghi vào sheet chỉ mục."""
+    rows = []
+    for name, runs in indexes.items():
+        rows += index_rows(name, runs)
+    return pd.DataFrame(rows, columns=ROW_INDEX_COLUMNS)
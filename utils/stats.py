@@ -1,119 +1,114 @@
 # utils/stats.py
 import streamlit as st
+import numpy as np
 import pandas as pd
-import matplotlib.pyplot as plt
-# from utils.member import load_members
-from utils.gsheets import load_sheet
-# from utils.input_info import load_sheet
-
-def get_stats(df_matches, members_df):
+from utils.repository import (
+    load_many, load_indexed, load_player_index, MATCH_SHEET, FUND_SHEET, MEMBER_SHEET, PARTICIPATION_SHEET,
+    ROLLUP_STATS_SHEET, ROLLUP_FUNDS_SHEET
+)
+from utils.date_index import take
+from utils import charts, metrics, rollup
+from utils.players import PlayerIndex
+
+STAT_COLUMNS = ["Số trận thua", "Số trận thắng", "Tổng tiền"]
+
+# Các sheet trang này đọc (để nạp sẵn khi người dùng đang ở trang khác)
+PAGE_SHEETS = [MATCH_SHEET, FUND_SHEET, MEMBER_SHEET, PARTICIPATION_SHEET,
+               ROLLUP_STATS_SHEET, ROLLUP_FUNDS_SHEET]
+
+def _match_prices(df_matches):
+    if "Giá" not in df_matches.columns:
+        return np.full(len(df_matches), -1, dtype=np.int64)
+    return pd.to_numeric(df_matches["Giá"], errors="coerce").fillna(-1).astype("int64").to_numpy()
+
+def _stats_frame(names, losses, wins, money, keys=None):
+    df = pd.DataFrame(keys or {})
+    df["Tên"] = pd.Series(names, dtype=object).astype(str)
+    df["Số trận thua"] = losses.astype(int)
+    df["Số trận thắng"] = wins.astype(int)
+    df["Tổng tiền"] = money.astype(int)
+    # Bỏ các tên không có trận nào trong phần dữ liệu này
+    df = df[(df["Số trận thua"] + df["Số trận thắng"]) > 0]
+    return df.sort_values(list(keys or {}) + ["Tên"]).reset_index(drop=True)
+
+@metrics.timed("get_stats")
+def get_stats(df_matches, members_df, players=None):
     if df_matches.empty:
         return pd.DataFrame(), 0
-    
-    # Tạo map giá thua
-    gia_map = dict(zip(members_df["Tên"], members_df["Giá thua"]))
-
-    rows = []
-    for _, row in df_matches.iterrows():
-        ngay = row["Ngày"]
-        gia = int(row.get("Giá", -1))
-
-        # Tách tên từ cột "Trận thua" (có thể ngăn cách bằng dấu phẩy hoặc khoảng trắng)
-        loser = [n.strip() for n in row["Đội thua"].replace(",", " ").split() if n.strip()]
-        for name in loser:
-            fee = gia if gia > 0 else gia_map.get(name, 5000)
-            rows.append({
-                "Tên": name,
-                "Số trận thắng": 0,
-                "Số trận thua": 1,
-                "Tổng tiền": fee,
-                "Ngày": ngay
-            })
-
-        winners = [n.strip() for n in row["Đội thắng"].replace(",", " ").split() if n.strip()]
-        for name in winners:
-            rows.append({
-                "Tên": name,
-                "Số trận thắng": 1,
-                "Số trận thua": 0,
-                "Tổng tiền": 0,
-                "Ngày": ngay
-            })
-
-    df = pd.DataFrame(rows)
-    df["Số trận thua"] = pd.to_numeric(df["Số trận thua"], errors="coerce").fillna(0).astype(int)
-    df["Tổng tiền"] = pd.to_numeric(df["Tổng tiền"], errors="coerce").fillna(0).astype(int)
-    df["Số trận thắng"] = pd.to_numeric(df["Số trận thắng"], errors="coerce").fillna(0).astype(int)
-
-    # Gom theo tên
-    df_stats = df.groupby("Tên", as_index=False).agg({
-        "Số trận thua": "sum",
-        "Số trận thắng": "sum",
-        "Tổng tiền": "sum"
-    })
+
+    # Gom theo tên bằng mảng mã người chơi; players (nếu có) phải khớp từng dòng df_matches,
+    # nếu không có thì tách tên (dấu phẩy hoặc khoảng trắng) từ chuỗi đội
+    index = players if players is not None else PlayerIndex.from_matches(df_matches)
+    if not len(index):
+        return pd.DataFrame(), 0
+    losses, wins, money = index.aggregate(_match_prices(df_matches), members_df)
+    df_stats = _stats_frame(index.names, losses, wins, money)
 
     total = int(df_stats["Tổng tiền"].sum())
     return df_stats, total
 
+@metrics.timed("get_monthly_stats")
+def get_monthly_stats(df_matches, members_df, players=None):
+    """Thống kê của mọi tháng trong một lần tính.
+
+    Trả về (df_stats theo Năm/Tháng/Tên, Series tổng tiền theo (Năm, Tháng)).
+    """
+    if df_matches.empty:
+        return pd.DataFrame(), pd.Series(dtype=int)
+    if "Ngày_dt" in df_matches.columns:
+        ngay_dt = df_matches["Ngày_dt"]
+    else:
+        ngay_dt = pd.to_datetime(df_matches["Ngày"], format="%d/%m/%Y", errors="coerce")
+    month_key = (ngay_dt.dt.year * 100 + ngay_dt.dt.month).fillna(-1).astype("int64")
+    groups, months = pd.factorize(month_key.where(month_key >= 0), use_na_sentinel=True)
+
+    index = players if players is not None else PlayerIndex.from_matches(df_matches)
+    if not len(index) or not len(months):
+        return pd.DataFrame(), pd.Series(dtype=int)
+    losses, wins, money = index.aggregate(_match_prices(df_matches), members_df, groups, len(months))
+
+    n_players = len(index.names)
+    months = np.asarray(months, dtype=np.int64)
+    df_stats = _stats_frame(
+        np.tile(index.names, len(months)), losses, wins, money,
+        keys={"Năm": np.repeat(months // 100, n_players).astype(int),
+              "Tháng": np.repeat(months % 100, n_players).astype(int)},
+    )
+    if df_stats.empty:
+        return pd.DataFrame(), pd.Series(dtype=int)
+    totals = df_stats.groupby(["Năm", "Tháng"])["Tổng tiền"].sum()
+    return df_stats, totals
+
 def show_stats_page():
     st.markdown("<h2 style='text-align: center;'>BẢNG THỐNG KÊ THÁNG</h2>", unsafe_allow_html=True)
 
     st.subheader("Bảng thống kê")
-    df_matches = load_sheet("matches")
-    df_funds = load_sheet("funds")
-
-    # --- Matches ---
-    if df_matches.empty and df_funds.empty:
-        st.info("Chưa có dữ liệu.")
-        return
+    edits = rollup.edit_counts()
+    _, df_funds, members_df, _ = load_many(MATCH_SHEET, FUND_SHEET, MEMBER_SHEET, PARTICIPATION_SHEET)
+    df_matches, players = load_player_index()
 
     # Nếu cả hai rỗng -> không có dữ liệu
-    if (df_matches is None or df_matches.empty) and (df_funds is None or df_funds.empty):
+    if df_matches.empty and df_funds.empty:
         st.info("Chưa có dữ liệu.")
         return
 
-    # Chuẩn hoá cột Ngày và tạo cột Ngày_dt cho cả 2 bảng (an toàn ngay cả khi rỗng)
-    if df_matches is None or df_matches.empty:
-        df_matches = pd.DataFrame(columns=["Ngày", "Đội thắng", "Đội thua", "Giá"])
-    else:
-        df_matches["Ngày"] = df_matches["Ngày"].astype(str)
-    df_matches["Ngày_dt"] = pd.to_datetime(df_matches["Ngày"], format="%d/%m/%Y", errors="coerce")
-
-    if df_funds is None:
-        df_funds = pd.DataFrame(columns=["Ngày", "Ghi chú", "Giá"])
-    df_funds["Ngày"] = df_funds.get("Ngày", "").astype(str)
-    df_funds["Ngày_dt"] = pd.to_datetime(df_funds["Ngày"], format="%d/%m/%Y", errors="coerce")
-
     # Chọn tháng/năm
     months = list(range(1,13))
     month = st.selectbox("Chọn tháng", months, index=pd.Timestamp.now().month-1)
 
+    # Các con số lấy từ bảng tổng hợp theo tháng, không phải quét lại lịch sử
+    rollup_stats, rollup_funds = rollup.refresh(df_matches, df_funds, members_df, players, edits)
+
     # Chọn tháng/năm dựa trên dữ liệu có sẵn ở matches hoặc funds
-    years_matches = df_matches["Ngày_dt"].dropna().dt.year.unique().tolist() if not df_matches.empty else []
-    years_funds = df_funds["Ngày_dt"].dropna().dt.year.unique().tolist() if not df_funds.empty else []
-    years = sorted(set(years_matches) | set(years_funds))
+    years = sorted(set(rollup_stats["Năm"].tolist()) | set(rollup_funds["Năm"].tolist()))
     if not years:
         st.info("Chưa có dữ liệu năm nào để chọn.")
         return
     
     # Lọc theo tháng/năm
     year = st.selectbox("Chọn năm", years, index=max(0, len(years)-1))
-    
-    # Lọc matches theo tháng/năm (an toàn nếu df_matches rỗng)
-    if not df_matches.empty:
-        df_filtered = df_matches[
-            (df_matches["Ngày_dt"].dt.month == month) &
-            (df_matches["Ngày_dt"].dt.year == year)
-        ].copy()
-    else:
-        df_filtered = pd.DataFrame(columns=df_matches.columns)
 
-    # Lấy thống kê từ matches (get_stats trả về df_stats, total)
-    members_df = load_sheet("members") if load_sheet is not None else pd.DataFrame()
-    if not df_filtered.empty:
-        df_stats, total = get_stats(df_filtered, members_df)
-    else:
-        df_stats, total = pd.DataFrame(), 0
+    df_stats, total = rollup.month_stats(rollup_stats, year, month)
 
     if not df_stats.empty:
         st.dataframe(df_stats.reset_index(drop=True), use_container_width=True, hide_index=True)
@@ -124,10 +119,8 @@ def show_stats_page():
 
     # --- Funds ---
     if not df_funds.empty:
-        df_f_month = df_funds[
-            (df_funds["Ngày_dt"].dt.month == month) &
-            (df_funds["Ngày_dt"].dt.year == year)
-        ]
+        df_funds, funds_index = load_indexed(FUND_SHEET)
+        df_f_month = take(df_funds, funds_index.month(year, month))
         if not df_f_month.empty:
             st.subheader("Thu/Chi Quỹ")
             df_f_month = df_f_month.copy()
@@ -135,7 +128,8 @@ def show_stats_page():
             df_f_month["Số tiền"] = df_f_month["Giá"].apply(lambda x: f"{x:+,}")
             df_manual = df_f_month[~df_f_month["Ghi chú"].str.startswith("Tổng thu quỹ tháng")]
             st.dataframe(df_manual[["Ngày", "Ghi chú", "Số tiền"]].reset_index(drop=True), use_container_width=True, hide_index=True)
-            total_funds = df_manual["Giá"].sum()
+            f_month = rollup_funds[(rollup_funds["Năm"] == year) & (rollup_funds["Tháng"] == month)]
+            total_funds = int(f_month["Thu chi"].sum())
         else:
             total_funds = 0
             st.info("Không có dữ liệu thu chi trong tháng này.")
@@ -154,52 +148,9 @@ def show_stats_page():
     )
 
     
-    # Biểu đồ
+    # Biểu đồ (ảnh được giữ lại theo dữ liệu, chỉ vẽ lại khi df_stats thay đổi)
     # member_names = set(members_df["Tên"].astype(str).str.strip().tolist())
     # colors = ["#1f77b4" if name in member_names else "#ff7f0e" for name in df_stats["Tên"]]
     if not df_stats.empty:
-        fig, ax = plt.subplots()
-        df_stats = df_stats.sort_values("Tổng tiền", ascending=False)
-        bars = ax.bar(df_stats["Tên"], df_stats["Tổng tiền"])
-
-        # Hiển thị số trên mỗi cột
-        for bar in bars:
-            height = bar.get_height()
-            ax.text(
-                bar.get_x() + bar.get_width() / 2,
-                height,
-                f"{height:,}",       # format có dấu phẩy
-                ha="center", va="bottom", fontsize=9
-            )
-        ax.set_ylabel("Tổng tiền (VND)")
-        ax.set_title("Bảng xếp hạng")
-        
-        ax.set_xticks(range(len(df_stats["Tên"])))
-        ax.set_xticklabels(df_stats["Tên"], rotation=0, ha="center")
-
-        ax.grid(True, axis="y")
-        st.pyplot(fig)
-
-    if not df_stats.empty:
-        df_ratio = df_stats.copy()
-        df_ratio["Tỉ lệ thua (%)"] = (
-            df_ratio["Số trận thua"] * 100 /
-            (df_ratio["Số trận thắng"] + df_ratio["Số trận thua"]).replace(0, 1)
-        ).round(1)
-
-        df_ratio = df_ratio.sort_values("Tỉ lệ thua (%)", ascending=False)
-
-        fig2, ax2 = plt.subplots()
-        bars2 = ax2.bar(df_ratio["Tên"], df_ratio["Tỉ lệ thua (%)"], color="orange")
-
-        for bar in bars2:
-            height = bar.get_height()
-            ax2.text(bar.get_x() + bar.get_width()/2, height,
-                    f"{height:.1f}%", ha="center", va="bottom", fontsize=9)
-
-        ax2.set_ylabel("Tỉ lệ thua (%)")
-        ax2.set_title("Tỉ lệ thua")
-        ax2.set_xticks(range(len(df_ratio["Tên"])))
-        ax2.set_xticklabels(df_ratio["Tên"], rotation=0, ha="center")
-        ax2.grid(True, axis="y")
-        st.pyplot(fig2)
+        st.image(charts.ranking_chart(df_stats), width="stretch")
+        st.image(charts.loss_ratio_chart(df_stats), width="stretch")
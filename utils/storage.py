@@ -0,0 +1,236 @@
+# utils/storage.py
+# Giao diện lưu trữ chung cho các "sheet" (matches, funds, members...) và
+# bản cài đặt SQLite chạy local. Bản Google Sheets nằm trong utils/gsheets.py.
+import contextlib
+import datetime
+import sqlite3
+import threading
+import pandas as pd
+
+
+def to_sortable_date(ngay):
+    """'dd/mm/yyyy' -> 'yyyymmdd' (chuỗi rỗng nếu sai định dạng)."""
+    try:
+        return datetime.datetime.strptime(str(ngay).strip(), "%d/%m/%Y").strftime("%Y%m%d")
+    except ValueError:
+        return ""
+
+
+def cell_text(value):
+    # Chuyển kiểu numpy/pandas về kiểu Python để gửi đi/lưu lại
+    if hasattr(value, "item"):
+        value = value.item()
+    if value is None or (isinstance(value, float) and pd.isna(value)):
+        return ""
+    return value
+
+
+class SheetBackend:
+    """Các thao tác mà lớp cache/repository cần từ nơi lưu dữ liệu.
+
+    Mọi giá trị đọc ra là chuỗi, giống như get_all_values() của Google Sheets.
+    Vị trí dòng trong update_rows tính theo thứ tự của read() (0 = dòng đầu sau header).
+    """
+
+    name = "base"
+    # Số request tính vào quota đọc/ghi của mỗi thao tác, vd. {"append": {"read": 1, "write": 1}};
+    # để trống nếu backend không bị giới hạn
+    quota_costs = {}
+
+    def read(self, sheet_name) -> pd.DataFrame:
+        raise NotImplementedError
+
+    def read_many(self, sheet_names) -> dict:
+        # Mặc định: đọc từng sheet
+        return {name: self.read(name) for name in sheet_names}
+
+    def revision(self):
+        # Giá trị thay đổi mỗi khi dữ liệu thay đổi; None nếu không hỗ trợ
+        return None
+
+    def append(self, sheet_name, rows) -> int:
+        raise NotImplementedError
+
+    def update_rows(self, sheet_name, updates) -> int:
+        raise NotImplementedError
+
+    def replace(self, sheet_name, df: pd.DataFrame):
+        raise NotImplementedError
+
+    def read_rows(self, sheet_name, ranges) -> list:
+        """Các khoảng dòng [start, stop) (0 = dòng đầu sau header), mỗi khoảng một DataFrame.
+
+        Khoảng vượt quá cuối bảng trả về ít dòng hơn. Mặc định: đọc hết rồi cắt.
+        """
+        df = self.read(sheet_name)
+        return [df.iloc[start:stop].reset_index(drop=True) for start, stop in ranges]
+
+    def read_range(self, sheet_name, start, end, date_col="Ngày") -> pd.DataFrame:
+        # Mặc định: đọc hết rồi lọc bằng pandas
+        df = self.read(sheet_name)
+        if df.empty or date_col not in df.columns:
+            return df
+        ngay = pd.to_datetime(df[date_col], format="%d/%m/%Y", errors="coerce")
+        return df[(ngay >= start) & (ngay <= end)].reset_index(drop=True)
+
+
+class SQLiteBackend(SheetBackend):
+    """Mỗi sheet là một bảng TEXT; cột ẩn _ngay (yyyymmdd) có index để lọc theo ngày."""
+
+    name = "sqlite"
+
+    def __init__(self, path="pickleball.db"):
+        self.path = path
+        self._lock = threading.RLock()
+        # isolation_level=None: tự quản lý transaction để cả DDL cũng nằm trong transaction
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        with self._transaction():
+            self._conn.execute("CREATE TABLE IF NOT EXISTS _meta (key TEXT PRIMARY KEY, value INTEGER)")
+            self._conn.execute("INSERT OR IGNORE INTO _meta VALUES ('revision', 0)")
+
+    # -------- tiện ích ----------
+    @contextlib.contextmanager
+    def _transaction(self):
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                yield
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+            self._conn.execute("COMMIT")
+
+    @staticmethod
+    def _q(name):
+        return '"' + str(name).replace('"', '""') + '"'
+
+    def _has_table(self, sheet_name):
+        return self._conn.execute(
+            "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = ?", (sheet_name,)
+        ).fetchone() is not None
+
+    def _columns(self, sheet_name):
+        rows = self._conn.execute(f"PRAGMA table_info({self._q(sheet_name)})").fetchall()
+        return [r[1] for r in rows if not r[1].startswith("_")]
+
+    def _bump(self):
+        self._conn.execute("UPDATE _meta SET value = value + 1 WHERE key = 'revision'")
+
+    def _ensure_table(self, sheet_name, columns):
+        table = self._q(sheet_name)
+        if not self._has_table(sheet_name):
+            cols = "".join(f", {self._q(c)} TEXT" for c in columns)
+            self._conn.execute(f"CREATE TABLE {table} (_row INTEGER PRIMARY KEY AUTOINCREMENT, _ngay TEXT{cols})")
+            self._conn.execute(f"CREATE INDEX {self._q(sheet_name + '_ngay')} ON {table}(_ngay)")
+            return list(columns)
+        existing = self._columns(sheet_name)
+        for c in columns:
+            if c not in existing:
+                # Các dòng đã có đọc ra chuỗi rỗng (như ô trống trên Google Sheets)
+                self._conn.execute(f"ALTER TABLE {table} ADD COLUMN {self._q(c)} TEXT DEFAULT ''")
+                existing.append(c)
+        return existing
+
+    def _select(self, sheet_name, where="", params=()):
+        with self._lock:
+            if not self._has_table(sheet_name):
+                return pd.DataFrame()
+            columns = self._columns(sheet_name)
+            cols = ", ".join(self._q(c) for c in columns)
+            rows = self._conn.execute(
+                f"SELECT {cols} FROM {self._q(sheet_name)} {where} ORDER BY _row", params
+            ).fetchall()
+        if not columns:
+            return pd.DataFrame()
+        return pd.DataFrame(rows, columns=columns)
+
+    @staticmethod
+    def _text(value):
+        return str(cell_text(value))
+
+    def _insert(self, sheet_name, rows):
+        names = []
+        for row in rows:
+            names += [c for c in row if c not in names]
+        columns = self._ensure_table(sheet_name, names)
+        cols = ", ".join(["_ngay"] + [self._q(c) for c in columns])
+        marks = ", ".join("?" * (len(columns) + 1))
+        self._conn.executemany(
+            f"INSERT INTO {self._q(sheet_name)} ({cols}) VALUES ({marks})",
+            [
+                [to_sortable_date(row.get("Ngày", ""))] + [self._text(row.get(c, "")) for c in columns]
+                for row in rows
+            ],
+        )
+
+    # -------- SheetBackend ----------
+    def read(self, sheet_name):
+        return self._select(sheet_name)
+
+    def revision(self):
+        with self._lock:
+            return self._conn.execute("SELECT value FROM _meta WHERE key = 'revision'").fetchone()[0]
+
+    def read_range(self, sheet_name, start, end, date_col="Ngày"):
+        # Lọc ngay trong SQL nhờ index trên _ngay
+        return self._select(
+            sheet_name, "WHERE _ngay BETWEEN ? AND ?",
+            (pd.Timestamp(start).strftime("%Y%m%d"), pd.Timestamp(end).strftime("%Y%m%d")),
+        )
+
+    def read_rows(self, sheet_name, ranges):
+        # Mỗi khoảng dòng một truy vấn LIMIT/OFFSET theo thứ tự dòng
+        with self._lock:
+            if not self._has_table(sheet_name):
+                return [pd.DataFrame() for _ in ranges]
+            columns = self._columns(sheet_name)
+            cols = ", ".join(self._q(c) for c in columns)
+            frames = []
+            for start, stop in ranges:
+                rows = self._conn.execute(
+                    f"SELECT {cols} FROM {self._q(sheet_name)} ORDER BY _row LIMIT ? OFFSET ?",
+                    (stop - start, start),
+                ).fetchall()
+                frames.append(pd.DataFrame(rows, columns=columns))
+        return frames
+
+    def append(self, sheet_name, rows):
+        if isinstance(rows, pd.DataFrame):
+            rows = rows.to_dict("records")
+        if not rows:
+            return 0
+        with self._transaction():
+            self._insert(sheet_name, rows)
+            self._bump()
+        return len(rows)
+
+    def update_rows(self, sheet_name, updates):
+        if not updates:
+            return 0
+        count = 0
+        with self._transaction():
+            table = self._q(sheet_name)
+            names = []
+            for values in updates.values():
+                names += [c for c in values if c not in names]
+            self._ensure_table(sheet_name, names)   # cột mới (vd. ID)
+            row_ids = [r[0] for r in self._conn.execute(f"SELECT _row FROM {table} ORDER BY _row")]
+            for idx, values in updates.items():
+                row_id = row_ids[int(idx)]
+                for col, value in values.items():
+                    self._conn.execute(f"UPDATE {table} SET {self._q(col)} = ? WHERE _row = ?",
+                                       (self._text(value), row_id))
+                    if col == "Ngày":
+                        self._conn.execute(f"UPDATE {table} SET _ngay = ? WHERE _row = ?",
+                                           (to_sortable_date(value), row_id))
+                    count += 1
+            self._bump()
+        return count
+
+    def replace(self, sheet_name, df: pd.DataFrame):
+        with self._transaction():
+            self._conn.execute(f"DROP TABLE IF EXISTS {self._q(sheet_name)}")
+            self._ensure_table(sheet_name, [str(c) for c in df.columns])
+            if not df.empty:
+                self._insert(sheet_name, df.to_dict("records"))
+            self._bump()
@@ -0,0 +1,343 @@
+# utils/write_queue.py
+# Hàng đợi ghi nền: giao diện chỉ xếp thay đổi vào hàng đợi rồi chạy tiếp,
+# một thread nền gom các lần ghi cùng sheet thành một request và thử lại khi
+# gặp lỗi quota (429) hoặc lỗi server (5xx).
+#
+# Lần ghi thử lại vẫn hỏng không bị bỏ: các thao tác đó được giữ lại (vẫn hiện trong dữ liệu đọc
+# được), các thay đổi sau của cùng sheet xếp hàng phía sau để thứ tự ghi không đổi, và tất cả được
+# lưu ra file UNSAVED_PATH để còn sau khi tắt app. Người dùng bấm thử lại (retry_failed) để gửi tiếp.
+import atexit
+import contextlib
+import json
+import os
+import sqlite3
+import sys
+import threading
+import time
+from collections import OrderedDict
+from utils.gsheets import append_rows, update_rows
+from utils.storage import cell_text
+
+# Thời gian chờ giữa các lần thử lại (giây)
+RETRY_DELAYS = [1, 2, 4, 8, 16, 32]
+# Chờ thêm một chút để gom các lần ghi liên tiếp
+BATCH_WINDOW = 0.2
+# File giữ các thay đổi chưa ghi được (lỗi hoặc còn trong hàng đợi lúc tắt app)
+UNSAVED_PATH = os.environ.get("PICKLEBALL_UNSAVED_PATH", "pickleball_unsaved.json")
+# Lúc tắt app: chờ hàng đợi ghi xong tối đa bấy nhiêu giây, phần còn lại lưu ra file
+EXIT_FLUSH_TIMEOUT = 10
+
+_cond = threading.Condition()
+_pending = OrderedDict()   # sheet -> list các thao tác ("append", rows) / ("update", updates)
+_in_flight = {}            # sheet -> các thao tác đang gửi
+_failed = OrderedDict()    # sheet -> các thao tác chưa ghi được, chờ người dùng thử lại
+_version = 0               # tăng mỗi khi hàng đợi thay đổi
+_failures = []             # các lần ghi đã hỏng: {"sheet", "rows", "error", "time"}
+_sheet_locks = {}
+_worker = None
+_file_lock = threading.Lock()
+
+
+def _is_retryable(exc):
+    # gspread chỉ được import khi dùng Google Sheets; chưa import thì không thể có APIError
+    gspread = sys.modules.get("gspread")
+    if gspread is not None and isinstance(exc, gspread.exceptions.APIError):
+        status = getattr(exc.response, "status_code", None) or exc.code
+        return status == 429 or (status is not None and status >= 500)
+    if isinstance(exc, sqlite3.OperationalError):
+        return "locked" in str(exc) or "busy" in str(exc)
+    return isinstance(exc, (ConnectionError, TimeoutError))
+
+
+def _coalesce(ops):
+    # Gộp mọi append thành một lần ghi, mọi update thành một batch.
+    # Append chỉ thêm vào cuối nên ghi append trước update không làm lệch vị trí dòng.
+    rows = []
+    updates = {}
+    for kind, payload in ops:
+        if kind == "append":
+            rows.extend(payload)
+        else:
+            for idx, values in payload.items():
+                updates.setdefault(idx, {}).update(values)
+    return rows, updates
+
+
+def _sheet_lock(sheet_name):
+    with _cond:
+        return _sheet_locks.setdefault(sheet_name, threading.RLock())
+
+
+def _send(sheet_name, ops):
+    """Gửi các thao tác của một sheet: (None, []) nếu xong, (lỗi, các thao tác chưa ghi được) nếu hỏng."""
+    rows, updates = _coalesce(ops)
+    lock = _sheet_lock(sheet_name)
+    for attempt, delay in enumerate([0] + RETRY_DELAYS):
+        time.sleep(delay)
+        # Giữ khoá của sheet trong lúc gửi để người đọc không thấy một dòng hai lần
+        # (vừa trong dữ liệu mới tải vừa trong hàng đợi)
+        with lock:
+            try:
+                if rows:
+                    append_rows(sheet_name, rows)
+                    rows = []
+                    with _cond:
+                        _in_flight[sheet_name] = [op for op in _in_flight[sheet_name] if op[0] != "append"]
+                if updates:
+                    update_rows(sheet_name, updates)
+                with _cond:
+                    del _in_flight[sheet_name]
+                return None, []
+            except Exception as exc:
+                if not _is_retryable(exc) or attempt == len(RETRY_DELAYS):
+                    # Phần append đã ghi xong (nếu có) đã được bỏ khỏi _in_flight
+                    with _cond:
+                        remaining = _in_flight.pop(sheet_name)
+                    return exc, remaining
+    return None, []
+
+
+def _sendable():
+    # Sheet đầu tiên có thay đổi chờ ghi mà không bị giữ lại sau một lần ghi hỏng
+    return next((name for name in _pending if name not in _failed), None)
+
+
+def _run():
+    global _version
+    while True:
+        with _cond:
+            while _sendable() is None:
+                _cond.wait()
+        time.sleep(BATCH_WINDOW)
+        with _cond:
+            sheet_name = _sendable()
+            if sheet_name is None:
+                continue
+            ops = _pending.pop(sheet_name)
+            _in_flight[sheet_name] = ops
+        error, remaining = _send(sheet_name, ops)
+        if error is not None:
+            with _cond:
+                _failed[sheet_name] = remaining
+                _failures.append({"sheet": sheet_name, "rows": _size(remaining),
+                                  "error": repr(error), "time": time.time()})
+        if error is not None or os.path.exists(UNSAVED_PATH):
+            _save_unsaved()   # cập nhật (hoặc xoá) file khi vừa hỏng / vừa ghi bù xong
+        with _cond:
+            _version += 1
+            _cond.notify_all()
+
+
+def _size(ops):
+    return sum(len(payload) for _, payload in ops)
+
+
+# -------- Lưu ra file các thay đổi chưa ghi được ----------
+def _unsaved_ops():
+    # Theo thứ tự ghi của từng sheet: phần bị giữ lại, phần đang gửi, phần đang chờ
+    with _cond:
+        result = OrderedDict()
+        for queue in (_failed, _in_flight, _pending):
+            for name, ops in queue.items():
+                result.setdefault(name, []).extend(ops)
+        return result
+
+
+def _save_unsaved():
+    with _file_lock:
+        ops = {name: [[kind, _plain(payload)] for kind, payload in sheet_ops]
+               for name, sheet_ops in _unsaved_ops().items() if sheet_ops}
+        try:
+            if not ops:
+                if os.path.exists(UNSAVED_PATH):
+                    os.remove(UNSAVED_PATH)
+                return
+            tmp = UNSAVED_PATH + ".tmp"
+            with open(tmp, "w", encoding="utf-8") as f:
+                json.dump(ops, f, ensure_ascii=False)
+            os.replace(tmp, UNSAVED_PATH)
+        except OSError:
+            pass  # không ghi được file: các thay đổi vẫn còn trong bộ nhớ
+
+
+def _plain(payload):
+    # Giá trị numpy/pandas -> kiểu JSON
+    if isinstance(payload, dict):
+        return {str(idx): {col: cell_text(v) for col, v in values.items()} for idx, values in payload.items()}
+    return [{col: cell_text(v) for col, v in row.items()} for row in payload]
+
+
+def _load_unsaved():
+    # Lần chạy trước còn thay đổi chưa ghi: giữ lại như các lần ghi hỏng, chờ người dùng thử lại
+    try:
+        with open(UNSAVED_PATH, encoding="utf-8") as f:
+            saved = json.load(f)
+    except (OSError, ValueError):
+        return
+    with _cond:
+        for name, sheet_ops in saved.items():
+            ops = [(kind, {int(idx): values for idx, values in payload.items()} if kind == "update" else payload)
+                   for kind, payload in sheet_ops]
+            if ops:
+                _failed[name] = ops
+                _failures.append({"sheet": name, "rows": _size(ops), "error": "Chưa ghi xong ở lần chạy trước",
+                                  "time": os.path.getmtime(UNSAVED_PATH)})
+
+
+def _ensure_worker():
+    global _worker
+    if _worker is None or not _worker.is_alive():
+        _worker = threading.Thread(target=_run, name="sheet-write-behind", daemon=True)
+        _worker.start()
+
+
+def _enqueue(sheet_name, op):
+    global _version
+    with _cond:
+        _ensure_worker()
+        _pending.setdefault(sheet_name, []).append(op)
+        _version += 1
+        _cond.notify_all()
+
+
+# -------- API ----------
+def enqueue_append(sheet_name, rows):
+    rows = list(rows)
+    if rows:
+        _enqueue(sheet_name, ("append", rows))
+    return len(rows)
+
+
+def enqueue_update(sheet_name, updates):
+    if updates:
+        _enqueue(sheet_name, ("update", dict(updates)))
+    return len(updates)
+
+
+def flush(timeout=None):
+    """Chờ tới khi mọi thay đổi đã được ghi (trừ các sheet đang giữ lại sau lần ghi hỏng).
+
+    Trả về False nếu hết giờ.
+    """
+    deadline = None if timeout is None else time.monotonic() + timeout
+    with _cond:
+        while _sendable() is not None or _in_flight:
+            remaining = None if deadline is None else deadline - time.monotonic()
+            if remaining is not None and remaining <= 0:
+                return False
+            _cond.wait(remaining)
+    return True
+
+
+def pending_count(sheet_name=None):
+    """Số dòng/ô còn chờ ghi (kể cả đang gửi, trừ phần bị giữ lại sau lần ghi hỏng)."""
+    with _cond:
+        total = 0
+        for queue in (_pending, _in_flight):
+            for name, ops in queue.items():
+                if (sheet_name is None or name == sheet_name) and name not in _failed:
+                    total += _size(ops)
+        return total
+
+
+def unsaved_count(sheet_name=None):
+    """Số dòng/ô chưa ghi được (bị giữ lại sau lần ghi hỏng, kể cả phần xếp hàng phía sau)."""
+    with _cond:
+        return sum(_size(ops) for queue in (_failed, _pending) for name, ops in queue.items()
+                   if name in _failed and (sheet_name is None or name == sheet_name))
+
+
+@contextlib.contextmanager
+def reading(sheet_name):
+    """Đọc sheet kèm các thay đổi chưa ghi xong: trả về (version, thao tác theo thứ tự).
+
+    Dữ liệu phải được đọc bên trong khối with để không lẫn với một lần gửi đang diễn ra.
+    """
+    with _sheet_lock(sheet_name):
+        with _cond:
+            ops = (list(_failed.get(sheet_name, [])) + list(_in_flight.get(sheet_name, []))
+                   + list(_pending.get(sheet_name, [])))
+            version = _version
+        yield version, ops
+
+
+@contextlib.contextmanager
+def locked(*sheet_names):
+    """Giữ khoá các sheet trong lúc ghi thẳng (không qua hàng đợi): thread nền chờ tới khi xong."""
+    with contextlib.ExitStack() as stack:
+        for name in sorted(set(sheet_names)):
+            stack.enter_context(_sheet_lock(name))
+        yield
+
+
+@contextlib.contextmanager
+def drained(*sheet_names):
+    """Như locked(), nhưng chỉ vào khối with khi các sheet không còn thay đổi nào chờ ghi.
+
+    Không thể chờ hàng đợi ghi xong trong lúc giữ khoá (thread nền cần khoá để gửi): ghi hết
+    rồi lấy khoá, nếu vừa có thay đổi mới xếp hàng thì nhả khoá và làm lại. Phần bị giữ lại
+    sau lần ghi hỏng không được tính (xem unsaved_count).
+    """
+    while True:
+        flush()
+        with locked(*sheet_names):
+            with _cond:
+                busy = any(name in queue and name not in _failed
+                           for queue in (_pending, _in_flight) for name in sheet_names)
+            if not busy:
+                yield
+                return
+
+
+def retry_failed():
+    """Gửi lại các thay đổi bị giữ lại (trước các thay đổi xếp hàng sau chúng). Trả về số dòng/ô."""
+    global _version
+    with _cond:
+        count = 0
+        for name, ops in list(_failed.items()):
+            _pending[name] = ops + _pending.get(name, [])
+            _pending.move_to_end(name, last=False)
+            count += _size(ops)
+        _failed.clear()
+        if count:
+            _ensure_worker()
+            _version += 1
+            _cond.notify_all()
+    return count
+
+
+def replaced(sheet_name):
+    """Cả sheet vừa được ghi đè bằng dữ liệu đã gồm các thay đổi bị giữ lại: bỏ chúng đi."""
+    global _version
+    with _cond:
+        ops = _failed.pop(sheet_name, None)
+        if ops is None:
+            return
+        _version += 1
+    _save_unsaved()
+
+
+def unsaved_ops():
+    """{sheet: [(loại, dữ liệu)]} các thay đổi chưa ghi được (để tải về)."""
+    with _cond:
+        return {name: list(ops) + list(_pending.get(name, [])) for name, ops in _failed.items()}
+
+
+def failures():
+    with _cond:
+        return list(_failures)
+
+
+def failure_count():
+    with _cond:
+        return len(_failures)
+
+
+def _flush_at_exit():
+    # Không ghi kịp thì lưu phần còn lại ra file, lần chạy sau hiện ra để thử lại
+    flush(EXIT_FLUSH_TIMEOUT)
+    _save_unsaved()
+
+
+_load_unsaved()
+atexit.register(_flush_at_exit)